@@ -1,3 +1,11 @@
-from .extension import ExampleWindowExtension
+import importlib.util
 
-__all__ = ["ExampleWindowExtension"]
\ No newline at end of file
+from .tracing import tracer
+
+# 无Kit环境（如命令行批处理 python -m omni.LightingControl.batch_cli）时不加载UI扩展，只使用纯pxr模块
+if importlib.util.find_spec("omni.ext") is not None:
+    from .extension import ExampleWindowExtension
+
+    __all__ = ["ExampleWindowExtension", "tracer"]
+else:
+    __all__ = ["tracer"]
\ No newline at end of file
@@ -0,0 +1,130 @@
+from pxr import Usd, Sdf, Tf
+from typing import Dict
+
+from .schema_profile import LightSchemaProfile
+
+
+# 逻辑属性名 -> (UsdLux基础属性名, 值类型)
+LIGHT_ATTRIBUTES = {
+    "color": ("color", Sdf.ValueTypeNames.Color3f),
+    "intensity": ("intensity", Sdf.ValueTypeNames.Float),
+    "exposure": ("exposure", Sdf.ValueTypeNames.Float),
+    "specular": ("specular", Sdf.ValueTypeNames.Float),
+    "color_temperature": ("colorTemperature", Sdf.ValueTypeNames.Float),
+    "enable_color_temperature": ("enableColorTemperature", Sdf.ValueTypeNames.Bool),
+    "angle": ("angle", Sdf.ValueTypeNames.Float),
+    "width": ("width", Sdf.ValueTypeNames.Float),
+    "height": ("height", Sdf.ValueTypeNames.Float),
+    "radius": ("radius", Sdf.ValueTypeNames.Float),
+    "length": ("length", Sdf.ValueTypeNames.Float),
+    "shadow_enable": ("shadow:enable", Sdf.ValueTypeNames.Bool),
+}
+
+
+class LightAttributeCache:
+    """按 (prim路径, 逻辑属性) 缓存已解析的 Usd.Attribute 句柄
+
+    属性命名（inputs:intensity 或 intensity）由舞台级的 LightSchemaProfile 决定，
+    每个灯光在第一次访问时解析一次，之后的读写直接使用缓存的句柄；
+    prim发生resync时对应条目失效。
+    """
+
+    def __init__(self, stage, profile: LightSchemaProfile = None):
+        self.stage = stage
+        self.profile = profile or LightSchemaProfile(stage)
+        self._handles: Dict[Sdf.Path, Dict[str, Usd.Attribute]] = {}
+        self._prefixes: Dict[Sdf.Path, str] = {}
+        self._listener = None
+        if stage:
+            self._listener = Tf.Notice.Register(Usd.Notice.ObjectsChanged, self._on_objects_changed, stage)
+
+    def destroy(self):
+        """注销通知监听并清空缓存"""
+        if self._listener:
+            self._listener.Revoke()
+            self._listener = None
+        self.clear()
+        self.stage = None
+
+    def clear(self):
+        """清空所有缓存条目"""
+        self._handles.clear()
+        self._prefixes.clear()
+
+    def _detect_prefix(self, prim):
+        """获取灯光使用的UsdLux属性前缀"""
+        path = prim.GetPath()
+        prefix = self._prefixes.get(path)
+        if prefix is None:
+            prefix = self.profile.get_prefix(prim)
+            self._prefixes[path] = prefix
+        return prefix
+
+    def get_attribute_name(self, prim, prop):
+        """获取逻辑属性在该灯光上对应的USD属性名"""
+        return self._detect_prefix(prim) + LIGHT_ATTRIBUTES[prop][0]
+
+    def get(self, prim, prop, create=False):
+        """获取逻辑属性对应的属性句柄，create为True时在属性不存在时创建"""
+        path = prim.GetPath()
+        handles = self._handles.get(path)
+        if handles is not None:
+            attr = handles.get(prop)
+            if attr is not None:
+                return attr
+
+        attr_name = self.get_attribute_name(prim, prop)
+        attr = prim.GetAttribute(attr_name)
+        if not attr:
+            if not create:
+                return None
+            try:
+                attr = prim.CreateAttribute(attr_name, LIGHT_ATTRIBUTES[prop][1])
+            except Exception as e:
+                print(f"创建属性失败 {attr_name}: {str(e)}")
+                return None
+            if not attr:
+                return None
+
+        self._handles.setdefault(path, {})[prop] = attr
+        return attr
+
+    def invalidate(self, paths):
+        """使给定prim路径及其后代的缓存条目失效"""
+        remaining = set()
+        for path in paths:
+            # 灯光通常是叶子节点，直接命中时无需扫描后代
+            self.profile.forget(path)
+            if path in self._prefixes:
+                self._handles.pop(path, None)
+                del self._prefixes[path]
+            else:
+                remaining.add(path)
+
+        if not remaining or not self._prefixes:
+            return
+
+        stale = []
+        for cached in self._prefixes:
+            parent = cached.GetParentPath()
+            while not parent.isEmpty:
+                if parent in remaining:
+                    stale.append(cached)
+                    break
+                parent = parent.GetParentPath()
+        for cached in stale:
+            self.profile.forget(cached)
+            self._handles.pop(cached, None)
+            del self._prefixes[cached]
+
+    def _on_objects_changed(self, notice, stage):
+        """Tf.Notice回调：prim resync会使属性句柄过期，属性级resync不影响已缓存的句柄"""
+        if stage != self.stage:
+            return
+        prim_paths = [p for p in notice.GetResyncedPaths() if p.IsAbsoluteRootOrPrimPath()]
+        if not prim_paths:
+            return
+        if Sdf.Path.absoluteRootPath in prim_paths:
+            self.clear()
+            return
+        self.invalidate(prim_paths)
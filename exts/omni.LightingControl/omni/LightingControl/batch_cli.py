@@ -0,0 +1,200 @@
+"""无界面批处理：把灯光预设应用到多个USD文件
+
+用法（在扩展根目录下）:
+    python -m omni.LightingControl.batch_cli preset.json "shots/**/*.usd" --workers 8
+
+预设为JSON，房间和灯光组名称支持fnmatch模式，灯光组中的值覆盖房间级的值:
+    {
+        "lights_root": "/World/lights",
+        "rooms": {
+            "*": {"specular": 1.0},
+            "Lobby": {
+                "intensity": 20000,
+                "Pendants": {"color": [1.0, 0.9, 0.8], "color_temperature": 3200}
+            }
+        }
+    }
+"""
+import argparse
+import fnmatch
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+from pxr import Usd
+
+from .attribute_cache import LIGHT_ATTRIBUTES
+from .light_manager import LightManager
+
+
+def _split_entry(entry):
+    """把房间条目拆分为 (属性值, {灯光组模式: 属性值})"""
+    values = {key: value for key, value in entry.items() if key in LIGHT_ATTRIBUTES}
+    groups = {key: value for key, value in entry.items() if key not in LIGHT_ATTRIBUTES}
+    for group_name, group_values in groups.items():
+        unknown = [key for key in group_values if key not in LIGHT_ATTRIBUTES]
+        if unknown:
+            raise ValueError(f"灯光组 '{group_name}' 中有未知属性: {unknown}")
+    return values, groups
+
+
+def resolve_preset(layout, preset) -> Dict[str, Dict]:
+    """按灯光布局展开预设，返回 {灯光路径: {逻辑属性名: 值}}
+
+    按预设中的书写顺序依次合并，后出现的条目覆盖先出现的；同一条目中灯光组的值覆盖房间的值。
+    """
+    resolved: Dict[str, Dict] = {}
+    room_names = layout.get_room_names()
+    for room_pattern, entry in preset.get("rooms", {}).items():
+        room_values, groups = _split_entry(entry)
+        for room_name in fnmatch.filter(room_names, room_pattern):
+            group_names = list(layout.rooms.get(room_name, {}).keys())
+            if room_values:
+                for group_name in group_names:
+                    for path in layout.get_light_paths(room_name, group_name):
+                        resolved.setdefault(str(path), {}).update(room_values)
+            for group_pattern, group_values in groups.items():
+                for group_name in fnmatch.filter([name for name in group_names if name], group_pattern):
+                    for path in layout.get_light_paths(room_name, group_name):
+                        resolved.setdefault(str(path), {}).update(group_values)
+    return resolved
+
+
+def _save_dirty_layers(stage):
+    """只保存有改动的非匿名layer，返回保存的layer标识"""
+    saved = []
+    for layer in stage.GetUsedLayers():
+        if layer.dirty and not layer.anonymous:
+            if not layer.Save():
+                raise RuntimeError(f"保存layer失败: {layer.identifier}")
+            saved.append(layer.identifier)
+    return saved
+
+
+def process_file(file_path, preset, use_sdf_authoring=True, dry_run=False):
+    """在当前进程中处理单个文件（每个工作进程每次只打开一个舞台）"""
+    result = {"file": file_path, "ok": False, "lights": 0, "saved_layers": [],
+              "open_ms": 0.0, "apply_ms": 0.0, "save_ms": 0.0, "error": None}
+    manager = None
+    try:
+        start = time.perf_counter()
+        stage = Usd.Stage.Open(file_path)
+        if not stage:
+            raise RuntimeError("无法打开舞台")
+        opened = time.perf_counter()
+        result["open_ms"] = (opened - start) * 1000.0
+
+        manager = LightManager(stage)
+        manager.set_authoring_backend("sdf" if use_sdf_authoring else "usd")
+        layout = manager.discover_light_layout(preset.get("lights_root"))
+        if layout is None or layout.lights_root is None:
+            raise RuntimeError("没有找到灯光根")
+
+        resolved = resolve_preset(layout, preset)
+        light_values = [(stage.GetPrimAtPath(path), values) for path, values in resolved.items()]
+        result["lights"] = manager.set_per_light_attributes(light_values)
+        applied = time.perf_counter()
+        result["apply_ms"] = (applied - opened) * 1000.0
+
+        if not dry_run and result["lights"]:
+            result["saved_layers"] = _save_dirty_layers(stage)
+        result["save_ms"] = (time.perf_counter() - applied) * 1000.0
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        if manager:
+            manager.destroy()
+    return result
+
+
+def expand_inputs(patterns) -> List[str]:
+    """展开文件列表和glob模式（支持 **），去重并保持顺序"""
+    files = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            path = os.path.abspath(path)
+            if path not in seen:
+                seen.add(path)
+                files.append(path)
+    return files
+
+
+def run_batch(files, preset, workers=None, use_sdf_authoring=True, dry_run=False, on_result=None):
+    """用进程池并行处理文件，返回按输入顺序排列的结果"""
+    results = {}
+    if workers == 1:
+        for file_path in files:
+            results[file_path] = process_file(file_path, preset, use_sdf_authoring, dry_run)
+            if on_result:
+                on_result(results[file_path])
+    else:
+        # pxr不保证fork安全，工作进程使用spawn启动
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = {executor.submit(process_file, file_path, preset, use_sdf_authoring, dry_run): file_path
+                       for file_path in files}
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    results[file_path] = future.result()
+                except Exception as e:
+                    results[file_path] = {"file": file_path, "ok": False, "lights": 0, "saved_layers": [],
+                                          "open_ms": 0.0, "apply_ms": 0.0, "save_ms": 0.0, "error": str(e)}
+                if on_result:
+                    on_result(results[file_path])
+    return [results[file_path] for file_path in files]
+
+
+def _print_result(result):
+    status = "OK  " if result["ok"] else "FAIL"
+    line = (f"{status} {result['file']}  lights={result['lights']}  "
+            f"open={result['open_ms']:.1f}ms apply={result['apply_ms']:.1f}ms save={result['save_ms']:.1f}ms")
+    if result["error"]:
+        line += f"  error={result['error']}"
+    print(line, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a lighting preset to many USD files.")
+    parser.add_argument("preset", help="preset JSON file")
+    parser.add_argument("inputs", nargs="+", help="USD files or glob patterns")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--lights-root", default=None, help="override the preset's lights root path")
+    parser.add_argument("--usd-api", action="store_true", help="author through Usd.Attribute.Set instead of Sdf specs")
+    parser.add_argument("--dry-run", action="store_true", help="apply in memory without saving")
+    parser.add_argument("--report", default=None, help="write a JSON report to this path")
+    args = parser.parse_args(argv)
+
+    with open(args.preset, "r", encoding="utf-8") as f:
+        preset = json.load(f)
+    if args.lights_root:
+        preset["lights_root"] = args.lights_root
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("没有匹配的输入文件", file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    results = run_batch(files, preset, args.workers, not args.usd_api, args.dry_run, on_result=_print_result)
+    elapsed = time.perf_counter() - start
+
+    failed = [result for result in results if not result["ok"]]
+    print(f"{len(results) - len(failed)}/{len(results)} files succeeded in {elapsed:.2f}s")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"elapsed_s": elapsed, "results": results}, f, indent=2, ensure_ascii=False)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""合成舞台基准测试：衡量LightManager/MaterialManager随场景规模的扩展性
+
+用法（在扩展根目录下，纯pxr环境或Kit的Python均可）:
+    python -m omni.LightingControl.benchmarks --lights 1000 10000 100000 --output bench.json
+    python -m omni.LightingControl.benchmarks --compare bench_old.json --output bench_new.json
+
+舞台全部在内存中用Sdf API生成，布局为 /World/lights/<房间>/<灯光组>/<灯光>。
+结果为JSON，--compare 会按 (套件, 规模, 用例) 打印与旧结果的耗时比值。
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from pxr import Usd, Sdf, Gf
+
+from .light_manager import LightManager
+from .material_manager import MaterialManager
+
+
+LIGHTS_ROOT = "/World/lights"
+_LIGHT_TYPES = ("SphereLight", "RectLight", "DiskLight", "CylinderLight")
+LIGHT_SPACING = 100.0  # 灯光在XZ平面上按网格排布的间距
+
+
+def _define(layer, path, type_name):
+    spec = Sdf.CreatePrimInLayer(layer, path)
+    spec.specifier = Sdf.SpecifierDef
+    spec.typeName = type_name
+    return spec
+
+
+def _set_translate(spec, translate):
+    attr = Sdf.AttributeSpec(spec, "xformOp:translate", Sdf.ValueTypeNames.Double3)
+    attr.default = Gf.Vec3d(*translate)
+    order = Sdf.AttributeSpec(spec, "xformOpOrder", Sdf.ValueTypeNames.TokenArray, Sdf.VariabilityUniform)
+    order.default = ["xformOp:translate"]
+
+
+def build_light_stage(light_count, groups_per_room=10, lights_per_group=None, distant_lights=4):
+    """生成 房间/灯光组/灯光 布局的内存舞台，并在灯光之外放一些网格作为遍历干扰
+
+    灯光按创建顺序排布在XZ平面的网格上，供空间查询用例使用。
+    """
+    if lights_per_group is None:
+        lights_per_group = max(1, int(math.sqrt(light_count / groups_per_room)))
+    group_count = max(1, math.ceil(light_count / lights_per_group))
+    room_count = max(1, math.ceil(group_count / groups_per_room))
+    grid_size = max(1, math.ceil(math.sqrt(light_count)))
+
+    stage = Usd.Stage.CreateInMemory()
+    layer = stage.GetRootLayer()
+    with Sdf.ChangeBlock():
+        _define(layer, "/World", "Xform")
+        _define(layer, LIGHTS_ROOT, "Xform")
+        for i in range(distant_lights):
+            _define(layer, f"/World/Sun_{i}", "DistantLight")
+
+        created = 0
+        for room in range(room_count):
+            room_path = f"{LIGHTS_ROOT}/Room_{room}"
+            _define(layer, room_path, "Xform")
+            _define(layer, f"/World/Geo_{room}", "Xform")
+            _define(layer, f"/World/Geo_{room}/Mesh_0", "Mesh")
+            for group in range(groups_per_room):
+                if created >= light_count:
+                    break
+                group_path = f"{room_path}/Group_{group}"
+                _define(layer, group_path, "Xform")
+                for light in range(lights_per_group):
+                    if created >= light_count:
+                        break
+                    spec = _define(layer, f"{group_path}/Light_{light}", _LIGHT_TYPES[created % len(_LIGHT_TYPES)])
+                    attr = Sdf.AttributeSpec(spec, "inputs:intensity", Sdf.ValueTypeNames.Float)
+                    attr.default = 15000.0
+                    _set_translate(spec, (LIGHT_SPACING * (created % grid_size), 250.0,
+                                          LIGHT_SPACING * (created // grid_size)))
+                    created += 1
+    return stage
+
+
+def build_material_stage(mesh_count, material_count, bound_ratio=0.5):
+    """生成 mesh_count 个网格、material_count 个材质的内存舞台，前 bound_ratio 比例的材质被绑定"""
+    stage = Usd.Stage.CreateInMemory()
+    layer = stage.GetRootLayer()
+    bound_count = max(1, int(material_count * bound_ratio))
+    with Sdf.ChangeBlock():
+        _define(layer, "/World", "Xform")
+        _define(layer, "/World/Looks", "Scope")
+        _define(layer, "/World/Geo", "Xform")
+        for i in range(material_count):
+            _define(layer, f"/World/Looks/Material_{i}", "Material")
+            _define(layer, f"/World/Looks/Material_{i}/Shader", "Shader")
+        for i in range(mesh_count):
+            spec = _define(layer, f"/World/Geo/Mesh_{i}", "Mesh")
+            spec.SetInfo("apiSchemas", Sdf.TokenListOp.Create(prependedItems=["MaterialBindingAPI"]))
+            rel = Sdf.RelationshipSpec(spec, "material:binding")
+            rel.targetPathList.explicitItems = [Sdf.Path(f"/World/Looks/Material_{i % bound_count}")]
+    return stage
+
+
+def _measure(fn, repeat, setup=None, teardown=None):
+    """重复执行fn，返回耗时统计（毫秒）；setup的返回值作为fn的参数，且不计入耗时"""
+    samples = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        if setup:
+            fn(arg)
+        else:
+            fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+        if teardown:
+            teardown(arg)
+    return {"min_ms": min(samples), "median_ms": statistics.median(samples), "repeat": repeat}
+
+
+@contextlib.contextmanager
+def _quiet():
+    """屏蔽被测代码的打印输出（格式化开销仍计入耗时）"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def bench_lights(light_count, repeat=3):
+    """灯光相关用例"""
+    results = {}
+    stage = build_light_stage(light_count)
+
+    def _new_manager():
+        return LightManager(stage)
+
+    def _destroy(manager):
+        manager.destroy()
+
+    # 冷启动：包含灯光索引构建
+    results["get_room_names_cold"] = _measure(
+        lambda m: m.get_room_names(LIGHTS_ROOT), repeat, _new_manager, _destroy)
+
+    manager = LightManager(stage)
+    manager.get_room_names(LIGHTS_ROOT)
+    results["get_room_names_warm"] = _measure(lambda: manager.get_room_names(LIGHTS_ROOT), repeat)
+    results["get_all_lights_in_xform"] = _measure(lambda: manager.get_all_lights_in_xform(LIGHTS_ROOT), repeat)
+    results["discover_light_layout"] = _measure(lambda: manager.discover_light_layout(LIGHTS_ROOT), repeat)
+
+    all_lights = manager.get_all_lights_in_xform(LIGHTS_ROOT)
+    room_name = manager.get_room_names(LIGHTS_ROOT)[0]
+    group_path = f"{LIGHTS_ROOT}/{room_name}/{manager.get_lighting_names(f'{LIGHTS_ROOT}/{room_name}')[0]}"
+    group_lights = manager.get_lights_in_lighting_group(group_path)
+
+    values = iter(range(1, 1 << 30))
+    for backend in ("usd", "sdf"):
+        manager.set_authoring_backend(backend)
+        results[f"set_group_attributes_group_{backend}"] = _measure(
+            lambda: manager.set_group_attributes(group_lights, {"intensity": float(next(values))}), repeat)
+        results[f"set_group_attributes_all_{backend}"] = _measure(
+            lambda: manager.set_group_attributes(all_lights, {"intensity": float(next(values)), "exposure": 1.0}),
+            repeat)
+    manager.set_authoring_backend("usd")
+
+    manager.get_group_statistics(all_lights)
+    results["get_group_statistics_group"] = _measure(lambda: manager.get_group_statistics(group_lights), repeat)
+    results["get_group_statistics_all"] = _measure(lambda: manager.get_group_statistics(all_lights), repeat)
+
+    # 空间查询：冷启动包含灯光索引构建、坐标读取和八叉树构建
+    results["spatial_index_build"] = _measure(
+        lambda m: m.query_lights_in_sphere((0.0, 0.0, 0.0), LIGHT_SPACING, select=False),
+        repeat, _new_manager, _destroy)
+    grid_extent = LIGHT_SPACING * math.sqrt(light_count)
+    center = (grid_extent * 0.5, 250.0, grid_extent * 0.5)
+    manager.query_lights_in_sphere(center, 0.0, select=False)
+    results["query_lights_in_box"] = _measure(lambda: manager.query_lights_in_box(
+        (center[0] - 5 * LIGHT_SPACING, 0.0, center[2] - 5 * LIGHT_SPACING),
+        (center[0] + 5 * LIGHT_SPACING, 500.0, center[2] + 5 * LIGHT_SPACING), select=False), repeat)
+    results["query_lights_in_sphere"] = _measure(
+        lambda: manager.query_lights_in_sphere(center, 5 * LIGHT_SPACING, select=False), repeat)
+    results["query_nearest_lights"] = _measure(
+        lambda: manager.query_nearest_lights(center, 10, select=False), repeat)
+    results["analyze_lighting_budget_rooms"] = _measure(lambda: manager.analyze_lighting_budget(LIGHTS_ROOT), repeat)
+    results["analyze_lighting_budget_groups"] = _measure(
+        lambda: manager.analyze_lighting_budget(LIGHTS_ROOT, by_group=True), repeat)
+
+    manager.selected_lights = all_lights
+    results["record_current_values_as_defaults"] = _measure(manager.record_current_values_as_defaults, repeat)
+    results["reset_to_recorded_defaults"] = _measure(manager.reset_to_recorded_defaults, repeat)
+    manager.destroy()
+
+    try:
+        from .sunpath import SunlightManipulator  # 依赖Kit（omni.kit.pipapi），纯pxr环境下跳过
+    except ImportError as e:
+        results["get_all_distant_lights"] = {"skipped": f"sunpath unavailable: {e}"}
+    else:
+        sun = SunlightManipulator(None, stage=stage)
+        with _quiet():
+            results["get_all_distant_lights"] = _measure(sun.get_all_distant_lights, repeat)
+        sun.destroy()
+    return results
+
+
+def bench_materials(mesh_count, material_count, repeat=3):
+    """材质相关用例"""
+    stage = build_material_stage(mesh_count, material_count)
+    manager = MaterialManager(stage)
+    with _quiet():
+        return {"scan_unused_materials": _measure(manager.scan_unused_materials, repeat)}
+
+
+def run(light_sizes=(1000, 10000, 100000), material_sizes=((1000, 200), (10000, 1000)), repeat=3, log=print):
+    """运行全部基准，返回可序列化为JSON的结果"""
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "usd": ".".join(str(v) for v in Usd.GetVersion()),
+        "repeat": repeat,
+        "results": [],
+    }
+    for light_count in light_sizes:
+        log(f"lights: {light_count}")
+        for case, stats in bench_lights(light_count, repeat).items():
+            report["results"].append({"suite": "lights", "size": str(light_count), "case": case, **stats})
+    for mesh_count, material_count in material_sizes:
+        size = f"{mesh_count}x{material_count}"
+        log(f"materials: {size}")
+        for case, stats in bench_materials(mesh_count, material_count, repeat).items():
+            report["results"].append({"suite": "materials", "size": size, "case": case, **stats})
+    return report
+
+
+def compare(old_report, new_report):
+    """按 (套件, 规模, 用例) 对比两次结果的中位耗时，返回 [(键, 旧ms, 新ms, 比值)]"""
+    def _index(report):
+        return {(r["suite"], r["size"], r["case"]): r for r in report["results"] if "median_ms" in r}
+
+    old, new = _index(old_report), _index(new_report)
+    rows = []
+    for key, result in new.items():
+        if key in old and old[key]["median_ms"] > 0.0:
+            rows.append((key, old[key]["median_ms"], result["median_ms"], result["median_ms"] / old[key]["median_ms"]))
+    return rows
+
+
+def _parse_material_size(text):
+    mesh_count, _, material_count = text.partition("x")
+    return int(mesh_count), int(material_count)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark LightManager and MaterialManager on synthetic stages.")
+    parser.add_argument("--lights", type=int, nargs="*", default=[1000, 10000, 100000], help="light counts")
+    parser.add_argument("--materials", type=_parse_material_size, nargs="*", default=[(1000, 200), (10000, 1000)],
+                        help="material scenes as MESHESxMATERIALS")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None, help="write the JSON report to this path")
+    parser.add_argument("--compare", default=None, help="previous JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    report = run(args.lights, args.materials, args.repeat, log=lambda msg: print(msg, file=sys.stderr))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            old_report = json.load(f)
+        for (suite, size, case), old_ms, new_ms, ratio in compare(old_report, report):
+            print(f"{suite:10s} {size:>12s} {case:40s} {old_ms:10.2f} -> {new_ms:10.2f} ms  x{ratio:.2f}",
+                  file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import csv
+import math
+import os
+
+import numpy as np
+from pxr import Sdf
+from typing import Callable, Dict, List
+
+from .light_index import LightIndex, to_sdf_path
+
+
+# 预算统计需要读取的属性及其未编写时的默认值，全部使用UsdLux schema的回退值，
+# 不能用界面的默认灯光值（强度15000），否则依赖schema默认值的灯光会被严重高估
+BUDGET_DEFAULTS = {
+    "intensity": 1.0,
+    "exposure": 0.0,
+    "width": 1.0,
+    "height": 1.0,
+    "radius": 0.5,
+    "length": 1.0,
+    "shadow_enable": True,
+}
+BUDGET_PROPERTIES = ("intensity", "exposure", "width", "height", "radius", "length", "shadow_enable")
+
+# 面光源类型（按发光表面积统计）
+AREA_LIGHT_TYPES = ("RectLight", "DiskLight", "SphereLight", "CylinderLight")
+
+# 不属于任何房间/灯光组、直接放在灯光根下的灯光
+UNASSIGNED_NAME = "(unassigned)"
+
+BUDGET_FILE_SUFFIX = "_lighting_budget.csv"
+
+_CSV_COLUMNS = ("name", "path", "light_count", "total_intensity", "peak_intensity",
+                "area_light_count", "area_total", "shadow_casting")
+
+
+def get_default_budget_path(stage):
+    """获取舞台对应的预算CSV路径（舞台文件旁边），匿名舞台返回None"""
+    if not stage:
+        return None
+    root_layer = stage.GetRootLayer()
+    if root_layer.anonymous or not root_layer.realPath:
+        return None
+    return os.path.splitext(root_layer.realPath)[0] + BUDGET_FILE_SUFFIX
+
+
+def compute_surface_areas(type_names, columns) -> np.ndarray:
+    """按灯光类型向量化计算发光表面积（局部空间，不含变换缩放），非面光源为0
+
+    RectLight = 宽×高，DiskLight = πr²，SphereLight = 4πr²，CylinderLight = 2πrl（端面不发光）。
+    """
+    type_names = np.asarray(type_names, dtype=object)
+    areas = np.zeros(len(type_names), dtype=np.float64)
+    width = np.asarray(columns["width"], dtype=np.float64)
+    height = np.asarray(columns["height"], dtype=np.float64)
+    radius = np.asarray(columns["radius"], dtype=np.float64)
+    length = np.asarray(columns["length"], dtype=np.float64)
+
+    mask = type_names == "RectLight"
+    areas[mask] = width[mask] * height[mask]
+    mask = type_names == "DiskLight"
+    areas[mask] = math.pi * radius[mask] ** 2
+    mask = type_names == "SphereLight"
+    areas[mask] = 4.0 * math.pi * radius[mask] ** 2
+    mask = type_names == "CylinderLight"
+    areas[mask] = 2.0 * math.pi * radius[mask] * length[mask]
+    return areas
+
+
+def summarize_budget(unit_ids, unit_count, type_names, columns) -> Dict[str, np.ndarray]:
+    """按单元（房间或灯光组）聚合每个灯光的数据，全部用bincount向量化完成
+
+    返回 {"light_count", "total_intensity", "peak_intensity", "area_light_count", "area_total",
+    "shadow_casting", "type_names", "type_counts"}，type_counts 的形状为 (单元数, 类型数)。
+    """
+    unit_ids = np.asarray(unit_ids, dtype=np.int64)
+    type_names = np.asarray(type_names, dtype=object)
+
+    # 有效强度 = intensity × 2^exposure
+    power = np.asarray(columns["intensity"], dtype=np.float64) * \
+        np.exp2(np.asarray(columns["exposure"], dtype=np.float64))
+    is_area = np.isin(type_names, AREA_LIGHT_TYPES)
+    areas = compute_surface_areas(type_names, columns)
+    shadow = np.asarray(columns["shadow_enable"], dtype=np.float64) > 0.5
+
+    light_count = np.bincount(unit_ids, minlength=unit_count)
+    peak = np.full(unit_count, -np.inf)
+    np.maximum.at(peak, unit_ids, power)
+    peak[light_count == 0] = 0.0
+
+    unique_types, type_codes = np.unique(type_names.astype(str), return_inverse=True)
+    type_counts = np.bincount(unit_ids * len(unique_types) + type_codes,
+                              minlength=unit_count * len(unique_types)).reshape(unit_count, len(unique_types))
+
+    return {
+        "light_count": light_count,
+        "total_intensity": np.bincount(unit_ids, weights=power, minlength=unit_count),
+        "peak_intensity": peak,
+        "area_light_count": np.bincount(unit_ids, weights=is_area, minlength=unit_count).astype(np.int64),
+        "area_total": np.bincount(unit_ids, weights=areas * is_area, minlength=unit_count),
+        "shadow_casting": np.bincount(unit_ids, weights=shadow, minlength=unit_count).astype(np.int64),
+        "type_names": unique_types.tolist(),
+        "type_counts": type_counts,
+    }
+
+
+class LightingBudgetAnalyzer:
+    """按房间（或灯光组）统计灯光渲染负载，用于在提交渲染农场前找出路径追踪开销大的房间
+
+    灯光列表来自LightIndex，属性通过 read_columns_fn 一次批量读取为数组，聚合全部向量化。
+    """
+
+    def __init__(self, index: LightIndex, read_columns_fn: Callable):
+        self.index = index
+        self._read_columns = read_columns_fn
+
+    def _get_units(self, lights_root, by_group):
+        """获取统计单元 [(名称, 路径, 灯光路径列表)]，直接放在灯光根（或房间）下的灯光归入未分配单元"""
+        units = []
+        unassigned = []
+        for room_path in self.index.get_child_paths(lights_root):
+            if self.index.get_light_type(room_path):
+                unassigned.append(room_path)
+                continue
+            if not by_group:
+                units.append((room_path.name, room_path, self.index.get_all_light_paths(room_path)))
+                continue
+            for group_path in self.index.get_child_paths(room_path):
+                if self.index.get_light_type(group_path):
+                    unassigned.append(group_path)
+                    continue
+                units.append((f"{room_path.name}/{group_path.name}", group_path,
+                              self.index.get_all_light_paths(group_path)))
+        if unassigned:
+            units.append((UNASSIGNED_NAME, lights_root, unassigned))
+        return [unit for unit in units if unit[2]]
+
+    def analyze(self, lights_root, by_group=False) -> List[Dict]:
+        """统计灯光根下每个房间（by_group为True时为每个灯光组）的灯光负载，按总有效强度从高到低排序
+
+        每行为 {"name", "path", "light_count", "counts_by_type", "total_intensity", "peak_intensity",
+        "area_light_count", "area_total", "shadow_casting"}。
+        """
+        lights_root = to_sdf_path(lights_root)
+        if lights_root.isEmpty or not self.index.contains(lights_root):
+            return []
+
+        units = self._get_units(lights_root, by_group)
+        if not units:
+            return []
+
+        paths: List[Sdf.Path] = []
+        unit_ids = []
+        for unit_id, (_, _, unit_paths) in enumerate(units):
+            paths.extend(unit_paths)
+            unit_ids.append(np.full(len(unit_paths), unit_id, dtype=np.int64))
+        prims = [self.index.get_prim(path) for path in paths]
+        columns = self._read_columns(prims, list(BUDGET_PROPERTIES))
+        type_names = [self.index.get_light_type(path) for path in paths]
+
+        summary = summarize_budget(np.concatenate(unit_ids), len(units), type_names, columns)
+        rows = []
+        for unit_id, (name, path, _) in enumerate(units):
+            counts = summary["type_counts"][unit_id]
+            rows.append({
+                "name": name,
+                "path": str(path),
+                "light_count": int(summary["light_count"][unit_id]),
+                "counts_by_type": {type_name: int(count)
+                                   for type_name, count in zip(summary["type_names"], counts) if count},
+                "total_intensity": float(summary["total_intensity"][unit_id]),
+                "peak_intensity": float(summary["peak_intensity"][unit_id]),
+                "area_light_count": int(summary["area_light_count"][unit_id]),
+                "area_total": float(summary["area_total"][unit_id]),
+                "shadow_casting": int(summary["shadow_casting"][unit_id]),
+            })
+        rows.sort(key=lambda row: row["total_intensity"], reverse=True)
+        return rows
+
+
+def write_budget_csv(rows, file_path):
+    """把预算统计写为CSV，每种灯光类型一列数量，返回写入的行数"""
+    type_names = sorted({type_name for row in rows for type_name in row["counts_by_type"]})
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(file_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(list(_CSV_COLUMNS) + [f"count_{type_name}" for type_name in type_names])
+        for row in rows:
+            writer.writerow([row[column] for column in _CSV_COLUMNS] +
+                            [row["counts_by_type"].get(type_name, 0) for type_name in type_names])
+    return len(rows)
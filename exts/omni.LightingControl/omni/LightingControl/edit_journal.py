@@ -0,0 +1,254 @@
+import os
+import queue
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+JOURNAL_FILE_SUFFIX = ".lightjournal"
+
+# 文件头 + 记录：1字节类型 + 4字节负载长度 + 负载
+_MAGIC = b"LCJ1"
+_RECORD_HEADER = struct.Struct("<BI")
+_STRING = 1  # 负载：u32 字符串id + utf-8字节
+_BATCH = 2   # 负载：f64 时间戳 + u32 条目数 + 条目 (u32 路径id, u32 属性id, u8 值个数, f32 * 值个数)
+_STRING_ID = struct.Struct("<I")
+_BATCH_HEADER = struct.Struct("<dI")
+_ENTRY_HEADER = struct.Struct("<IIB")
+
+
+def get_default_journal_path(stage):
+    """获取舞台对应的日志文件路径（舞台文件旁边），匿名舞台返回None"""
+    if not stage:
+        return None
+    root_layer = stage.GetRootLayer()
+    if root_layer.anonymous or not root_layer.realPath:
+        return None
+    return os.path.splitext(root_layer.realPath)[0] + JOURNAL_FILE_SUFFIX
+
+
+def _encode_value(value):
+    """把USD值编码为浮点元组（颜色3个分量，布尔值为0/1）"""
+    try:
+        return (float(value),)
+    except TypeError:
+        return tuple(float(v) for v in value)
+
+
+def read_journal(file_path) -> Tuple[List[Tuple[float, str, str, tuple]], int, Dict[str, int]]:
+    """读取日志，返回 (条目 [(时间戳, 灯光路径, 逻辑属性名, 值元组)], 最后一条完整记录的结束位置, 字符串表)
+
+    崩溃时最后一条记录可能只写了一半，读到不完整的记录时停止，之前的记录仍然有效。
+    """
+    entries = []
+    strings: Dict[int, str] = {}
+    if not os.path.exists(file_path):
+        return entries, 0, {}
+
+    with open(file_path, "rb") as f:
+        data = f.read()
+    if not data.startswith(_MAGIC):
+        raise ValueError(f"不是灯光编辑日志文件: {file_path}")
+
+    offset = valid_end = len(_MAGIC)
+    while offset + _RECORD_HEADER.size <= len(data):
+        kind, length = _RECORD_HEADER.unpack_from(data, offset)
+        start = offset + _RECORD_HEADER.size
+        end = start + length
+        if end > len(data):
+            break
+        try:
+            if kind == _STRING:
+                (string_id,) = _STRING_ID.unpack_from(data, start)
+                strings[string_id] = data[start + _STRING_ID.size:end].decode("utf-8")
+            elif kind == _BATCH:
+                timestamp, count = _BATCH_HEADER.unpack_from(data, start)
+                position = start + _BATCH_HEADER.size
+                for _ in range(count):
+                    path_id, prop_id, value_count = _ENTRY_HEADER.unpack_from(data, position)
+                    position += _ENTRY_HEADER.size
+                    values = struct.unpack_from(f"<{value_count}f", data, position)
+                    position += 4 * value_count
+                    entries.append((timestamp, strings[path_id], strings[prop_id], values))
+        except (struct.error, KeyError, UnicodeDecodeError):
+            break
+        offset = valid_end = end
+    return entries, valid_end, {text: string_id for string_id, text in strings.items()}
+
+
+def get_latest_values(entries) -> Dict[str, Dict[str, tuple]]:
+    """按日志顺序合并条目，返回 {灯光路径: {逻辑属性名: 最后写入的值}}"""
+    latest: Dict[str, Dict[str, tuple]] = {}
+    for _, path, prop, values in entries:
+        latest.setdefault(path, {})[prop] = values
+    return latest
+
+
+class EditJournal:
+    """只追加的二进制灯光编辑日志，用于Kit崩溃后的恢复
+
+    append() 只把条目放入队列，编码和写文件由后台线程完成（带缓冲，队列空闲时flush），
+    不阻塞UI线程。路径和属性名通过字符串表只写一次。重新打开时会截掉崩溃留下的不完整记录，
+    然后继续追加。compact() 把日志压缩为每个灯光属性的最后一个值（一个快照批次）。
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.enabled = True
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._string_ids: Dict[str, int] = {}
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+        self._error = None
+
+    @property
+    def is_open(self):
+        """日志是否已打开"""
+        return self._thread is not None
+
+    def open(self):
+        """打开（或创建）日志文件并启动后台写入线程"""
+        if self.is_open:
+            return
+        with self._lock:
+            self._open_file()
+        self._thread = threading.Thread(target=self._run, name="LightEditJournal", daemon=True)
+        self._thread.start()
+
+    def _open_file(self):
+        """打开日志文件，截掉不完整的尾部记录并恢复字符串表"""
+        _, valid_end, self._string_ids = read_journal(self.file_path)
+        if valid_end:
+            self._file = open(self.file_path, "r+b")
+            self._file.truncate(valid_end)
+            self._file.seek(valid_end)
+        else:
+            self._file = open(self.file_path, "wb")
+            self._file.write(_MAGIC)
+            self._file.flush()
+
+    def close(self):
+        """写完队列中的条目后关闭日志"""
+        if not self.is_open:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def append(self, items):
+        """记录一次写入 [(灯光路径, 逻辑属性名, USD值), ...]，只入队不写文件"""
+        if self.enabled and self._thread is not None and items:
+            self._queue.put(("edit", time.time(), items))
+
+    def flush(self, timeout=None):
+        """等待后台线程写完当前队列中的条目"""
+        if not self.is_open:
+            return True
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def _run(self):
+        """后台写入线程：批量取出队列条目，写完后flush一次"""
+        while True:
+            pending = [self._queue.get()]
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            waiters = []
+            with self._lock:
+                for entry in pending:
+                    if entry is None:
+                        stop = True
+                    elif entry[0] == "flush":
+                        waiters.append(entry[1])
+                    else:
+                        try:
+                            self._write_batch(entry[1], entry[2])
+                        except Exception as e:
+                            self._error = e
+                            print(f"写入灯光编辑日志失败: {str(e)}")
+                if self._file:
+                    self._file.flush()
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _get_string_id(self, text, chunks):
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = self._string_ids[text] = len(self._string_ids)
+            payload = _STRING_ID.pack(string_id) + text.encode("utf-8")
+            chunks.append(_RECORD_HEADER.pack(_STRING, len(payload)) + payload)
+        return string_id
+
+    def _write_batch(self, timestamp, items):
+        """把一次写入编码为一个批次记录（需持有锁）"""
+        chunks = []
+        body = [_BATCH_HEADER.pack(timestamp, len(items))]
+        string_count = len(self._string_ids)
+        try:
+            for path, prop, value in items:
+                values = _encode_value(value)
+                body.append(_ENTRY_HEADER.pack(self._get_string_id(str(path), chunks),
+                                               self._get_string_id(prop, chunks), len(values)))
+                body.append(struct.pack(f"<{len(values)}f", *values))
+        except Exception:
+            # 编码失败时撤销本批次新分配的字符串id，它们还没有写入文件
+            for text in list(self._string_ids)[string_count:]:
+                del self._string_ids[text]
+            raise
+        payload = b"".join(body)
+        chunks.append(_RECORD_HEADER.pack(_BATCH, len(payload)) + payload)
+        self._file.write(b"".join(chunks))
+
+    def read(self):
+        """写完队列后读取日志中的全部条目"""
+        self.flush()
+        with self._lock:
+            return read_journal(self.file_path)[0]
+
+    def get_latest_values(self):
+        """获取日志中每个灯光属性最后写入的值"""
+        return get_latest_values(self.read())
+
+    def compact(self):
+        """把日志压缩为一个批次：每个灯光属性只保留最后一个值，返回保留的条目数量"""
+        self.flush()
+        with self._lock:
+            latest = get_latest_values(read_journal(self.file_path)[0])
+            if self._file:
+                self._file.close()
+            temp_path = self.file_path + ".tmp"
+            self._file = open(temp_path, "wb")
+            self._file.write(_MAGIC)
+            self._string_ids = {}
+            items = [(path, prop, values) for path, props in latest.items() for prop, values in props.items()]
+            if items:
+                self._write_batch(time.time(), items)
+            self._file.close()
+            os.replace(temp_path, self.file_path)
+            self._open_file()
+        return len(items)
+
+    def clear(self):
+        """清空日志（例如舞台保存之后）"""
+        self.flush()
+        with self._lock:
+            if self._file:
+                self._file.close()
+            self._file = open(self.file_path, "wb")
+            self._file.write(_MAGIC)
+            self._file.flush()
+            self._string_ids = {}
@@ -10,11 +10,15 @@
 __all__ = ["ExampleWindowExtension"]
 
 import asyncio
+import os
+import tempfile
+import time
 from functools import partial
 import omni.ext
 import omni.kit.ui
 import omni.ui as ui
 from .property_window import PropertyWindowExample
+from .tracing import tracer
 
 
 class ExampleWindowExtension(omni.ext.IExt):
@@ -22,11 +26,15 @@ class ExampleWindowExtension(omni.ext.IExt):
 
     WINDOW_NAME = "Omni Vision Tuner"
     MENU_PATH = f"Window/{WINDOW_NAME}"
+    TRACE_MENU_PATH = f"Window/{WINDOW_NAME} Tracing/Record Trace"
+    TRACE_EXPORT_MENU_PATH = f"Window/{WINDOW_NAME} Tracing/Export Chrome Trace"
 
     def on_startup(self):
         """扩展启动时调用"""
         self._window = None
         self._menu = None
+        self._trace_menu = None
+        self._trace_export_menu = None
         
         ui.Workspace.set_show_window_fn(ExampleWindowExtension.WINDOW_NAME, partial(self.show_window, None))
 
@@ -35,18 +43,42 @@ class ExampleWindowExtension(omni.ext.IExt):
             self._menu = editor_menu.add_item(
                 ExampleWindowExtension.MENU_PATH, self.show_window, toggle=True, value=True
             )
+            self._trace_menu = editor_menu.add_item(
+                ExampleWindowExtension.TRACE_MENU_PATH, self._on_trace_toggled, toggle=True, value=tracer.enabled
+            )
+            self._trace_export_menu = editor_menu.add_item(
+                ExampleWindowExtension.TRACE_EXPORT_MENU_PATH, self._on_trace_export
+            )
 
         ui.Workspace.show_window(ExampleWindowExtension.WINDOW_NAME)
 
     def on_shutdown(self):
         """扩展关闭时调用"""
         self._menu = None
+        self._trace_menu = None
+        self._trace_export_menu = None
+        tracer.enable(False)
         if self._window:
             self._window.destroy()
             self._window = None
 
         ui.Workspace.set_show_window_fn(ExampleWindowExtension.WINDOW_NAME, None)
 
+    def _on_trace_toggled(self, menu, value):
+        """开启或关闭热点追踪，开启时清空之前的记录"""
+        if value:
+            tracer.clear()
+        tracer.enable(value)
+
+    def _on_trace_export(self, menu, value):
+        """把追踪缓冲区导出为Chrome trace JSON（系统临时目录）"""
+        file_path = os.path.join(tempfile.gettempdir(), f"omni_vision_tuner_trace_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            count = tracer.export_chrome_trace(file_path)
+            print(f"已导出 {count} 个追踪事件: {file_path}")
+        except Exception as e:
+            print(f"导出追踪失败: {str(e)}")
+
     def _set_menu(self, value):
         """设置菜单项的开/关状态"""
         editor_menu = omni.kit.ui.get_editor_menu()
@@ -0,0 +1,116 @@
+import numpy as np
+from pxr import Usd, UsdGeom, Sdf, Vt
+from typing import Optional, Tuple
+
+
+# 遍历PointInstancer原型时使用的谓词：原型常写成over（不渲染），也可能包含原生实例
+PROTOTYPE_PREDICATE = Usd.TraverseInstanceProxies(Usd.PrimIsActive & Usd.PrimIsLoaded & ~Usd.PrimIsAbstract)
+
+# 每实例覆盖写在PointInstancer上的primvar：primvars:light:<UsdLux基础属性名>，每个实例一个值
+INSTANCE_PRIMVAR_NAMESPACE = "light"
+INSTANCE_PRIMVAR_INTERPOLATION = UsdGeom.Tokens.vertex
+
+_ARRAY_FROM_NUMPY = {
+    Sdf.ValueTypeNames.FloatArray: (Vt.FloatArray, np.float32),
+    Sdf.ValueTypeNames.Color3fArray: (Vt.Vec3fArray, np.float32),
+    Sdf.ValueTypeNames.BoolArray: (Vt.BoolArray, bool),
+}
+
+
+def is_instanced_light(prim) -> bool:
+    """灯光是否经由原生实例访问（实例代理或原型中的prim），此时不能直接在该路径上编写"""
+    return prim.IsInstanceProxy() or prim.IsInPrototype()
+
+
+def get_prototype_prim(prim):
+    """获取实例代理对应的原型prim，本身就在原型中时返回自身"""
+    return prim.GetPrimInPrototype() if prim.IsInstanceProxy() else prim
+
+
+def find_point_instancer(prim) -> Optional[Tuple[UsdGeom.PointInstancer, int]]:
+    """查找把prim作为原型（或原型的一部分）的PointInstancer，返回 (instancer, 原型序号)"""
+    path = prim.GetPath()
+    parent = prim.GetParent()
+    while parent and not parent.IsPseudoRoot():
+        if parent.IsA(UsdGeom.PointInstancer):
+            instancer = UsdGeom.PointInstancer(parent)
+            for proto_index, target in enumerate(instancer.GetPrototypesRel().GetForwardedTargets()):
+                if path.HasPrefix(target):
+                    return instancer, proto_index
+        parent = parent.GetParent()
+    return None
+
+
+def get_proto_indices(instancer: UsdGeom.PointInstancer) -> np.ndarray:
+    """读取每个实例的原型序号"""
+    proto_indices = instancer.GetProtoIndicesAttr().Get()
+    if proto_indices is None:
+        return np.empty(0, dtype=np.int64)
+    return np.asarray(proto_indices, dtype=np.int64)
+
+
+def get_instance_primvar_name(base_name):
+    """每实例覆盖的primvar名称（不含primvars:前缀）"""
+    return f"{INSTANCE_PRIMVAR_NAMESPACE}:{base_name}"
+
+
+class InstanceOverrides:
+    """PointInstancer上灯光属性的每实例覆盖，以primvar数组保存（长度等于实例数量）
+
+    原型中的灯光只编写一次，所有实例共享；需要个别实例不同时在instancer上写
+    primvars:light:<属性名>，没有覆盖的实例取其原型灯光的当前值。
+    一个原型包含多个灯光时，覆盖作用于该实例中的全部灯光。
+    """
+
+    def __init__(self, instancer: UsdGeom.PointInstancer):
+        self.instancer = instancer
+        self.primvars_api = UsdGeom.PrimvarsAPI(instancer.GetPrim())
+
+    def get(self, base_name) -> Optional[np.ndarray]:
+        """读取覆盖数组，没有时返回None"""
+        primvar = self.primvars_api.GetPrimvar(get_instance_primvar_name(base_name))
+        if not primvar or not primvar.HasAuthoredValue():
+            return None
+        return np.asarray(primvar.Get())
+
+    def set(self, base_name, value_type, instance_indices, values, proto_defaults) -> int:
+        """为给定实例写入覆盖值，返回写入的实例数量
+
+        proto_defaults 为每个原型的默认值 (原型数,) 或 (原型数, 3)，新建primvar时按实例的原型序号向量化填充；
+        已有primvar的长度与实例数量不一致（实例数变化）时同样重新填充。
+        """
+        proto_indices = get_proto_indices(self.instancer)
+        instance_indices = np.asarray(instance_indices, dtype=np.int64)
+        if not len(proto_indices) or not len(instance_indices):
+            return 0
+        if instance_indices.min() < 0 or instance_indices.max() >= len(proto_indices):
+            raise IndexError(f"实例序号超出范围 [0, {len(proto_indices)})")
+
+        array_type = value_type.arrayType
+        vt_type, dtype = _ARRAY_FROM_NUMPY[array_type]
+        current = self.get(base_name)
+        if current is None or len(current) != len(proto_indices):
+            current = np.asarray(proto_defaults, dtype=dtype)[proto_indices]
+        else:
+            current = np.array(current, dtype=dtype)
+        current[instance_indices] = np.asarray(values, dtype=dtype)
+
+        primvar = self.primvars_api.CreatePrimvar(get_instance_primvar_name(base_name), array_type,
+                                                  INSTANCE_PRIMVAR_INTERPOLATION)
+        if vt_type is Vt.BoolArray:
+            primvar.Set(vt_type(current.tolist()))
+        else:
+            primvar.Set(vt_type.FromNumpy(np.ascontiguousarray(current)))
+        return len(instance_indices)
+
+    def clear(self, base_name=None) -> int:
+        """移除覆盖primvar（base_name为None时移除全部灯光覆盖），返回移除的数量"""
+        prefix = f"primvars:{INSTANCE_PRIMVAR_NAMESPACE}:"
+        names = [primvar.GetName() for primvar in self.primvars_api.GetAuthoredPrimvars()
+                 if primvar.GetName().startswith(prefix)]
+        if base_name is not None:
+            names = [name for name in names if name == prefix + base_name]
+        prim = self.instancer.GetPrim()
+        for name in names:
+            prim.RemoveProperty(name)
+        return len(names)
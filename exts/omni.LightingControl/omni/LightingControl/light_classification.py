@@ -0,0 +1,67 @@
+from pxr import Usd, UsdLux, Tf
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class LightClassifier:
+    """基于schema注册表的灯光分类，按prim类型缓存结果
+
+    prim类型派生自 UsdLux.BoundableLightBase / NonboundableLightBase，或其内置API schema中包含LightAPI
+    （PortalLight、GeometryLight以及插件/RTX灯光都属于这种情况）时视为灯光类型；每个类型只解析一次。
+    类型本身不是灯光、但prim上应用了LightAPI（例如带MeshLightAPI的网格）时，
+    按 (类型, 应用的API schema列表) 缓存HasAPI的结果。
+    extra_type_names 用于补充没有注册schema的自定义灯光类型名。
+    """
+
+    def __init__(self, extra_type_names: Iterable[str] = ()):
+        self.extra_type_names = set(extra_type_names)
+        self._type_cache: Dict[str, bool] = {}
+        self._api_cache: Dict[Tuple[str, Tuple[str, ...]], Optional[str]] = {}
+        self._light_bases = [Tf.Type.Find(UsdLux.BoundableLightBase), Tf.Type.Find(UsdLux.NonboundableLightBase)]
+
+    def add_type_name(self, type_name):
+        """把一个类型名补充为灯光类型"""
+        self.extra_type_names.add(type_name)
+        self.clear()
+
+    def clear(self):
+        """清空分类缓存"""
+        self._type_cache.clear()
+        self._api_cache.clear()
+
+    def _resolve_type(self, type_name):
+        """通过schema注册表判断类型是否为灯光类型"""
+        if not type_name:
+            return False
+        if type_name in self.extra_type_names:
+            return True
+        tf_type = Usd.SchemaRegistry.GetTypeFromSchemaTypeName(type_name)
+        if tf_type and any(tf_type.IsA(base) for base in self._light_bases):
+            return True
+        definition = Usd.SchemaRegistry().FindConcretePrimDefinition(type_name)
+        return bool(definition) and "LightAPI" in definition.GetAppliedAPISchemas()
+
+    def get_light_type(self, prim) -> Optional[str]:
+        """获取灯光分类名：灯光类型返回类型名，应用了LightAPI的其他prim返回对应的API schema名，不是灯光时返回None"""
+        type_info = prim.GetPrimTypeInfo()
+        type_name = type_info.GetTypeName()
+        is_light_type = self._type_cache.get(type_name)
+        if is_light_type is None:
+            is_light_type = self._type_cache[type_name] = self._resolve_type(type_name)
+        if is_light_type:
+            return type_name
+
+        api_schemas = type_info.GetAppliedAPISchemas()
+        if not api_schemas:
+            return None
+        key = (type_name, tuple(api_schemas))
+        if key not in self._api_cache:
+            light_api = None
+            if prim.HasAPI(UsdLux.LightAPI):
+                # 优先使用更具体的灯光API名（如MeshLightAPI），否则为LightAPI
+                light_api = next((name for name in api_schemas if name.endswith("LightAPI")), "LightAPI")
+            self._api_cache[key] = light_api
+        return self._api_cache[key]
+
+    def is_light(self, prim) -> bool:
+        """检查prim是否是灯光"""
+        return self.get_light_type(prim) is not None
@@ -0,0 +1,176 @@
+from functools import reduce
+import operator
+
+from pxr import Usd, UsdGeom, Sdf
+from typing import Callable, Dict, List, Optional
+
+from .instancing import PROTOTYPE_PREDICATE
+
+
+# 不可能包含灯光的子树，遍历时直接剪枝
+DEFAULT_PRUNE_TYPES = frozenset([
+    "Mesh", "GeomSubset", "BasisCurves", "NurbsCurves", "Points", "NurbsPatch",
+    "Material", "Shader", "NodeGraph", "Camera",
+])
+
+
+def make_traversal_predicate(active_only=True, loaded_only=True, instance_proxies=False):
+    """构建遍历谓词：是否只遍历激活的/已加载的prim，是否进入实例代理"""
+    terms = [Usd.PrimIsDefined, ~Usd.PrimIsAbstract]
+    if active_only:
+        terms.append(Usd.PrimIsActive)
+    if loaded_only:
+        terms.append(Usd.PrimIsLoaded)
+    predicate = reduce(operator.and_, terms)
+    if instance_proxies:
+        predicate = Usd.TraverseInstanceProxies(predicate)
+    return predicate
+
+
+# 灯光索引默认使用的谓词：进入原生实例，实例中的灯光以实例代理的形式出现
+INSTANCE_PROXY_PREDICATE = make_traversal_predicate(instance_proxies=True)
+
+
+def iter_discovery(root_prim, is_light_fn: Callable[[Usd.Prim], bool], predicate=None, prune_types=DEFAULT_PRUNE_TYPES):
+    """迭代遍历root_prim子树，产出 (prim, 是否灯光)，只包含灯光和Xform
+
+    使用 Usd.PrimRange 代替递归，遇到 prune_types 中的类型时跳过其整个子树；
+    剪枝在灯光判断之后进行，这样应用了LightAPI的网格等prim仍会被识别为灯光。
+    PointInstancer的原型常写成over，按 PROTOTYPE_PREDICATE 单独遍历，其中的灯光照常产出。
+    """
+    prim_range = Usd.PrimRange(root_prim, predicate) if predicate is not None else Usd.PrimRange(root_prim)
+    iterator = iter(prim_range)
+    for prim in iterator:
+        if prim.IsA(UsdGeom.PointInstancer):
+            iterator.PruneChildren()
+            for child in prim.GetFilteredChildren(PROTOTYPE_PREDICATE):
+                yield from iter_discovery(child, is_light_fn, PROTOTYPE_PREDICATE, prune_types)
+            continue
+        is_light = is_light_fn(prim)
+        if prune_types and prim.GetTypeName() in prune_types:
+            iterator.PruneChildren()
+            if is_light:
+                yield prim, True
+            continue
+        if is_light:
+            yield prim, True
+        elif prim.IsA(UsdGeom.Xform):
+            yield prim, False
+
+
+class LightLayout:
+    """一次遍历得到的灯光目录结构：灯光根 → 房间 → 灯光组 → 灯光
+
+    直接位于房间下（不属于任何灯光组）的灯光记录在名称为 "" 的组中。
+    """
+
+    def __init__(self, lights_root: Optional[Sdf.Path] = None):
+        self.lights_root = lights_root
+        self.rooms: Dict[str, Dict[str, List[Sdf.Path]]] = {}
+        self.root_lights: List[Sdf.Path] = []  # 直接位于灯光根下的灯光
+
+    def get_room_names(self):
+        """获取房间名称（保持舞台顺序）"""
+        return list(self.rooms.keys())
+
+    def get_group_names(self, room_name):
+        """获取房间下的灯光组名称"""
+        return [name for name in self.rooms.get(room_name, {}) if name]
+
+    def get_light_paths(self, room_name, group_name):
+        """获取灯光组下的全部灯光路径"""
+        return self.rooms.get(room_name, {}).get(group_name, [])
+
+    def get_light_count(self):
+        """获取布局中的灯光总数"""
+        count = len(self.root_lights)
+        for groups in self.rooms.values():
+            for lights in groups.values():
+                count += len(lights)
+        return count
+
+    def _add_xform(self, path):
+        depth = path.pathElementCount - self.lights_root.pathElementCount
+        if depth == 1:
+            self.rooms.setdefault(path.name, {})
+        elif depth == 2:
+            self.rooms.setdefault(path.GetParentPath().name, {}).setdefault(path.name, [])
+
+    def _add_light(self, path):
+        depth = path.pathElementCount - self.lights_root.pathElementCount
+        if depth <= 1:
+            self.root_lights.append(path)
+            return
+        prefixes = path.GetPrefixes()
+        root_depth = self.lights_root.pathElementCount
+        room_name = prefixes[root_depth].name
+        group_name = prefixes[root_depth + 1].name if depth >= 3 else ""
+        self.rooms.setdefault(room_name, {}).setdefault(group_name, []).append(path)
+
+
+def discover_light_layout(stage, is_light_fn: Callable[[Usd.Prim], bool], root_path=None,
+                          predicate=None, prune_types=DEFAULT_PRUNE_TYPES):
+    """单次遍历发现灯光根并收集完整的房间/灯光组/灯光布局
+
+    未指定root_path时，灯光根为遍历顺序中第一个名称包含"light"的Xform；
+    找到后只遍历其子树，离开子树即停止。若没有这样的Xform，则退回到第一个
+    直接包含灯光的Xform，其布局由同一次遍历中记录的路径得到。
+    """
+    if not stage:
+        return LightLayout()
+
+    if root_path:
+        start_prim = stage.GetPrimAtPath(root_path)
+        if not start_prim or not start_prim.IsValid():
+            return LightLayout()
+        lights_root = start_prim.GetPath()
+    else:
+        start_prim = stage.GetPseudoRoot()
+        lights_root = None
+
+    layout = LightLayout(lights_root)
+
+    # 找到灯光根之前记录的节点，用于回退规则
+    visit_order: Dict[Sdf.Path, int] = {}
+    seen_xforms: List[Sdf.Path] = []
+    seen_lights: List[Sdf.Path] = []
+    fallback_root = None
+
+    for prim, is_light in iter_discovery(start_prim, is_light_fn, predicate, prune_types):
+        path = prim.GetPath()
+
+        if layout.lights_root is not None:
+            if not path.HasPrefix(layout.lights_root):
+                break  # 已离开灯光根子树，提前结束
+            if path == layout.lights_root:
+                continue
+            if is_light:
+                layout._add_light(path)
+            else:
+                layout._add_xform(path)
+            continue
+
+        if not is_light and "light" in path.name.lower():
+            layout.lights_root = path
+            continue
+
+        if is_light:
+            seen_lights.append(path)
+            parent = path.GetParentPath()
+            parent_order = visit_order.get(parent)
+            if parent_order is not None and (fallback_root is None or parent_order < visit_order[fallback_root]):
+                fallback_root = parent
+        else:
+            visit_order[path] = len(visit_order)
+            seen_xforms.append(path)
+
+    if layout.lights_root is None and fallback_root is not None:
+        layout.lights_root = fallback_root
+        for path in seen_xforms:
+            if path != fallback_root and path.HasPrefix(fallback_root):
+                layout._add_xform(path)
+        for path in seen_lights:
+            if path.HasPrefix(fallback_root):
+                layout._add_light(path)
+
+    return layout
@@ -0,0 +1,346 @@
+from pxr import Usd, Sdf, Tf
+from typing import Callable, Dict, List, Optional, Set
+
+from .light_discovery import DEFAULT_PRUNE_TYPES, INSTANCE_PROXY_PREDICATE, iter_discovery
+
+
+def to_sdf_path(path):
+    """将字符串路径规范化为Sdf.Path（容忍结尾的斜杠）"""
+    if isinstance(path, Sdf.Path):
+        return path
+    path = str(path).strip()
+    if len(path) > 1:
+        path = path.rstrip("/")
+    if not path or not Sdf.Path.IsValidPathString(path):
+        return Sdf.Path.emptyPath
+    return Sdf.Path(path)
+
+
+class LightIndex:
+    """舞台级灯光层次索引，按 灯光根 → 房间 → 灯光组 → 灯光 组织，并按灯光类型分桶
+
+    索引只保存Xform、灯光以及它们的祖先节点，构建时遍历一次舞台，
+    之后通过 Tf.Notice 的 ObjectsChanged 事件只重建发生resync的子树。
+    light_type_fn 决定灯光的分桶名称，应与 is_light_fn 使用同一套分类（默认为prim类型名）。
+    默认进入原生实例：实例中的灯光以实例代理路径索引，同时记录其在原型中的路径，
+    原型中的属性变化（通知路径位于原型下）据此映射回全部实例代理。
+    """
+
+    KIND_OTHER = 0
+    KIND_XFORM = 1
+    KIND_LIGHT = 2
+
+    def __init__(self, stage, is_light_fn: Callable[[Usd.Prim], bool], predicate=None,
+                 prune_types=DEFAULT_PRUNE_TYPES, light_type_fn: Optional[Callable[[Usd.Prim], str]] = None):
+        self.stage = stage
+        self._is_light = is_light_fn
+        self._light_type_fn = light_type_fn
+        self._predicate = INSTANCE_PROXY_PREDICATE if predicate is None else predicate
+        self._prune_types = prune_types
+
+        self._children: Dict[Sdf.Path, List[Sdf.Path]] = {}  # 父路径 -> 已索引的子路径（保持舞台顺序）
+        self._kinds: Dict[Sdf.Path, int] = {}
+        self._prims: Dict[Sdf.Path, Usd.Prim] = {}
+        self._light_types: Dict[Sdf.Path, str] = {}
+        self._type_buckets: Dict[str, Set[Sdf.Path]] = {}
+        self._proxy_prototypes: Dict[Sdf.Path, Sdf.Path] = {}  # 实例代理灯光 -> 原型中的路径
+        self._prototype_proxies: Dict[Sdf.Path, Set[Sdf.Path]] = {}  # 原型中的灯光路径 -> 实例代理
+
+        # 查询结果缓存，resync时按祖先链失效
+        self._subtree_lights_cache: Dict[Sdf.Path, List[Sdf.Path]] = {}
+        self._lights_root_cache = None
+
+        # 每次层次结构变化时递增，供依赖索引的查询结构判断是否需要重建
+        self.generation = 0
+
+        self._listener = None
+        self.rebuild()
+        if stage:
+            self._listener = Tf.Notice.Register(Usd.Notice.ObjectsChanged, self._on_objects_changed, stage)
+
+    def destroy(self):
+        """注销通知监听并清空索引"""
+        if self._listener:
+            self._listener.Revoke()
+            self._listener = None
+        self._clear()
+        self.stage = None
+
+    def _clear(self):
+        self._children.clear()
+        self._kinds.clear()
+        self._prims.clear()
+        self._light_types.clear()
+        self._type_buckets.clear()
+        self._proxy_prototypes.clear()
+        self._prototype_proxies.clear()
+        self._subtree_lights_cache.clear()
+        self._lights_root_cache = None
+
+    # ------------------------------------------------------------------
+    # 构建与增量更新
+    # ------------------------------------------------------------------
+
+    def rebuild(self):
+        """完整重建索引"""
+        self._clear()
+        self.generation += 1
+        if not self.stage:
+            return
+        self._index_subtree(self.stage.GetPseudoRoot())
+
+    def _index_subtree(self, root_prim):
+        """索引以root_prim为根的子树（单次剪枝遍历）"""
+        for prim, is_light in iter_discovery(root_prim, self._is_light, self._predicate, self._prune_types):
+            self._add_node(prim, self.KIND_LIGHT if is_light else self.KIND_XFORM)
+
+    def _add_node(self, prim, kind):
+        """添加一个节点，并把缺失的祖先链接入索引树"""
+        path = prim.GetPath()
+        self._kinds[path] = kind
+        self._prims[path] = prim
+        if kind == self.KIND_LIGHT:
+            type_name = str(self._light_type_fn(prim) if self._light_type_fn else prim.GetTypeName())
+            self._light_types[path] = type_name
+            self._type_buckets.setdefault(type_name, set()).add(path)
+            if prim.IsInstanceProxy():
+                prototype_path = prim.GetPrimInPrototype().GetPath()
+                self._proxy_prototypes[path] = prototype_path
+                self._prototype_proxies.setdefault(prototype_path, set()).add(path)
+
+        # 先序遍历保证父节点先于子节点加入，因此这里的子节点总是新的
+        child = path
+        parent = path.GetParentPath()
+        while not parent.isEmpty:
+            self._children.setdefault(parent, []).append(child)
+            if parent in self._kinds:
+                break
+            self._kinds[parent] = self.KIND_OTHER
+            child = parent
+            parent = parent.GetParentPath()
+
+    def _remove_subtree(self, path):
+        """从索引中移除path及其全部后代"""
+        if path not in self._kinds:
+            return
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            stack.extend(self._children.pop(current, ()))
+            self._kinds.pop(current, None)
+            self._prims.pop(current, None)
+            type_name = self._light_types.pop(current, None)
+            if type_name is not None:
+                bucket = self._type_buckets.get(type_name)
+                if bucket is not None:
+                    bucket.discard(current)
+                    if not bucket:
+                        del self._type_buckets[type_name]
+            prototype_path = self._proxy_prototypes.pop(current, None)
+            if prototype_path is not None:
+                proxies = self._prototype_proxies.get(prototype_path)
+                if proxies is not None:
+                    proxies.discard(current)
+                    if not proxies:
+                        del self._prototype_proxies[prototype_path]
+
+        parent = path.GetParentPath()
+        siblings = self._children.get(parent)
+        if siblings and path in siblings:
+            siblings.remove(path)
+
+    def _prune_empty_ancestors(self, path):
+        """移除不再承载任何Xform或灯光的占位祖先"""
+        while not path.isEmpty and path != Sdf.Path.absoluteRootPath:
+            if self._kinds.get(path) != self.KIND_OTHER or self._children.get(path):
+                return
+            self._remove_subtree(path)
+            path = path.GetParentPath()
+
+    def _restore_child_order(self, parent):
+        """按舞台中的顺序重新排列某个父节点下的已索引子节点"""
+        siblings = self._children.get(parent)
+        if not siblings or len(siblings) < 2:
+            return
+        parent_prim = self.stage.GetPrimAtPath(parent)
+        if not parent_prim:
+            return
+        order = {child.GetPath(): i for i, child in enumerate(parent_prim.GetChildren())}
+        siblings.sort(key=lambda p: order.get(p, len(order)))
+
+    def _invalidate_caches(self, path):
+        """使path及其祖先上的查询缓存失效"""
+        self._lights_root_cache = None
+        current = path
+        while not current.isEmpty:
+            self._subtree_lights_cache.pop(current, None)
+            current = current.GetParentPath()
+        for cached in [p for p in self._subtree_lights_cache if p.HasPrefix(path)]:
+            del self._subtree_lights_cache[cached]
+
+    def update_paths(self, paths):
+        """只对给定的resync路径重建索引"""
+        # 属性级resync（如新建属性）不影响层次结构
+        prim_paths = sorted({p for p in paths if p.IsAbsoluteRootOrPrimPath()})
+        if not prim_paths:
+            return
+
+        # 祖先已在列表中的路径无需再处理
+        roots = []
+        for path in prim_paths:
+            if roots and path.HasPrefix(roots[-1]):
+                continue
+            roots.append(path)
+
+        # 原型重新合成时其路径（/__Prototype_N）可能整体变化，实例代理需要全部重新索引
+        if roots[0] == Sdf.Path.absoluteRootPath or any(Usd.Prim.IsPathInPrototype(path) for path in roots):
+            self.rebuild()
+            return
+
+        self.generation += 1
+        reordered_parents = set()
+        for path in roots:
+            self._invalidate_caches(path)
+            self._remove_subtree(path)
+            prim = self.stage.GetPrimAtPath(path)
+            if prim and prim.IsValid() and prim.IsActive():
+                self._index_subtree(prim)
+                reordered_parents.add(path.GetParentPath())
+            self._prune_empty_ancestors(path.GetParentPath())
+
+        for parent in reordered_parents:
+            self._restore_child_order(parent)
+
+    def _on_objects_changed(self, notice, stage):
+        """Tf.Notice回调：仅resync会改变层次结构，属性值变化直接忽略"""
+        if stage != self.stage:
+            return
+        resynced = notice.GetResyncedPaths()
+        if resynced:
+            self.update_paths(resynced)
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def contains(self, path):
+        """检查路径是否在索引中"""
+        return to_sdf_path(path) in self._kinds
+
+    def get_prim(self, path):
+        """获取已索引路径对应的prim"""
+        return self._prims.get(to_sdf_path(path))
+
+    def get_child_paths(self, path):
+        """获取指定路径下已索引的直接子路径（保持舞台顺序）"""
+        return list(self._children.get(to_sdf_path(path), ()))
+
+    def get_xform_children_names(self, path):
+        """获取指定路径下的Xform类型子级名称列表"""
+        children = self._children.get(to_sdf_path(path), ())
+        return [child.name for child in children if self._kinds.get(child) == self.KIND_XFORM]
+
+    def get_lights_in_xform(self, path):
+        """获取指定路径下的直接子级灯光"""
+        children = self._children.get(to_sdf_path(path), ())
+        return [self._prims[child] for child in children if self._kinds.get(child) == self.KIND_LIGHT]
+
+    def get_all_light_paths(self, path):
+        """获取指定路径下（包括自身和所有后代）的灯光路径"""
+        root = to_sdf_path(path)
+        if root.isEmpty or root not in self._kinds:
+            return []
+
+        cached = self._subtree_lights_cache.get(root)
+        if cached is not None:
+            return cached
+
+        lights = []
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            if self._kinds.get(current) == self.KIND_LIGHT:
+                lights.append(current)
+            children = self._children.get(current)
+            if children:
+                stack.extend(reversed(children))
+
+        self._subtree_lights_cache[root] = lights
+        return lights
+
+    def get_all_lights_in_xform(self, path):
+        """获取指定路径下（包括嵌套子级）的所有灯光prim"""
+        return [self._prims[p] for p in self.get_all_light_paths(path)]
+
+    def get_all_xforms_in_path(self, path):
+        """获取指定路径下（包括自身）的所有Xform prim"""
+        root = to_sdf_path(path)
+        if root.isEmpty or root not in self._kinds:
+            return []
+
+        xforms = []
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            if self._kinds.get(current) == self.KIND_XFORM:
+                xforms.append(self._prims[current])
+            children = self._children.get(current)
+            if children:
+                stack.extend(reversed(children))
+        return xforms
+
+    def get_instance_proxy_paths(self, prototype_path):
+        """获取原型中给定路径（及其后代）上的灯光对应的全部实例代理路径"""
+        prototype_path = to_sdf_path(prototype_path)
+        if not self._prototype_proxies or prototype_path.isEmpty or \
+                not Usd.Prim.IsPathInPrototype(prototype_path):
+            return []
+        proxies = []
+        for path, paths in self._prototype_proxies.items():
+            if path.HasPrefix(prototype_path):
+                proxies.extend(paths)
+        return proxies
+
+    def is_instance_proxy(self, path):
+        """已索引的灯光是否是实例代理"""
+        return to_sdf_path(path) in self._proxy_prototypes
+
+    def get_lights_by_type(self, type_name):
+        """获取指定类型的所有灯光路径"""
+        return sorted(self._type_buckets.get(type_name, ()))
+
+    def get_light_type_names(self):
+        """获取舞台中出现过的灯光类型"""
+        return sorted(self._type_buckets.keys())
+
+    def get_light_type(self, path):
+        """获取灯光的类型名称"""
+        return self._light_types.get(to_sdf_path(path))
+
+    def get_light_count(self):
+        """获取已索引的灯光总数"""
+        return len(self._light_types)
+
+    def find_lights_root(self):
+        """按舞台遍历顺序查找灯光根路径，找不到时返回None"""
+        if self._lights_root_cache is not None:
+            return self._lights_root_cache or None
+
+        first_named = None
+        first_with_lights = None
+        stack = list(reversed(self._children.get(Sdf.Path.absoluteRootPath, ())))
+        while stack:
+            current = stack.pop()
+            if self._kinds.get(current) == self.KIND_XFORM:
+                if "light" in current.name.lower():
+                    first_named = current
+                    break
+                if first_with_lights is None and self.get_lights_in_xform(current):
+                    first_with_lights = current
+            children = self._children.get(current)
+            if children:
+                stack.extend(reversed(children))
+
+        found = first_named or first_with_lights
+        self._lights_root_cache = str(found) if found else ""
+        return self._lights_root_cache or None
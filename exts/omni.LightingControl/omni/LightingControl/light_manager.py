@@ -1,83 +1,526 @@
+import asyncio
+import contextlib
+
+import numpy as np
 from pxr import Usd, UsdLux, Gf, Sdf, UsdGeom, UsdShade
-from typing import List, Optional, Dict
-import omni.usd
-import omni.kit.commands
+from typing import Callable, List, Optional, Dict
+
+from .attribute_cache import LightAttributeCache, LIGHT_ATTRIBUTES
+from .budget import BUDGET_DEFAULTS, LightingBudgetAnalyzer, get_default_budget_path, write_budget_csv
+from .edit_journal import EditJournal, get_default_journal_path, get_latest_values, read_journal
+from .instancing import InstanceOverrides, find_point_instancer, get_proto_indices, is_instanced_light
+from .light_discovery import discover_light_layout
+from .light_classification import LightClassifier
+from .light_index import LightIndex, to_sdf_path
+from .light_query import LightQueryEngine, summarize_values
+from .preview_layer import PreviewLayer, MODE_SESSION
+from .lighting_looks import LightingLooks
+from .light_snapshot import LightSnapshot, SnapshotStore, SNAPSHOT_PROPERTIES
+from .schema_profile import LightSchemaProfile
+from .sdf_authoring import SdfLightWriter
+from .solo import LightIsolation
+from .spatial_index import LightSpatialIndex
+from .stage_events import get_stage_key, subscribe_stage_events
+from .timeline_bake import BAKEABLE_PROPERTIES, TimelineBaker, TimelineRecorder, sample_curve
+from .tracing import tracer, traced
+from .visibility import GroupVisibilityService
+
+
+DEFAULT_LIGHT_VALUES = {
+    "color": [1.0, 1.0, 1.0],
+    "intensity": 15000.0,
+    "exposure": 1.0,
+    "color_temperature": 6500.0,
+    "specular": 1.0,
+    "enable_color_temperature": True,
+}
+
+# 相对编辑时各属性的默认钳制范围 (最小值, 最大值)，None表示不限制
+RELATIVE_EDIT_RANGES = {
+    "intensity": (0.0, None),
+    "exposure": (None, None),
+    "specular": (0.0, None),
+    "color_temperature": (1000.0, 40000.0),
+}
+
+
+def compute_relative_values(values, scale=1.0, offset=0.0, gamma=1.0, min_value=None, max_value=None):
+    """对一组数值做向量化的相对编辑：gamma（相对组内最大绝对值归一化）→ 缩放 → 偏移 → 钳制"""
+    result = np.asarray(values, dtype=np.float64)
+    if gamma != 1.0 and result.size:
+        peak = np.max(np.abs(result))
+        if peak > 0.0:
+            result = np.sign(result) * np.power(np.abs(result) / peak, gamma) * peak
+    result = result * scale + offset
+    if min_value is not None or max_value is not None:
+        result = np.clip(result, min_value, max_value)
+    return result
+
+
+# 记录默认值所用的内部快照名称
+DEFAULTS_SNAPSHOT = "__defaults__"
 
 
 class LightManager:
     """灯光管理器，负责处理USD场景中的灯光操作和层次化目录结构"""
     
-    def __init__(self):
-        self.stage = None
+    def __init__(self, stage=None):
+        self.stage = stage  # 为None时使用Kit当前上下文的舞台；无Kit环境（命令行批处理）时直接传入
         self.selected_lights = []
         self.current_room = ""
         self.current_lighting = ""
         
-        self.light_types = ["SphereLight", "RectLight", "DiskLight", "CylinderLight", "DomeLight", "DistantLight"]
-        self.light_defaults = {}
+        self.light_classifier = LightClassifier()
+        self._snapshot_stores: Dict[str, SnapshotStore] = {}  # 舞台标识 -> 快照
+        self._context_stage = None
+        self._light_index = None
+        self._attribute_cache = None
+        self._query_engine = None
+        self._spatial_index = None
+        self._sdf_writer = None
+        self._visibility_service = None
+        self._isolation = None
+        self._timeline_baker = None
+        self.timeline_recorder = TimelineRecorder()
+        self.journal: Optional[EditJournal] = None
+        self._preview_journal: Dict = {}  # 预览期间写入的 (灯光路径, 逻辑属性名) -> USD值，提交预览时才记入日志
+        self.use_sdf_authoring = False  # 为True时优先直接写入编辑目标layer的Sdf spec
+        self.preview_layer: Optional[PreviewLayer] = None
+        
+        # 使用Kit上下文的舞台时订阅舞台生命周期事件：打开/关闭时失效缓存，打开后分帧预热
+        self.stage_changed_callbacks: List[Callable[[], None]] = []
+        self._warm_up_generation = 0
+        self._stage_events = None
+        if stage is None:
+            self._stage_events = subscribe_stage_events(
+                "omni.LightingControl.LightManager",
+                on_opened=self._on_stage_opened,
+                on_closing=self._on_stage_closing,
+                on_closed=self._on_stage_closed,
+                on_assets_loaded=self.schedule_warm_up,
+                on_saved=self.clear_journal,
+            )
     
     def get_stage(self):
-        """获取当前USD舞台"""
-        if not self.stage:
-            self.stage = omni.usd.get_context().get_stage()
-        return self.stage
+        """获取当前USD舞台：优先使用传入的舞台，否则使用Kit当前上下文的舞台（舞台事件使其失效）"""
+        if self.stage:
+            return self.stage
+        if self._context_stage is None or self._stage_events is None:
+            import omni.usd  # 延迟导入，纯pxr环境下只要传入了舞台就不需要Kit
+            self._context_stage = omni.usd.get_context().get_stage()
+        return self._context_stage
     
-    def _is_light_prim(self, prim):
-        """检查prim是否是灯光类型"""
-        prim_type = prim.GetTypeName()
-        return prim_type in self.light_types
+    @property
+    def snapshots(self) -> SnapshotStore:
+        """当前舞台的快照，按舞台标识分别保存，切换舞台后各自保留"""
+        key = get_stage_key(self.get_stage())
+        store = self._snapshot_stores.get(key)
+        if store is None:
+            store = self._snapshot_stores[key] = SnapshotStore()
+        return store
     
-    def get_xform_children_names(self, path):
-        """获取指定路径下的Xform类型子级名称列表"""
+    def _on_stage_closing(self):
+        """旧舞台关闭前：撤销写在其上的预览/独奏编辑，写完编辑日志，并释放全部缓存"""
+        self._warm_up_generation += 1
+        self._release_stage_caches()
+    
+    def _on_stage_closed(self):
+        """舞台关闭后：丢弃旧舞台及其选择状态"""
+        self._warm_up_generation += 1
+        self._release_stage_caches()
+        self._context_stage = None
+        self.selected_lights = []
+        self.current_room = ""
+        self.current_lighting = ""
+        self.timeline_recorder.clear()
+        self._notify_stage_changed()
+    
+    def _on_stage_opened(self):
+        """新舞台打开后：重新解析舞台并在后台分帧预热缓存"""
+        self._on_stage_closed()
+        self.schedule_warm_up()
+    
+    def _notify_stage_changed(self):
+        for callback in list(self.stage_changed_callbacks):
+            try:
+                callback()
+            except Exception as e:
+                print(f"舞台切换回调失败: {str(e)}")
+    
+    def schedule_warm_up(self):
+        """在后台预热当前舞台的灯光索引、属性句柄缓存和查询引擎"""
+        asyncio.ensure_future(self.warm_up_async())
+    
+    async def warm_up_async(self):
+        """分帧构建缓存，每帧一步，避免打开舞台后第一次操作卡顿；期间舞台变化时中止"""
+        import omni.kit.app
+        
+        self._warm_up_generation += 1
+        generation = self._warm_up_generation
+        app = omni.kit.app.get_app()
+        for step in (self.get_light_index, self.get_attribute_cache, self.get_query_engine):
+            await app.next_update_async()
+            if generation != self._warm_up_generation or not self.get_stage():
+                return False
+            try:
+                with tracer.scope(f"LightManager.warm_up.{step.__name__}"):
+                    step()
+            except Exception as e:
+                print(f"预热灯光缓存失败: {str(e)}")
+                return False
+        return True
+    
+    def get_light_index(self):
+        """获取当前舞台的灯光层次索引，舞台变化时重建"""
         stage = self.get_stage()
         if not stage:
+            return None
+        
+        if self._light_index is None or self._light_index.stage != stage:
+            if self._light_index:
+                self._light_index.destroy()
+            with tracer.scope("LightIndex.build"):
+                self._light_index = LightIndex(stage, self._is_light_prim,
+                                               light_type_fn=self.light_classifier.get_light_type)
+        return self._light_index
+    
+    def get_query_engine(self, lights_path=None):
+        """获取基于灯光索引的查询引擎，索引重建时随之重建"""
+        index = self.get_light_index()
+        if not index:
+            return None
+        
+        if self._query_engine is None or self._query_engine.index is not index:
+            if self._query_engine:
+                self._query_engine.destroy()
+            self._query_engine = LightQueryEngine(index, self.get_attribute_columns)
+        self._query_engine.set_lights_root(lights_path or self.find_lights_path_in_stage())
+        return self._query_engine
+    
+    @traced()
+    def query(self, type=None, name=None, room=None, group=None, lights_path=None, select=True, **attribute_filters):
+        """按类型、名称、房间、灯光组和属性范围查询灯光，不遍历舞台
+
+        例如 query(type="RectLight", name="*pendant*", intensity=(">", 20000), room="Lobby")。
+        select为True时结果直接作为selected_lights，现有的组操作都可以作用于查询结果。
+        """
+        engine = self.get_query_engine(lights_path)
+        if not engine:
+            return []
+        
+        try:
+            lights = engine.query(type=type, name=name, room=room, group=group, **attribute_filters)
+        except Exception as e:
+            print(f"查询灯光失败: {str(e)}")
             return []
-            
-        children_names = []
-        parent_prim = stage.GetPrimAtPath(path)
         
-        if parent_prim and parent_prim.IsValid():
-            for child_prim in parent_prim.GetChildren():
-                if child_prim.IsA(UsdGeom.Xform):
-                    children_names.append(child_prim.GetName())
+        if select:
+            self.selected_lights = lights
+        return lights
+    
+    def get_spatial_index(self):
+        """获取灯光世界坐标的空间索引，灯光索引重建时随之重建"""
+        index = self.get_light_index()
+        if not index:
+            return None
         
-        return children_names
+        if self._spatial_index is None or self._spatial_index.index is not index:
+            if self._spatial_index:
+                self._spatial_index.destroy()
+            self._spatial_index = LightSpatialIndex(index)
+        return self._spatial_index
     
-    def get_lights_in_xform(self, xform_path):
-        """获取指定Xform下的所有灯光（直接子级）"""
-        stage = self.get_stage()
-        if not stage:
+    def _spatial_query(self, query_fn, select):
+        """执行一次空间查询并把结果转换为灯光prim，select为True时作为selected_lights"""
+        spatial_index = self.get_spatial_index()
+        if not spatial_index:
             return []
-            
-        lights = []
-        xform_prim = stage.GetPrimAtPath(xform_path)
         
-        if xform_prim and xform_prim.IsValid():
-            for child_prim in xform_prim.GetChildren():
-                if self._is_light_prim(child_prim):
-                    lights.append(child_prim)
+        try:
+            paths = query_fn(spatial_index)
+        except Exception as e:
+            print(f"空间查询灯光失败: {str(e)}")
+            return []
         
+        lights = [spatial_index.index.get_prim(path) for path in paths]
+        if select:
+            self.selected_lights = lights
         return lights
     
-    def get_all_lights_in_xform(self, xform_path):
-        """获取指定Xform下的所有灯光（包括嵌套的子级）"""
+    @traced()
+    def query_lights_in_box(self, min_point, max_point, select=True):
+        """查询世界坐标落在轴对齐包围盒内的灯光（舞台单位）"""
+        return self._spatial_query(lambda spatial_index: spatial_index.query_box(min_point, max_point), select)
+    
+    @traced()
+    def query_lights_in_sphere(self, center, radius, select=True):
+        """查询与center距离不超过radius（舞台单位）的灯光"""
+        return self._spatial_query(lambda spatial_index: spatial_index.query_sphere(center, radius), select)
+    
+    @traced()
+    def query_nearest_lights(self, point, count=1, max_distance=None, select=True):
+        """查询距离point最近的count个灯光，按距离由近到远排列"""
+        return self._spatial_query(
+            lambda spatial_index: spatial_index.query_nearest(point, count, max_distance), select)
+    
+    def get_prim_world_bounds(self, prim_path):
+        """获取prim的世界空间轴对齐包围盒 (最小点, 最大点)，没有几何范围时返回None"""
         stage = self.get_stage()
-        if not stage:
+        prim = stage.GetPrimAtPath(to_sdf_path(prim_path)) if stage else None
+        if not prim or not prim.IsValid():
+            return None
+        bbox_cache = UsdGeom.BBoxCache(Usd.TimeCode.Default(), [UsdGeom.Tokens.default_, UsdGeom.Tokens.render])
+        bounds = bbox_cache.ComputeWorldBound(prim).ComputeAlignedRange()
+        if bounds.IsEmpty():
+            return None
+        return tuple(bounds.GetMin()), tuple(bounds.GetMax())
+    
+    def query_lights_in_prim_bounds(self, prim_path, padding=0.0, select=True):
+        """查询落在prim（例如选中的网格）世界包围盒内的灯光，padding为向外扩展的距离"""
+        bounds = self.get_prim_world_bounds(prim_path)
+        if not bounds:
             return []
-            
-        lights = []
-        xform_prim = stage.GetPrimAtPath(xform_path)
-        
-        if xform_prim and xform_prim.IsValid():
-            def _collect_lights_recursive(prim):
-                if self._is_light_prim(prim):
-                    lights.append(prim)
-                for child_prim in prim.GetChildren():
-                    _collect_lights_recursive(child_prim)
-            
-            _collect_lights_recursive(xform_prim)
+        min_point = [value - padding for value in bounds[0]]
+        max_point = [value + padding for value in bounds[1]]
+        return self.query_lights_in_box(min_point, max_point, select=select)
+    
+    def query_lights_near_prim(self, prim_path, radius, select=True):
+        """查询与prim包围盒中心距离不超过radius的灯光"""
+        bounds = self.get_prim_world_bounds(prim_path)
+        if not bounds:
+            return []
+        center = [(lo + hi) * 0.5 for lo, hi in zip(*bounds)]
+        return self.query_lights_in_sphere(center, radius, select=select)
+    
+    def get_attribute_cache(self):
+        """获取当前舞台的灯光属性句柄缓存，舞台变化时重建"""
+        stage = self.get_stage()
+        if not stage:
+            return None
         
-        return lights
+        if self._attribute_cache is None or self._attribute_cache.stage != stage:
+            if self._attribute_cache:
+                self._attribute_cache.destroy()
+            self._attribute_cache = LightAttributeCache(stage, self._detect_schema_profile(stage))
+        return self._attribute_cache
+    
+    def _detect_schema_profile(self, stage):
+        """基于索引中的全部灯光检测舞台的UsdLux属性命名风格"""
+        index = self.get_light_index()
+        lights = index.get_all_lights_in_xform("/") if index else []
+        profile = LightSchemaProfile(stage, lights)
+        if profile.is_mixed:
+            print(f"舞台中混用了新旧两种UsdLux属性命名，将按灯光分别处理: {profile.get_mixed_layers()}")
+        return profile
+    
+    def get_sdf_writer(self):
+        """获取当前舞台的Sdf spec直接写入后端，舞台变化时重建"""
+        cache = self.get_attribute_cache()
+        if not cache:
+            return None
+        
+        if self._sdf_writer is None or self._sdf_writer.stage != cache.stage or \
+                self._sdf_writer.attribute_cache is not cache:
+            if self._sdf_writer:
+                self._sdf_writer.destroy()
+            self._sdf_writer = SdfLightWriter(cache.stage, cache)
+        return self._sdf_writer
+    
+    def get_visibility_service(self):
+        """获取当前舞台的灯光组可见性服务，舞台变化时重建"""
+        stage = self.get_stage()
+        if not stage:
+            return None
+        if self._visibility_service is None or self._visibility_service.stage != stage:
+            self._visibility_service = GroupVisibilityService(stage)
+        return self._visibility_service
+    
+    def get_timeline_baker(self):
+        """获取时间采样烘焙器，Sdf写入后端重建时随之重建"""
+        writer = self.get_sdf_writer()
+        if not writer:
+            return None
+        if self._timeline_baker is None or self._timeline_baker.sdf_writer is not writer:
+            self._timeline_baker = TimelineBaker(writer)
+        return self._timeline_baker
+    
+    def set_authoring_backend(self, backend):
+        """选择属性写入后端："usd"（Usd.Attribute.Set）或 "sdf"（直接写入Sdf spec，不安全时自动回退）"""
+        if backend not in ("usd", "sdf"):
+            raise ValueError(f"未知的写入后端: {backend}")
+        self.use_sdf_authoring = backend == "sdf"
+    
+    def get_schema_profile(self):
+        """获取当前舞台的UsdLux属性命名配置"""
+        cache = self.get_attribute_cache()
+        return cache.profile if cache else None
+    
+    def destroy(self):
+        """取消舞台事件订阅，释放索引、属性缓存及其通知监听，并丢弃未提交的预览编辑和独奏状态"""
+        if self._stage_events:
+            self._stage_events.destroy()
+            self._stage_events = None
+        self._warm_up_generation += 1
+        self.stage_changed_callbacks.clear()
+        self._release_stage_caches()
+    
+    def _release_stage_caches(self):
+        """释放与当前舞台绑定的状态和缓存，之后按需懒重建"""
+        try:
+            self.discard_preview()
+            self.restore_isolation()
+        except Exception as e:
+            print(f"撤销预览/独奏编辑失败: {str(e)}")
+        self.preview_layer = None
+        self._isolation = None
+        self.stop_journal()
+        if self._query_engine:
+            self._query_engine.destroy()
+            self._query_engine = None
+        if self._spatial_index:
+            self._spatial_index.destroy()
+            self._spatial_index = None
+        if self._sdf_writer:
+            self._sdf_writer.destroy()
+            self._sdf_writer = None
+        self._timeline_baker = None
+        self._visibility_service = None
+        if self._light_index:
+            self._light_index.destroy()
+            self._light_index = None
+        if self._attribute_cache:
+            self._attribute_cache.destroy()
+            self._attribute_cache = None
+    
+    def begin_preview(self, mode=MODE_SESSION):
+        """开始预览：之后的灯光编辑写入内存中的预览层，返回PreviewLayer"""
+        stage = self.get_stage()
+        if not stage:
+            return None
+        if self.preview_layer and self.preview_layer.is_active and self.preview_layer.stage == stage:
+            return self.preview_layer
+        self.discard_preview()
+        self.preview_layer = PreviewLayer(stage, mode)
+        self.preview_layer.begin()
+        return self.preview_layer
+    
+    def is_previewing(self):
+        """是否处于预览模式"""
+        return bool(self.preview_layer and self.preview_layer.is_active)
+    
+    @traced()
+    def commit_preview(self, target_layer=None):
+        """把预览层中的编辑合并到编辑目标layer，返回合并的属性数量"""
+        if not self.is_previewing():
+            return 0
+        try:
+            merged = self.preview_layer.commit(target_layer)
+            if self.journal and self._preview_journal:
+                self.journal.append([(path, prop, value) for (path, prop), value in self._preview_journal.items()])
+            self._preview_journal.clear()
+            return merged
+        except Exception as e:
+            print(f"提交预览编辑失败: {str(e)}")
+            return 0
+        finally:
+            if not self.preview_layer.is_active:
+                self.preview_layer = None
+    
+    def discard_preview(self):
+        """丢弃预览层中的全部编辑，预览期间的编辑也不会记入崩溃恢复日志"""
+        self._preview_journal.clear()
+        if not self.preview_layer:
+            return False
+        discarded = self.preview_layer.discard()
+        self.preview_layer = None
+        return discarded
+    
+    def get_light_isolation(self):
+        """获取当前舞台的独奏/静音状态，舞台变化时先恢复旧舞台"""
+        index = self.get_light_index()
+        if not index:
+            return None
+        if self._isolation is None or self._isolation.stage != index.stage:
+            if self._isolation:
+                self._isolation.restore()
+            self._isolation = LightIsolation(index.stage, index)
+        self._isolation.index = index
+        return self._isolation
+    
+    @traced()
+    def solo(self, paths, lights_path=None):
+        """只保留给定的房间/灯光组，停用灯光根下的其他子树，返回本次移出渲染的灯光数量"""
+        isolation = self.get_light_isolation()
+        if not isolation:
+            return 0
+        removed = isolation.solo(paths, lights_path or self.find_lights_path_in_stage())
+        self._prune_selected_lights()
+        return removed
+    
+    @traced()
+    def mute(self, paths):
+        """停用给定的房间/灯光组，返回本次移出渲染的灯光数量"""
+        isolation = self.get_light_isolation()
+        if not isolation:
+            return 0
+        removed = isolation.mute(paths)
+        self._prune_selected_lights()
+        return removed
+    
+    def restore_isolation(self):
+        """一步恢复所有被独奏/静音停用的子树，返回恢复的灯光数量"""
+        if not self._isolation:
+            return 0
+        return self._isolation.restore()
+    
+    def is_isolating(self):
+        """是否有被独奏/静音停用的子树"""
+        return bool(self._isolation and self._isolation.is_active)
+    
+    def get_isolated_light_count(self):
+        """获取当前被独奏/静音移出渲染的灯光数量"""
+        return self._isolation.get_removed_light_count() if self._isolation else 0
+    
+    def _prune_selected_lights(self):
+        """移除选择中已失效（被停用）的灯光"""
+        self.selected_lights = [light_prim for light_prim in self.selected_lights if light_prim]
+    
+    def _edit_context(self):
+        """灯光写入所用的编辑上下文：预览模式下指向预览层"""
+        if self.preview_layer:
+            return self.preview_layer.edit_context()
+        return contextlib.nullcontext()
+    
+    def _is_light_prim(self, prim):
+        """检查prim是否是灯光（按schema注册表分类，结果按prim类型缓存）"""
+        return self.light_classifier.get_light_type(prim) is not None
+    
+    def add_light_type(self, type_name):
+        """把没有注册schema的自定义类型名补充为灯光类型，并重建灯光索引"""
+        self.light_classifier.add_type_name(type_name)
+        if self._light_index:
+            self._light_index.rebuild()
+    
+    def get_xform_children_names(self, path):
+        """获取指定路径下的Xform类型子级名称列表"""
+        index = self.get_light_index()
+        if not index:
+            return []
+        return index.get_xform_children_names(path)
+    
+    def get_lights_in_xform(self, xform_path):
+        """获取指定Xform下的所有灯光（直接子级）"""
+        index = self.get_light_index()
+        if not index:
+            return []
+        return index.get_lights_in_xform(xform_path)
+    
+    def get_all_lights_in_xform(self, xform_path):
+        """获取指定Xform下的所有灯光（包括嵌套的子级）"""
+        index = self.get_light_index()
+        if not index:
+            return []
+        return index.get_all_lights_in_xform(xform_path)
     
     def get_light_names_in_xform(self, xform_path):
         """获取指定Xform下的所有灯光名称"""
@@ -86,63 +529,55 @@ class LightManager:
     
     def get_all_xforms_in_path(self, path):
         """获取指定路径下的所有Xform类型子级（包括嵌套的子级）"""
-        stage = self.get_stage()
-        if not stage:
+        index = self.get_light_index()
+        if not index:
             return []
-            
-        xforms = []
-        parent_prim = stage.GetPrimAtPath(path)
-        
-        if parent_prim and parent_prim.IsValid():
-            self._find_xforms_recursive(parent_prim, xforms)
-        
-        return xforms
-    
-    def _find_xforms_recursive(self, prim, xforms):
-        """递归查找Xform类型"""
-        if prim.IsA(UsdGeom.Xform):
-            xforms.append(prim)
-        
-        for child_prim in prim.GetChildren():
-            self._find_xforms_recursive(child_prim, xforms)
+        return index.get_all_xforms_in_path(path)
     
     def get_all_xform_names_in_path(self, path):
         """获取指定路径下的所有Xform类型子级名称（包括嵌套的子级）"""
         xforms = self.get_all_xforms_in_path(path)
         return [xform.GetName() for xform in xforms]
     
+    def get_lights_by_type(self, type_name):
+        """获取舞台中指定类型的所有灯光prim"""
+        index = self.get_light_index()
+        if not index:
+            return []
+        return [index.get_prim(path) for path in index.get_lights_by_type(type_name)]
+    
     def check_path_exists(self, path):
         """检查指定路径是否存在"""
         stage = self.get_stage()
         if not stage:
             return False
-            
-        prim = stage.GetPrimAtPath(path)
+        
+        sdf_path = to_sdf_path(path)
+        if sdf_path.isEmpty:
+            return False
+        prim = stage.GetPrimAtPath(sdf_path)
         return prim and prim.IsValid()
     
     def find_lights_path_in_stage(self):
         """在stage中查找lights路径"""
+        index = self.get_light_index()
+        if not index:
+            return None
+        
+        lights_root = index.find_lights_root()
+        if lights_root:
+            return lights_root
+        return "/World/lights"
+    
+    @traced()
+    def discover_light_layout(self, lights_path=None, predicate=None):
+        """单次遍历舞台，返回灯光根及完整的房间/灯光组/灯光布局"""
         stage = self.get_stage()
         if not stage:
             return None
-            
-        lights_paths = []
-        for prim in stage.Traverse():
-            if prim.IsA(UsdGeom.Xform):
-                prim_name = prim.GetName().lower()
-                if "light" in prim_name or "lights" in prim_name:
-                    lights_paths.append(str(prim.GetPath()))
-        
-        if lights_paths:
-            return lights_paths[0]
-        else:
-            for prim in stage.Traverse():
-                if prim.IsA(UsdGeom.Xform):
-                    for child in prim.GetChildren():
-                        if self._is_light_prim(child):
-                            return str(prim.GetPath())
         
-        return "/World/lights"
+        root_path = to_sdf_path(lights_path) if lights_path else None
+        return discover_light_layout(stage, self._is_light_prim, root_path=root_path, predicate=predicate)
     
     def get_room_names(self, lights_path):
         """获取一级目录下的房间名称（二级目录 - Xform类型）"""
@@ -156,224 +591,765 @@ class LightManager:
         """获取灯光组下的所有灯光"""
         return self.get_all_lights_in_xform(lighting_path)
     
-    def _get_light_attribute(self, light_prim, attr_names, default_value):
-        """通用方法获取灯光属性值"""
-        for attr_name in attr_names:
-            attr = light_prim.GetAttribute(attr_name)
-            if attr and attr.HasAuthoredValue():
-                try:
-                    return attr.Get()
-                except Exception as e:
-                    print(f"获取属性失败 {attr_name}: {str(e)}")
+    def _get_light_attribute(self, light_prim, prop, default_value):
+        """通过缓存的属性句柄获取灯光属性值"""
+        cache = self.get_attribute_cache()
+        attr = cache.get(light_prim, prop) if cache else None
+        if attr and attr.HasAuthoredValue():
+            try:
+                return attr.Get()
+            except Exception as e:
+                print(f"获取属性失败 {attr.GetName()}: {str(e)}")
         return default_value
 
-    def _set_light_attribute(self, light_prim, attr_names, value, value_type):
-        """通用方法设置灯光属性值"""
-        for attr_name in attr_names:
-            attr = light_prim.GetAttribute(attr_name)
-            if attr:
+    def _set_light_attribute(self, light_prim, prop, value):
+        """设置单个灯光的属性值"""
+        return self.set_group_attributes([light_prim], {prop: value}) > 0
+    
+    def _convert_attribute_value(self, prop, value):
+        """将逻辑属性值转换为USD属性值（NumPy标量先转为Python数值，Boost.Python不接受numpy.float32）"""
+        value_type = LIGHT_ATTRIBUTES[prop][1]
+        if value_type == Sdf.ValueTypeNames.Color3f:
+            return Gf.Vec3f(float(value[0]), float(value[1]), float(value[2]))
+        if value_type == Sdf.ValueTypeNames.Bool:
+            return bool(value)
+        return float(value)
+    
+    def _apply_attribute_writes(self, writes):
+        """在单个Sdf.ChangeBlock中写入已解析的 (属性, 值, 条目) 列表，返回写入成功的条目"""
+        written = []
+        with Sdf.ChangeBlock():
+            for attr, value, item in writes:
                 try:
                     attr.Set(value)
-                    return True
+                    written.append(item)
                 except Exception as e:
-                    print(f"设置属性失败 {attr_name}: {str(e)}")
+                    print(f"设置属性失败 {attr.GetPath()}: {str(e)}")
+        return written
+    
+    def _journal_written(self, items):
+        """把实际写入的条目记入崩溃恢复日志；预览期间先暂存，提交预览时才记录"""
+        if not self.journal or not items:
+            return
+        entries = [(light_prim.GetPath(), prop, value) for light_prim, prop, value in items]
+        if self.is_previewing():
+            self._preview_journal.update(((path, prop), value) for path, prop, value in entries)
+        else:
+            self.journal.append(entries)
+    
+    @traced()
+    def _author_light_values(self, items):
+        """写入 [(light_prim, 逻辑属性名, USD值), ...]，返回成功写入的属性数量
+
+        启用Sdf写入后端时先直接写入编辑目标layer的spec，无法确认安全的条目回退到Usd API。
+        Usd路径下属性先在变更块之外解析（必要时创建），然后在一个Sdf.ChangeBlock中写入。
+        实例中的灯光（实例代理）不能用Usd API编写，始终经由Sdf后端重定向到原型来源。
+        """
+        cache = self.get_attribute_cache()
+        if not cache or not items:
+            return 0
+        
+        written = []
+        with self._edit_context():
+            if self.use_sdf_authoring:
+                written, items = self.get_sdf_writer().author(items)
+                tracer.count("lights.sdf_writes", len(written))
+            elif any(is_instanced_light(light_prim) for light_prim, _, _ in items):
+                instanced = [item for item in items if is_instanced_light(item[0])]
+                items = [item for item in items if not is_instanced_light(item[0])]
+                written, _ = self.get_sdf_writer().author(instanced)
+                tracer.count("lights.sdf_writes", len(written))
+            
+            writes = []
+            for item in items:
+                light_prim, prop, value = item
+                attr = cache.get(light_prim, prop, create=True)
+                if attr:
+                    writes.append((attr, value, item))
+            if writes:
+                written = written + self._apply_attribute_writes(writes)
+                tracer.count("lights.usd_writes", len(writes))
+        
+        # 只记录实际写入的条目（被跳过的实例灯光等不会在恢复时重放）
+        self._journal_written(written)
+        return len(written)
+    
+    @traced()
+    def set_per_light_attributes(self, light_values):
+        """批量设置多个灯光各自的属性值
+
+        light_values: [(light_prim, {逻辑属性名: 值}), ...]
+        返回写入的灯光数量，所有值在一个变更块中写入，只产生一次变更通知。
+        """
+        items = []
+        updated_lights = set()
+        for light_prim, values in light_values:
+            if not light_prim or not self._is_light_prim(light_prim):
+                continue
+            for prop, value in values.items():
+                if prop not in LIGHT_ATTRIBUTES or value is None:
+                    continue
+                items.append((light_prim, prop, self._convert_attribute_value(prop, value)))
+                updated_lights.add(light_prim.GetPath())
+        
+        if not self._author_light_values(items):
+            return 0
+        return len(updated_lights)
+    
+    def set_group_attributes(self, light_prims, values):
+        """为一组灯光批量设置相同的属性值，例如 {"intensity": 20000, "exposure": 1.0}"""
+        return self.set_per_light_attributes([(light_prim, values) for light_prim in light_prims])
+    
+    @traced()
+    def get_attribute_columns(self, light_prims, props, defaults=None):
+        """一次读取一组灯光的多个属性，返回 {逻辑属性名: NumPy数组}
+
+        未编写值的属性使用与单灯光读取接口相同的默认值（defaults可补充其他属性的默认值），
+        颜色列的形状为 (N, 3)。
+        """
+        cache = self.get_attribute_cache()
+        count = len(light_prims)
+        defaults = DEFAULT_LIGHT_VALUES if defaults is None else {**DEFAULT_LIGHT_VALUES, **defaults}
+        columns = {}
+        for prop in props:
+            default_value = defaults[prop]
+            is_color = prop == "color"
+            values = np.empty((count, 3) if is_color else count, dtype=np.float32)
+            for row, light_prim in enumerate(light_prims):
+                attr = cache.get(light_prim, prop) if cache else None
+                value = attr.Get() if attr and attr.HasAuthoredValue() else None
+                if value is None:
+                    values[row] = default_value
+                elif is_color:
+                    values[row] = (value[0], value[1], value[2])
+                else:
+                    values[row] = value
+            columns[prop] = values
+        return columns
+    
+    @traced()
+    def analyze_lighting_budget(self, lights_path=None, by_group=False):
+        """按房间（by_group为True时按灯光组）统计灯光数量、有效强度、面光源面积和投射阴影的灯光数
+
+        返回按总有效强度（intensity × 2^exposure）从高到低排序的行，见 LightingBudgetAnalyzer.analyze。
+        """
+        index = self.get_light_index()
+        if not index:
+            return []
         
-        # 如果属性不存在，创建它
+        analyzer = LightingBudgetAnalyzer(
+            index, lambda light_prims, props: self.get_attribute_columns(light_prims, props, BUDGET_DEFAULTS))
         try:
-            attr = light_prim.CreateAttribute(attr_names[0], value_type)
-            attr.Set(value)
-            return True
+            return analyzer.analyze(lights_path or self.find_lights_path_in_stage(), by_group)
         except Exception as e:
-            print(f"创建属性失败 {attr_names[0]}: {str(e)}")
+            print(f"统计灯光预算失败: {str(e)}")
+            return []
+    
+    def export_lighting_budget_csv(self, file_path=None, lights_path=None, by_group=False, rows=None):
+        """把灯光预算导出为CSV（默认为舞台文件旁边的 *_lighting_budget.csv），返回 (文件路径, 行数)"""
+        file_path = file_path or get_default_budget_path(self.get_stage())
+        if not file_path:
+            raise ValueError("舞台尚未保存，请指定CSV文件路径")
+        if rows is None:
+            rows = self.analyze_lighting_budget(lights_path, by_group)
+        return file_path, write_budget_csv(rows, file_path)
+    
+    def get_point_instancer_info(self, light_prim):
+        """获取把灯光作为原型的PointInstancer信息，不是点实例灯光时返回None
+
+        返回 {"instancer", "proto_index", "prototype_count", "instance_count", "total_instances"}，
+        instance_count 为使用该原型的实例数量。
+        """
+        found = find_point_instancer(light_prim) if light_prim else None
+        if not found:
+            return None
+        instancer, proto_index = found
+        proto_indices = get_proto_indices(instancer)
+        return {
+            "instancer": str(instancer.GetPath()),
+            "proto_index": proto_index,
+            "prototype_count": len(instancer.GetPrototypesRel().GetForwardedTargets()),
+            "instance_count": int(np.count_nonzero(proto_indices == proto_index)),
+            "total_instances": len(proto_indices),
+        }
+    
+    def _get_instance_override_target(self, light_prim, prop):
+        """获取每实例覆盖所在的PointInstancer及primvar基础名（去掉inputs:前缀的USD属性名）"""
+        if prop not in LIGHT_ATTRIBUTES:
+            raise ValueError(f"未知的灯光属性: {prop}")
+        found = find_point_instancer(light_prim) if light_prim else None
+        if not found:
+            raise ValueError(f"灯光不是PointInstancer的原型: {light_prim.GetPath() if light_prim else None}")
+        attr_name = self.get_attribute_cache().get_attribute_name(light_prim, prop)
+        return found[0], attr_name[len("inputs:"):] if attr_name.startswith("inputs:") else attr_name
+    
+    def _get_prototype_defaults(self, instancer, prop):
+        """读取每个原型中第一个灯光的属性值，作为没有覆盖的实例的取值"""
+        index = self.get_light_index()
+        cache = self.get_attribute_cache()
+        is_color = prop == "color"
+        targets = instancer.GetPrototypesRel().GetForwardedTargets()
+        defaults = np.zeros((len(targets), 3) if is_color else len(targets), dtype=np.float32)
+        for proto_index, target in enumerate(targets):
+            light_paths = index.get_all_light_paths(target) if index else []
+            attr = cache.get(index.get_prim(light_paths[0]), prop) if light_paths else None
+            value = attr.Get() if attr else None
+            if value is None:
+                value = DEFAULT_LIGHT_VALUES.get(prop, 0.0)
+            defaults[proto_index] = (value[0], value[1], value[2]) if is_color else value
+        return defaults
+    
+    @traced()
+    def set_instance_light_overrides(self, light_prim, prop, instance_indices, values):
+        """为PointInstancer的部分实例覆盖灯光属性（写为instancer上的 primvars:light:<属性名>），返回写入的实例数量
+
+        values 可以是单个值或与 instance_indices 等长的序列；原型灯光本身不受影响，
+        新建覆盖时其余实例取各自原型灯光的当前值。
+        """
+        try:
+            instancer, base_name = self._get_instance_override_target(light_prim, prop)
+            count = len(instance_indices)
+            values = np.asarray(values, dtype=np.float32)
+            if prop == "color":
+                values = np.broadcast_to(values.reshape(-1, 3), (count, 3))
+            else:
+                values = np.broadcast_to(values.reshape(-1), (count,))
+            with self._edit_context():
+                return InstanceOverrides(instancer).set(base_name, LIGHT_ATTRIBUTES[prop][1], instance_indices,
+                                                        values, self._get_prototype_defaults(instancer, prop))
+        except Exception as e:
+            print(f"设置实例灯光覆盖失败: {str(e)}")
+            return 0
+    
+    def get_instance_light_overrides(self, light_prim, prop):
+        """读取PointInstancer上某个灯光属性的每实例覆盖数组，没有覆盖时返回None"""
+        try:
+            instancer, base_name = self._get_instance_override_target(light_prim, prop)
+            return InstanceOverrides(instancer).get(base_name)
+        except Exception as e:
+            print(f"读取实例灯光覆盖失败: {str(e)}")
+            return None
+    
+    def clear_instance_light_overrides(self, light_prim, prop=None):
+        """移除PointInstancer上的灯光覆盖（prop为None时移除全部），返回移除的primvar数量"""
+        try:
+            instancer, base_name = self._get_instance_override_target(light_prim, prop or "intensity")
+            with self._edit_context():
+                return InstanceOverrides(instancer).clear(base_name if prop else None)
+        except Exception as e:
+            print(f"清除实例灯光覆盖失败: {str(e)}")
+            return 0
+    
+    @traced()
+    def get_group_statistics(self, light_prims=None, props=None):
+        """统计一组灯光（默认为当前选中的灯光）的属性：{逻辑属性名: {"min", "max", "mean", "mixed"}}
+
+        优先使用查询引擎缓存的属性列，选择变化时只需一次索引取值；颜色按通道统计。
+        没有灯光时返回空字典。
+        """
+        if light_prims is None:
+            light_prims = self.selected_lights
+        props = list(props or DEFAULT_LIGHT_VALUES.keys())
+        lights = [light_prim for light_prim in light_prims if light_prim]
+        if not lights:
+            return {}
         
-        return False
+        engine = self.get_query_engine()
+        if engine:
+            statistics = engine.get_statistics([light_prim.GetPath() for light_prim in lights], props)
+            if statistics is not None:
+                return statistics
+        columns = self.get_attribute_columns(lights, props)
+        return {prop: summarize_values(values) for prop, values in columns.items()}
+    
+    @traced()
+    def set_attribute_columns(self, light_prims, columns):
+        """按列批量写入一组灯光的属性值，所有写入在一个Sdf.ChangeBlock中完成
+
+        columns: {逻辑属性名: 与light_prims等长的数组}，返回成功写入的灯光数量。
+        """
+        lights = [light_prim for light_prim in light_prims if light_prim and self._is_light_prim(light_prim)]
+        if len(lights) != len(light_prims):
+            keep = [i for i, light_prim in enumerate(light_prims) if light_prim and self._is_light_prim(light_prim)]
+            columns = {prop: np.asarray(values)[keep] for prop, values in columns.items()}
+        
+        items = []
+        for prop, values in columns.items():
+            if prop not in LIGHT_ATTRIBUTES:
+                continue
+            if prop == "color":
+                converted = [Gf.Vec3f(r, g, b) for r, g, b in np.asarray(values, dtype=np.float64).tolist()]
+            elif LIGHT_ATTRIBUTES[prop][1] == Sdf.ValueTypeNames.Bool:
+                converted = [bool(v) for v in np.asarray(values).tolist()]
+            else:
+                converted = np.asarray(values, dtype=np.float64).tolist()
+            items.extend((light_prim, prop, value) for light_prim, value in zip(lights, converted))
+        
+        if not self._author_light_values(items):
+            return 0
+        return len(lights)
+    
+    @traced()
+    def scale_group_attribute(self, light_prims, prop, scale=1.0, offset=0.0, gamma=1.0,
+                              min_value=None, max_value=None, base_values=None):
+        """相对编辑一组灯光的数值属性，保持组内灯光之间的比例
+
+        base_values为None时先批量读取当前值；拖动滑块时可传入固定的基准值，
+        避免误差累积。未指定钳制范围时使用RELATIVE_EDIT_RANGES中的默认范围。
+        """
+        if prop not in RELATIVE_EDIT_RANGES or not light_prims:
+            return 0
+        
+        default_min, default_max = RELATIVE_EDIT_RANGES[prop]
+        if min_value is None:
+            min_value = default_min
+        if max_value is None:
+            max_value = default_max
+        
+        if base_values is None:
+            base_values = self.get_attribute_columns(light_prims, [prop])[prop]
+        new_values = compute_relative_values(base_values, scale, offset, gamma, min_value, max_value)
+        return self.set_attribute_columns(light_prims, {prop: new_values})
     
     def set_light_color(self, light_prim, color):
         """设置灯光颜色"""
-        if self._is_light_prim(light_prim):
-            return self._set_light_attribute(
-                light_prim, 
-                ["inputs:color", "color"], 
-                Gf.Vec3f(color[0], color[1], color[2]),
-                Sdf.ValueTypeNames.Color3f
-            )
-        return False
+        return self._set_light_attribute(light_prim, "color", color)
     
     def set_light_intensity(self, light_prim, intensity):
         """设置灯光强度"""
-        if self._is_light_prim(light_prim):
-            return self._set_light_attribute(
-                light_prim,
-                ["inputs:intensity", "intensity"],
-                float(intensity),
-                Sdf.ValueTypeNames.Float
-            )
-        return False
+        return self._set_light_attribute(light_prim, "intensity", intensity)
     
     def set_light_enabled(self, light_prim, enabled):
         """启用或禁用灯光"""
         if light_prim:
-            imageable = UsdGeom.Imageable(light_prim)
-            if enabled:
-                imageable.MakeVisible()
-            else:
-                imageable.MakeInvisible()
+            self.set_lights_enabled([light_prim], enabled)
+    
+    @traced()
+    def set_lights_enabled(self, light_prims, enabled):
+        """批量启用或禁用一组灯光，所有可见性写入在一个变更块中完成，返回写入的属性数量"""
+        service = self.get_visibility_service()
+        if not service or not light_prims:
+            return 0
+        with self._edit_context():
+            written = service.set_visibility(light_prims, enabled)
+        tracer.count("lights.visibility_writes", written)
+        return written
     
     def enable_color_temperature(self, light_prim, enabled):
         """启用或禁用色温"""
-        if self._is_light_prim(light_prim):
-            return self._set_light_attribute(
-                light_prim,
-                ["inputs:enableColorTemperature", "enableColorTemperature"],
-                bool(enabled),
-                Sdf.ValueTypeNames.Bool
-            )
-        return False
+        return self._set_light_attribute(light_prim, "enable_color_temperature", enabled)
     
     def set_color_temperature(self, light_prim, temperature):
         """设置色温"""
-        if self._is_light_prim(light_prim):
-            return self._set_light_attribute(
-                light_prim,
-                ["inputs:colorTemperature", "colorTemperature"],
-                float(temperature),
-                Sdf.ValueTypeNames.Float
-            )
-        return False
+        return self._set_light_attribute(light_prim, "color_temperature", temperature)
     
     def set_exposure(self, light_prim, exposure):
         """设置曝光值"""
-        if self._is_light_prim(light_prim):
-            return self._set_light_attribute(
-                light_prim,
-                ["inputs:exposure", "exposure"],
-                float(exposure),
-                Sdf.ValueTypeNames.Float
-            )
-        return False
+        return self._set_light_attribute(light_prim, "exposure", exposure)
     
     def set_specular(self, light_prim, specular):
         """设置高光强度"""
-        if self._is_light_prim(light_prim):
-            return self._set_light_attribute(
-                light_prim,
-                ["inputs:specular", "specular"],
-                float(specular),
-                Sdf.ValueTypeNames.Float
-            )
-        return False
+        return self._set_light_attribute(light_prim, "specular", specular)
     
     def get_light_color(self, light_prim):
         """获取灯光颜色"""
         if self._is_light_prim(light_prim):
-            result = self._get_light_attribute(light_prim, ["inputs:color", "color"], None)
+            result = self._get_light_attribute(light_prim, "color", None)
             if result is not None:
                 return [result[0], result[1], result[2]]
         return [1.0, 1.0, 1.0]
     
     def get_light_intensity(self, light_prim):
         """获取灯光强度"""
-        return self._get_light_attribute(light_prim, ["inputs:intensity", "intensity"], 15000.0)
+        return self._get_light_attribute(light_prim, "intensity", 15000.0)
     
     def get_light_exposure(self, light_prim):
         """获取灯光曝光值"""
-        return self._get_light_attribute(light_prim, ["inputs:exposure", "exposure"], 1.0)
+        return self._get_light_attribute(light_prim, "exposure", 1.0)
     
     def get_light_color_temperature(self, light_prim):
         """获取灯光色温"""
-        return self._get_light_attribute(light_prim, ["inputs:colorTemperature", "colorTemperature"], 6500.0)
+        return self._get_light_attribute(light_prim, "color_temperature", 6500.0)
     
     def is_color_temperature_enabled(self, light_prim):
         """检查色温是否启用"""
-        return self._get_light_attribute(light_prim, ["inputs:enableColorTemperature", "enableColorTemperature"], True)
+        return self._get_light_attribute(light_prim, "enable_color_temperature", True)
     
     def get_light_specular(self, light_prim):
         """获取灯光高光强度"""
-        return self._get_light_attribute(light_prim, ["inputs:specular", "specular"], 1.0)
+        return self._get_light_attribute(light_prim, "specular", 1.0)
     
     def is_light_enabled(self, light_prim):
         """检查灯光是否启用"""
         if light_prim:
-            imageable = UsdGeom.Imageable(light_prim)
-            return imageable.ComputeVisibility() != "invisible"
+            return self.get_lights_enabled([light_prim])[0]
         return False
     
+    @traced()
+    def get_lights_enabled(self, light_prims):
+        """批量计算一组灯光是否启用，同一祖先的可见性只求值一次"""
+        service = self.get_visibility_service()
+        if not service:
+            return [False] * len(light_prims)
+        return service.compute_visibility(light_prims)
+    
     def reset_light(self, light_prim):
         """重置单个灯光到默认值"""
         if self._is_light_prim(light_prim):
-            self.set_light_color(light_prim, [1.0, 1.0, 1.0])
-            self.set_light_intensity(light_prim, 15000.0)
-            self.set_exposure(light_prim, 1.0)
-            self.set_color_temperature(light_prim, 6500.0)
-            self.set_specular(light_prim, 1.0)
-            self.enable_color_temperature(light_prim, True)
+            self.set_group_attributes([light_prim], DEFAULT_LIGHT_VALUES)
             self.set_light_enabled(light_prim, True)
     
     def reset_all_lights(self):
         """重置所有灯光到默认值"""
-        for light_prim in self.selected_lights:
-            self.reset_light(light_prim)
+        self.set_group_attributes(self.selected_lights, DEFAULT_LIGHT_VALUES)
+        self.set_lights_enabled(self.selected_lights, True)
+    
+    @traced()
+    def capture_snapshot(self, name=None, light_prims=None):
+        """把灯光的当前值捕获为列式快照，指定name时保存为命名快照"""
+        if light_prims is None:
+            light_prims = self.selected_lights
+        
+        columns = self.get_attribute_columns(light_prims, SNAPSHOT_PROPERTIES)
+        snapshot = LightSnapshot([str(light_prim.GetPath()) for light_prim in light_prims], columns)
+        if name:
+            self.snapshots.put(name, snapshot)
+        return snapshot
     
+    @traced()
+    def restore_snapshot(self, snapshot, light_prims=None):
+        """把快照恢复到灯光上，light_prims为None时恢复快照中的全部灯光
+
+        snapshot可以是快照对象或命名快照的名称，返回恢复的灯光数量。
+        """
+        if isinstance(snapshot, str):
+            snapshot = self.snapshots.get(snapshot)
+        stage = self.get_stage()
+        if not snapshot or not len(snapshot) or not stage:
+            return 0
+        
+        if light_prims is None:
+            lights = [stage.GetPrimAtPath(path) for path in snapshot.paths.tolist()]
+            rows = np.arange(len(snapshot))
+            valid = [i for i, light_prim in enumerate(lights) if light_prim]
+            lights = [lights[i] for i in valid]
+            rows = rows[valid]
+        else:
+            positions, rows = snapshot.get_rows([light_prim.GetPath() for light_prim in light_prims])
+            lights = [light_prims[i] for i in positions]
+        
+        if not lights:
+            return 0
+        columns = {prop: values[rows] for prop, values in snapshot.columns.items()}
+        return self.set_attribute_columns(lights, columns)
+    
+    def list_snapshots(self):
+        """列出命名快照"""
+        return self.snapshots.names()
+    
+    def delete_snapshot(self, name):
+        """删除命名快照"""
+        return self.snapshots.remove(name)
+    
+    def save_snapshots(self, directory=None):
+        """把命名快照保存为舞台文件旁边的.npz文件"""
+        return self.snapshots.save_all(self.get_stage(), directory)
+    
+    def load_snapshots(self, directory=None):
+        """读取舞台文件旁边的.npz快照文件"""
+        return self.snapshots.load_all(self.get_stage(), directory)
+    
+    def get_lighting_looks(self, lights_path=None):
+        """获取灯光根上的灯光方案集合"""
+        stage = self.get_stage()
+        if not stage:
+            return None
+        return LightingLooks(stage, lights_path or self.find_lights_path_in_stage())
+    
+    @traced()
+    def capture_lighting_look(self, name, light_prims=None, lights_path=None, replace=None):
+        """把灯光的当前值保存为灯光根上的方案变体，light_prims为None时保存灯光根下全部灯光
+
+        replace默认在保存全部灯光时整体替换方案，只保存部分灯光（房间/灯光组）时合并到已有方案。
+        方案直接写入舞台的编辑目标（不经过预览层），返回写入的属性数量。
+        灯光上已有的本地值不会被改动，它们会遮挡方案，见 get_lighting_look_overrides。
+        """
+        looks = self.get_lighting_looks(lights_path)
+        cache = self.get_attribute_cache()
+        if not looks or not cache or not name:
+            return 0
+        
+        if replace is None:
+            replace = light_prims is None
+        if light_prims is None:
+            light_prims = self.get_all_lights_in_xform(looks.root_path)
+        if not light_prims:
+            return 0
+        
+        props = SNAPSHOT_PROPERTIES + ("enable_color_temperature",)
+        columns = self.get_attribute_columns(light_prims, props)
+        entries = []
+        for prop in props:
+            type_name = LIGHT_ATTRIBUTES[prop][1]
+            values = columns[prop]
+            for row, light_prim in enumerate(light_prims):
+                entries.append((light_prim.GetPath(), cache.get_attribute_name(light_prim, prop), type_name,
+                                self._convert_attribute_value(prop, values[row])))
+        
+        try:
+            written = looks.capture(name, entries, replace=replace)
+        except Exception as e:
+            print(f"保存灯光方案失败 {name}: {str(e)}")
+            return 0
+        self._warn_look_overrides(looks, name)
+        return written
+    
+    def _warn_look_overrides(self, looks, name):
+        """提示方案中被本地值遮挡的属性数量"""
+        try:
+            overrides = looks.find_overrides(name)
+        except Exception as e:
+            print(f"检查灯光方案遮挡失败 {name}: {str(e)}")
+            return
+        if overrides:
+            print(f"灯光方案 '{name}' 中有 {len(overrides)} 个属性被本地值遮挡，切换方案对它们无效，"
+                  f"可以清除本地覆盖: {overrides[0]}")
+    
+    def get_lighting_look_overrides(self, name=None, lights_path=None):
+        """列出方案（默认为当前方案）中被更强的本地值遮挡的属性路径"""
+        looks = self.get_lighting_looks(lights_path)
+        name = name or (looks.get_current_look() if looks else None)
+        if not looks or not name:
+            return []
+        try:
+            return looks.find_overrides(name)
+        except Exception as e:
+            print(f"检查灯光方案遮挡失败 {name}: {str(e)}")
+            return []
+    
+    @traced()
+    def clear_lighting_look_overrides(self, name=None, lights_path=None):
+        """显式清除编辑目标中遮挡方案（默认为当前方案）的本地值，返回清除的属性数量"""
+        looks = self.get_lighting_looks(lights_path)
+        name = name or (looks.get_current_look() if looks else None)
+        if not looks or not name:
+            return 0
+        try:
+            return looks.clear_overrides(name)
+        except Exception as e:
+            print(f"清除灯光方案的本地覆盖失败 {name}: {str(e)}")
+            return 0
+    
+    def list_lighting_looks(self, lights_path=None):
+        """列出灯光根上保存的方案"""
+        looks = self.get_lighting_looks(lights_path)
+        return looks.get_look_names() if looks else []
+    
+    def get_current_lighting_look(self, lights_path=None):
+        """获取当前选择的方案"""
+        looks = self.get_lighting_looks(lights_path)
+        return looks.get_current_look() if looks else None
+    
+    @traced()
+    def switch_lighting_look(self, name, lights_path=None):
+        """切换灯光方案，只修改一次变体选择"""
+        looks = self.get_lighting_looks(lights_path)
+        if not looks:
+            return False
+        try:
+            switched = looks.switch(name)
+        except Exception as e:
+            print(f"切换灯光方案失败 {name}: {str(e)}")
+            return False
+        if switched and name:
+            self._warn_look_overrides(looks, name)
+        return switched
+    
+    def delete_lighting_look(self, name, lights_path=None):
+        """删除灯光方案"""
+        looks = self.get_lighting_looks(lights_path)
+        if not looks:
+            return False
+        try:
+            return looks.delete(name)
+        except Exception as e:
+            print(f"删除灯光方案失败 {name}: {str(e)}")
+            return False
+    
+    def _filter_lights(self, light_prims):
+        """过滤出有效的灯光，默认为当前选中的灯光"""
+        if light_prims is None:
+            light_prims = self.selected_lights
+        return [light_prim for light_prim in light_prims if light_prim and self._is_light_prim(light_prim)]
+    
+    @traced()
+    def bake_curve(self, prop, end_value, start_time, end_time, curve="linear", start_value=None,
+                   step=1.0, light_prims=None):
+        """按曲线把属性从start_value渐变到end_value，烘焙为每个灯光的时间采样，返回写入的灯光数量
+
+        start_value为None时从每个灯光的当前值开始（各灯光的起点可以不同）；
+        curve为 linear / ease_in / ease_out / ease_in_out，step为采样间隔（时间码）。
+        """
+        lights = self._filter_lights(light_prims)
+        baker = self.get_timeline_baker()
+        if not lights or not baker:
+            return 0
+        if start_value is None:
+            start_value = self.get_attribute_columns(lights, [prop])[prop]
+        times, values = sample_curve(curve, start_time, end_time, start_value, end_value, step)
+        with self._edit_context():
+            written = baker.bake(lights, prop, times, values)
+        tracer.count("lights.time_samples", written * len(times))
+        return written
+    
+    def record_timeline_value(self, prop, value, time):
+        """在time时间码记录灯光组的属性值，供bake_recording烘焙"""
+        self.timeline_recorder.record(prop, time, value)
+    
+    @traced()
+    def bake_recording(self, light_prims=None, clear=True):
+        """把记录的属性变化烘焙为灯光组的时间采样（每个属性一个变更块），返回写入的灯光属性数量"""
+        lights = self._filter_lights(light_prims)
+        baker = self.get_timeline_baker()
+        if not lights or not baker:
+            return 0
+        written = 0
+        with self._edit_context():
+            for prop in self.timeline_recorder.get_properties():
+                times, values = self.timeline_recorder.get_keys(prop)
+                written += baker.bake(lights, prop, times, values)
+        if clear:
+            self.timeline_recorder.clear()
+        return written
+    
+    @traced()
+    def clear_time_samples(self, props=None, start_time=None, end_time=None, light_prims=None):
+        """清除灯光组在编辑目标中的时间采样（可指定时间范围），返回清除的采样数量"""
+        lights = self._filter_lights(light_prims)
+        baker = self.get_timeline_baker()
+        if not lights or not baker:
+            return 0
+        cleared = 0
+        with self._edit_context():
+            for prop in props or BAKEABLE_PROPERTIES:
+                cleared += baker.clear(lights, prop, start_time, end_time)
+        return cleared
+    
+    @traced()
+    def resample_time_samples(self, step, props=None, start_time=None, end_time=None, light_prims=None):
+        """以step为间隔对灯光组已有的时间采样重新采样，返回处理的灯光属性数量"""
+        lights = self._filter_lights(light_prims)
+        baker = self.get_timeline_baker()
+        if not lights or not baker:
+            return 0
+        resampled = 0
+        with self._edit_context():
+            for prop in props or BAKEABLE_PROPERTIES:
+                resampled += baker.resample(lights, prop, step, start_time, end_time)
+        return resampled
+    
+    def start_journal(self, file_path=None):
+        """开始把灯光编辑追加到崩溃恢复日志（默认为舞台文件旁边的.lightjournal），返回日志路径"""
+        file_path = file_path or get_default_journal_path(self.get_stage())
+        if not file_path:
+            return None
+        if self.journal and self.journal.file_path != file_path:
+            self.stop_journal()
+        if not self.journal:
+            self.journal = EditJournal(file_path)
+            self.journal.open()
+        return file_path
+    
+    def stop_journal(self):
+        """写完并关闭编辑日志"""
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+    
+    def get_recoverable_edit_count(self, file_path=None):
+        """获取日志中可恢复的灯光属性数量（每个灯光属性只计最后一次写入）"""
+        file_path = file_path or get_default_journal_path(self.get_stage())
+        if not file_path:
+            return 0
+        if self.journal and self.journal.file_path == file_path:
+            latest = self.journal.get_latest_values()
+        else:
+            try:
+                latest = get_latest_values(read_journal(file_path)[0])
+            except Exception as e:
+                print(f"读取灯光编辑日志失败: {str(e)}")
+                return 0
+        return sum(len(props) for props in latest.values())
+    
+    @traced()
+    def replay_journal(self, file_path=None):
+        """把日志中每个灯光属性最后写入的值批量回放到当前舞台（一个变更块），返回回放的灯光数量"""
+        stage = self.get_stage()
+        file_path = file_path or get_default_journal_path(stage)
+        if not stage or not file_path:
+            return 0
+        if self.journal and self.journal.file_path == file_path:
+            latest = self.journal.get_latest_values()
+        else:
+            latest = get_latest_values(read_journal(file_path)[0])
+        
+        light_values = []
+        for path, props in latest.items():
+            light_prim = stage.GetPrimAtPath(path)
+            if not light_prim:
+                continue
+            values = {prop: value if len(value) > 1 else value[0]
+                      for prop, value in props.items() if prop in LIGHT_ATTRIBUTES}
+            light_values.append((light_prim, values))
+        
+        # 回放的值已经在日志中，不再重复记录
+        journal_enabled = self.journal.enabled if self.journal else False
+        if self.journal:
+            self.journal.enabled = False
+        try:
+            return self.set_per_light_attributes(light_values)
+        finally:
+            if self.journal:
+                self.journal.enabled = journal_enabled
+    
+    def compact_journal(self):
+        """把编辑日志压缩为每个灯光属性的最后一个值，返回保留的条目数量"""
+        return self.journal.compact() if self.journal else 0
+    
+    def clear_journal(self):
+        """清空编辑日志（舞台保存之后日志中的编辑已经落盘）"""
+        if self.journal:
+            self.journal.clear()
+    
+    @traced()
     def record_current_values_as_defaults(self):
         """记录当前选中灯光的强度、色温等属性值作为默认值"""
         if not self.selected_lights:
             return False
         
-        for light_prim in self.selected_lights:
-            light_path = str(light_prim.GetPath())
-            intensity = self.get_light_intensity(light_prim)
-            color_temp = self.get_light_color_temperature(light_prim)
-            color = self.get_light_color(light_prim)
-            exposure = self.get_light_exposure(light_prim)
-            specular = self.get_light_specular(light_prim)
-            
-            self.light_defaults[light_path] = {
-                "intensity": intensity,
-                "color_temperature": color_temp,
-                "color": color.copy() if color else [1.0, 1.0, 1.0],
-                "exposure": exposure,
-                "specular": specular
-            }
-        
+        snapshot = self.capture_snapshot()
+        recorded = self.snapshots.get(DEFAULTS_SNAPSHOT)
+        self.snapshots.put(DEFAULTS_SNAPSHOT, recorded.merged(snapshot) if recorded else snapshot)
         return True
     
+    @traced()
     def reset_to_recorded_defaults(self):
         """将选中的灯光重置到之前记录的默认值"""
         if not self.selected_lights:
             return False
-        
-        success_count = 0
-        for light_prim in self.selected_lights:
-            light_path = str(light_prim.GetPath())
-            if light_path in self.light_defaults:
-                defaults = self.light_defaults[light_path]
-                
-                if "color" in defaults:
-                    self.set_light_color(light_prim, defaults["color"])
-                if "intensity" in defaults:
-                    self.set_light_intensity(light_prim, defaults["intensity"])
-                if "color_temperature" in defaults:
-                    self.set_color_temperature(light_prim, defaults["color_temperature"])
-                if "exposure" in defaults:
-                    self.set_exposure(light_prim, defaults["exposure"])
-                if "specular" in defaults:
-                    self.set_specular(light_prim, defaults["specular"])
-                
-                success_count += 1
-        
-        return success_count > 0
+        return self.restore_snapshot(DEFAULTS_SNAPSHOT, self.selected_lights) > 0
     
     def has_recorded_defaults(self):
         """检查当前选中的灯光是否有记录的默认值"""
-        if not self.selected_lights:
+        recorded = self.snapshots.get(DEFAULTS_SNAPSHOT)
+        if not self.selected_lights or not recorded:
             return False
         
         for light_prim in self.selected_lights:
-            light_path = str(light_prim.GetPath())
-            if light_path in self.light_defaults:
+            if recorded.contains(light_prim.GetPath()):
                 return True
         return False
     
     def clear_recorded_defaults(self):
         """清除所有记录的默认值"""
-        self.light_defaults.clear()
\ No newline at end of file
+        self.snapshots.remove(DEFAULTS_SNAPSHOT)
@@ -0,0 +1,288 @@
+import fnmatch
+import numbers
+
+import numpy as np
+from pxr import Usd, Sdf, Tf
+from typing import Callable, Dict, List, Optional
+
+from .attribute_cache import LIGHT_ATTRIBUTES
+from .light_index import LightIndex, to_sdf_path
+
+
+# 支持范围查询的数值属性
+QUERYABLE_PROPERTIES = ("intensity", "exposure", "specular", "color_temperature")
+
+_RANGE_OPERATORS = (">", ">=", "<", "<=", "==", "!=")
+
+# 判断组内数值是否不一致时的相对容差（属性以float32存储）
+MIXED_TOLERANCE = 1e-5
+
+
+def summarize_values(values):
+    """统计一列值：{"min", "max", "mean", "mixed"}，颜色列 (N, 3) 按通道统计并返回列表"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return None
+    min_value = values.min(axis=0)
+    max_value = values.max(axis=0)
+    mean_value = values.mean(axis=0)
+    tolerance = MIXED_TOLERANCE * np.maximum(np.abs(max_value), 1.0)
+    mixed = bool(np.any(max_value - min_value > tolerance))
+    if values.ndim > 1:
+        return {"min": min_value.tolist(), "max": max_value.tolist(), "mean": mean_value.tolist(), "mixed": mixed}
+    return {"min": float(min_value), "max": float(max_value), "mean": float(mean_value), "mixed": mixed}
+
+
+class LightQueryEngine:
+    """基于LightIndex的灯光查询引擎，查询时不遍历舞台
+
+    按类型、名称、房间、灯光组建立倒排索引，按属性值建立排序数组（二分查找做范围查询）。
+    层次结构变化（LightIndex的generation变化）时整体重建；属性值变化只标记对应的灯光行，
+    下次查询前重新读取这些行并重新排序。同一份属性列也用于灯光组统计。
+    """
+
+    def __init__(self, index: LightIndex, read_columns_fn: Callable, lights_root=None):
+        self.index = index
+        self.stage = index.stage
+        self._read_columns = read_columns_fn
+        self.lights_root = to_sdf_path(lights_root) if lights_root else None
+
+        self._generation = None
+        self._paths: List[Sdf.Path] = []
+        self._rows: Dict[Sdf.Path, int] = {}
+        self._type_rows: Dict[str, np.ndarray] = {}
+        self._name_rows: Dict[str, np.ndarray] = {}
+        self._room_rows: Dict[str, np.ndarray] = {}
+        self._group_rows: Dict[str, np.ndarray] = {}
+
+        # 属性 -> 每行的值 / 按值排序后的行号 / 排序后的值
+        self._values: Dict[str, np.ndarray] = {}
+        self._sorted_rows: Dict[str, np.ndarray] = {}
+        self._sorted_values: Dict[str, np.ndarray] = {}
+        self._dirty_rows = set()
+
+        self._listener = None
+        if self.stage:
+            self._listener = Tf.Notice.Register(Usd.Notice.ObjectsChanged, self._on_objects_changed, self.stage)
+
+    def destroy(self):
+        """注销通知监听并清空索引"""
+        if self._listener:
+            self._listener.Revoke()
+            self._listener = None
+        self._generation = None
+        self._paths = []
+        self._rows.clear()
+        self._values.clear()
+        self._sorted_rows.clear()
+        self._sorted_values.clear()
+        self._dirty_rows.clear()
+
+    def set_lights_root(self, lights_root):
+        """设置用于划分房间/灯光组的灯光根"""
+        lights_root = to_sdf_path(lights_root) if lights_root else None
+        if lights_root != self.lights_root:
+            self.lights_root = lights_root
+            self._generation = None
+
+    # ------------------------------------------------------------------
+    # 索引构建
+    # ------------------------------------------------------------------
+
+    def _ensure_index(self):
+        """层次结构变化后重建倒排索引，属性索引改为按需读取"""
+        if self._generation == self.index.generation:
+            return
+        self._generation = self.index.generation
+
+        self._paths = self.index.get_all_light_paths(Sdf.Path.absoluteRootPath)
+        self._rows = {path: row for row, path in enumerate(self._paths)}
+        self._values.clear()
+        self._sorted_rows.clear()
+        self._sorted_values.clear()
+        self._dirty_rows.clear()
+
+        type_rows, name_rows, room_rows, group_rows = {}, {}, {}, {}
+        root = self.lights_root
+        root_depth = root.pathElementCount if root else 0
+        for row, path in enumerate(self._paths):
+            type_rows.setdefault(self.index.get_light_type(path).lower(), []).append(row)
+            name_rows.setdefault(path.name.lower(), []).append(row)
+            if root is None or not path.HasPrefix(root):
+                continue
+            depth = path.pathElementCount - root_depth
+            if depth < 2:
+                continue
+            prefixes = path.GetPrefixes()
+            room_rows.setdefault(prefixes[root_depth].name.lower(), []).append(row)
+            if depth >= 3:
+                group_rows.setdefault(prefixes[root_depth + 1].name.lower(), []).append(row)
+
+        def _to_arrays(buckets):
+            return {key: np.asarray(rows, dtype=np.int64) for key, rows in buckets.items()}
+
+        self._type_rows = _to_arrays(type_rows)
+        self._name_rows = _to_arrays(name_rows)
+        self._room_rows = _to_arrays(room_rows)
+        self._group_rows = _to_arrays(group_rows)
+
+    def _ensure_values(self, prop):
+        """读取全部灯光的属性列，只重新读取值发生变化的行"""
+        if prop not in LIGHT_ATTRIBUTES:
+            raise ValueError(f"未知的灯光属性: {prop}")
+
+        if self._dirty_rows and self._values:
+            rows = sorted(self._dirty_rows)
+            prims = [self.index.get_prim(self._paths[row]) for row in rows]
+            columns = self._read_columns(prims, list(self._values.keys()))
+            for dirty_prop, dirty_values in self._values.items():
+                dirty_values[rows] = columns[dirty_prop]
+                self._sorted_rows.pop(dirty_prop, None)
+        self._dirty_rows.clear()
+
+        values = self._values.get(prop)
+        if values is None:
+            prims = [self.index.get_prim(path) for path in self._paths]
+            values = np.asarray(self._read_columns(prims, [prop])[prop], dtype=np.float64)
+            self._values[prop] = values
+            self._sorted_rows.pop(prop, None)
+        return values
+
+    def _ensure_attribute_index(self, prop):
+        """读取属性列并建立排序数组"""
+        if prop not in QUERYABLE_PROPERTIES:
+            raise ValueError(f"不支持按属性查询: {prop}")
+
+        values = self._ensure_values(prop)
+        if prop not in self._sorted_rows:
+            order = np.argsort(values, kind="stable")
+            self._sorted_rows[prop] = order
+            self._sorted_values[prop] = values[order]
+
+    def _on_objects_changed(self, notice, stage):
+        """Tf.Notice回调：记录属性值发生变化的灯光行，原型中的变化映射到全部实例代理的行"""
+        if stage != self.stage or self._generation is None or not self._values:
+            return
+        # 新建属性spec时属性路径出现在resync列表中
+        for path in list(notice.GetChangedInfoOnlyPaths()) + list(notice.GetResyncedPaths()):
+            if path.IsPropertyPath():
+                prim_path = path.GetPrimPath()
+                row = self._rows.get(prim_path)
+                if row is not None:
+                    self._dirty_rows.add(row)
+                for proxy_path in self.index.get_instance_proxy_paths(prim_path):
+                    row = self._rows.get(proxy_path)
+                    if row is not None:
+                        self._dirty_rows.add(row)
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _match_keys(buckets, patterns):
+        """按fnmatch模式（不区分大小写）匹配倒排索引的键，返回命中的行"""
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        matched = []
+        for pattern in patterns:
+            pattern = pattern.lower()
+            if pattern in buckets:
+                matched.append(buckets[pattern])
+                continue
+            for key in fnmatch.filter(buckets.keys(), pattern):
+                matched.append(buckets[key])
+        if not matched:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(matched)
+
+    def _range_rows(self, prop, condition):
+        """属性范围查询，condition为 (运算符, 值)、(下限, 上限) 或单个值（相等）"""
+        self._ensure_attribute_index(prop)
+        sorted_values = self._sorted_values[prop]
+        sorted_rows = self._sorted_rows[prop]
+
+        if isinstance(condition, numbers.Number):
+            condition = ("==", condition)
+        first, second = condition
+        if first in _RANGE_OPERATORS:
+            value = float(second)
+            if first == ">":
+                return sorted_rows[np.searchsorted(sorted_values, value, side="right"):]
+            if first == ">=":
+                return sorted_rows[np.searchsorted(sorted_values, value, side="left"):]
+            if first == "<":
+                return sorted_rows[:np.searchsorted(sorted_values, value, side="left")]
+            if first == "<=":
+                return sorted_rows[:np.searchsorted(sorted_values, value, side="right")]
+            lo = np.searchsorted(sorted_values, value, side="left")
+            hi = np.searchsorted(sorted_values, value, side="right")
+            if first == "==":
+                return sorted_rows[lo:hi]
+            return np.concatenate([sorted_rows[:lo], sorted_rows[hi:]])
+
+        # (下限, 上限)，None表示不限制，两端都包含
+        lo = 0 if first is None else np.searchsorted(sorted_values, float(first), side="left")
+        hi = len(sorted_values) if second is None else np.searchsorted(sorted_values, float(second), side="right")
+        return sorted_rows[lo:hi]
+
+    def query_paths(self, type=None, name=None, room=None, group=None, **attribute_filters) -> List[Sdf.Path]:
+        """按条件查询灯光路径（保持舞台顺序），所有条件取交集
+
+        type/name/room/group 可以是单个fnmatch模式或模式列表，
+        属性条件例如 intensity=(">", 20000)、exposure=(-1, 1)、specular=1.0。
+        """
+        self._ensure_index()
+        count = len(self._paths)
+        mask = np.ones(count, dtype=bool)
+
+        def _apply(rows):
+            selected = np.zeros(count, dtype=bool)
+            selected[rows] = True
+            np.logical_and(mask, selected, out=mask)
+
+        if type is not None:
+            types = [type] if isinstance(type, str) else list(type)
+            _apply(self._match_keys(self._type_rows, types))
+        if name is not None:
+            _apply(self._match_keys(self._name_rows, name))
+        if room is not None:
+            _apply(self._match_keys(self._room_rows, room))
+        if group is not None:
+            _apply(self._match_keys(self._group_rows, group))
+        for prop, condition in attribute_filters.items():
+            if not mask.any():
+                break
+            _apply(self._range_rows(prop, condition))
+
+        return [self._paths[row] for row in np.flatnonzero(mask).tolist()]
+
+    def query(self, **filters) -> List[Usd.Prim]:
+        """按条件查询灯光prim，参数同query_paths"""
+        return [self.index.get_prim(path) for path in self.query_paths(**filters)]
+
+    def get_room_names(self) -> List[str]:
+        """获取可用于查询的房间名称（小写）"""
+        self._ensure_index()
+        return sorted(self._room_rows.keys())
+
+    def get_statistics(self, paths, props) -> Optional[Dict[str, Dict]]:
+        """统计一组灯光的属性：{属性: {"min", "max", "mean", "mixed"}}
+
+        使用缓存的属性列，只读取变化过的行；有灯光不在索引中时返回None，由调用方直接读取。
+        """
+        self._ensure_index()
+        rows = [self._rows.get(to_sdf_path(path)) for path in paths]
+        if not rows or None in rows:
+            return None
+        rows = np.asarray(rows, dtype=np.int64)
+        return {prop: summarize_values(self._ensure_values(prop)[rows]) for prop in props}
+
+    def get_value_range(self, prop) -> Optional[tuple]:
+        """获取属性在全部灯光上的 (最小值, 最大值)"""
+        self._ensure_index()
+        if not self._paths:
+            return None
+        self._ensure_attribute_index(prop)
+        sorted_values = self._sorted_values[prop]
+        return float(sorted_values[0]), float(sorted_values[-1])
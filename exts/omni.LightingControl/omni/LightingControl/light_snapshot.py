@@ -0,0 +1,171 @@
+import os
+import re
+import glob
+
+import numpy as np
+from typing import Dict, List, Optional
+
+
+# 快照保存的逻辑属性（列）
+SNAPSHOT_PROPERTIES = ("intensity", "exposure", "specular", "color_temperature", "color")
+
+SNAPSHOT_FILE_SUFFIX = ".lightsnap.npz"
+
+# .npz中除属性列以外的条目：路径表和原始快照名称（文件名中的名称经过了清理）
+_RESERVED_ENTRIES = ("paths", "name")
+
+
+class LightSnapshot:
+    """列式灯光快照：一张路径表加上每个属性一列NumPy数组
+
+    相比按灯光保存的字典，内存占用和恢复耗时只随灯光数量线性增长，
+    恢复时所有值在一个变更块中批量写入。
+    """
+
+    def __init__(self, paths, columns: Dict[str, np.ndarray], name: Optional[str] = None):
+        self.paths = np.asarray(paths, dtype=str)
+        self.columns = {prop: np.asarray(values, dtype=np.float32) for prop, values in columns.items()}
+        self.name = name  # 从文件读取时为保存的快照名称
+        self._row_lookup = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    @property
+    def nbytes(self):
+        """快照占用的数组内存（字节）"""
+        return self.paths.nbytes + sum(values.nbytes for values in self.columns.values())
+
+    def _get_row_lookup(self):
+        if self._row_lookup is None:
+            self._row_lookup = {path: row for row, path in enumerate(self.paths.tolist())}
+        return self._row_lookup
+
+    def contains(self, path):
+        """检查快照中是否包含某个灯光"""
+        return str(path) in self._get_row_lookup()
+
+    def get_rows(self, paths):
+        """查找给定路径在快照中的行号，返回 (命中的位置下标, 行号)"""
+        lookup = self._get_row_lookup()
+        positions = []
+        rows = []
+        for position, path in enumerate(paths):
+            row = lookup.get(str(path))
+            if row is not None:
+                positions.append(position)
+                rows.append(row)
+        return positions, np.asarray(rows, dtype=np.int64)
+
+    def merged(self, other: "LightSnapshot"):
+        """合并另一个快照，相同路径以other为准"""
+        if not len(self):
+            return other
+        keep = ~np.isin(self.paths, other.paths)
+        columns = {}
+        for prop in set(self.columns) | set(other.columns):
+            if prop in self.columns and prop in other.columns:
+                columns[prop] = np.concatenate([self.columns[prop][keep], other.columns[prop]])
+        return LightSnapshot(np.concatenate([self.paths[keep], other.paths]), columns)
+
+    def save(self, file_path, name=None):
+        """保存为.npz文件，name为快照名称时一并保存"""
+        entries = {"name": np.asarray(name, dtype=str)} if name is not None else {}
+        np.savez_compressed(file_path, paths=self.paths, **entries, **self.columns)
+
+    @classmethod
+    def load(cls, file_path):
+        """从.npz文件读取快照，文件中保存了快照名称时设置到name"""
+        with np.load(file_path, allow_pickle=False) as data:
+            columns = {prop: data[prop] for prop in data.files if prop not in _RESERVED_ENTRIES}
+            name = str(data["name"]) if "name" in data.files else None
+            return cls(data["paths"], columns, name)
+
+
+class SnapshotStore:
+    """多个命名快照的集合，可保存到舞台文件旁边"""
+
+    def __init__(self):
+        self._snapshots: Dict[str, LightSnapshot] = {}
+
+    def __contains__(self, name):
+        return name in self._snapshots
+
+    def get(self, name) -> Optional[LightSnapshot]:
+        """获取命名快照"""
+        return self._snapshots.get(name)
+
+    def put(self, name, snapshot: LightSnapshot):
+        """保存（覆盖）命名快照"""
+        self._snapshots[name] = snapshot
+
+    def remove(self, name):
+        """删除命名快照"""
+        return self._snapshots.pop(name, None) is not None
+
+    def clear(self):
+        """清空所有快照"""
+        self._snapshots.clear()
+
+    def names(self, include_hidden=False) -> List[str]:
+        """列出快照名称，以"__"开头的内部快照默认不列出"""
+        return sorted(name for name in self._snapshots if include_hidden or not name.startswith("__"))
+
+    @staticmethod
+    def get_default_directory(stage):
+        """获取舞台文件所在目录，匿名舞台返回None"""
+        if not stage:
+            return None
+        root_layer = stage.GetRootLayer()
+        if root_layer.anonymous or not root_layer.realPath:
+            return None
+        return os.path.dirname(root_layer.realPath)
+
+    @staticmethod
+    def _get_file_prefix(stage):
+        root_layer = stage.GetRootLayer()
+        return os.path.splitext(os.path.basename(root_layer.realPath))[0]
+
+    def save_all(self, stage, directory=None):
+        """把所有命名快照保存为 <舞台名>.<快照名>.lightsnap.npz，返回保存的文件列表
+
+        文件名中的快照名经过清理，原始名称保存在文件内；清理后重名（不区分大小写）时追加序号。
+        """
+        directory = directory or self.get_default_directory(stage)
+        if not directory:
+            raise ValueError("舞台尚未保存，无法确定快照保存目录")
+
+        prefix = self._get_file_prefix(stage)
+        saved = []
+        used_names = set()
+        for name in self.names():
+            base_name = re.sub(r"[^\w\-]", "_", name)
+            safe_name = base_name
+            suffix = 2
+            while safe_name.lower() in used_names:
+                safe_name = f"{base_name}_{suffix}"
+                suffix += 1
+            used_names.add(safe_name.lower())
+            file_path = os.path.join(directory, f"{prefix}.{safe_name}{SNAPSHOT_FILE_SUFFIX}")
+            self._snapshots[name].save(file_path, name)
+            saved.append(file_path)
+        return saved
+
+    def load_all(self, stage, directory=None):
+        """读取舞台旁边的所有快照文件，返回读取的快照名称（优先使用文件内保存的原始名称）"""
+        directory = directory or self.get_default_directory(stage)
+        if not directory:
+            return []
+
+        prefix = self._get_file_prefix(stage)
+        pattern = os.path.join(glob.escape(directory), f"{glob.escape(prefix)}.*{SNAPSHOT_FILE_SUFFIX}")
+        loaded = []
+        for file_path in sorted(glob.glob(pattern)):
+            try:
+                snapshot = LightSnapshot.load(file_path)
+                name = snapshot.name or os.path.basename(file_path)[len(prefix) + 1:-len(SNAPSHOT_FILE_SUFFIX)]
+                self._snapshots[name] = snapshot
+                loaded.append(name)
+            except Exception as e:
+                print(f"读取灯光快照失败 {file_path}: {str(e)}")
+        return loaded
@@ -0,0 +1,180 @@
+from pxr import Pcp, Sdf, Usd
+from typing import List, Optional, Tuple
+
+
+# 灯光根上保存灯光方案的变体集名称
+LOOK_VARIANT_SET = "lightingLook"
+
+
+class LightingLooks:
+    """以USD变体集保存的灯光方案（look）
+
+    每个方案是灯光根上 lightingLook 变体集中的一个变体，变体内只包含灯光属性的over。
+    切换方案只需修改一次变体选择，由合成完成全部灯光的切换，无需逐个写入属性。
+    注意：本地意见强于变体意见，灯光上已有的本地值会遮挡方案中的值。捕获不会改动方案之外的意见，
+    被遮挡的属性由 find_overrides() 报告，需要时由用户显式调用 clear_overrides() 清除。
+    """
+
+    def __init__(self, stage, root_path, variant_set_name=LOOK_VARIANT_SET):
+        self.stage = stage
+        self.root_path = Sdf.Path(str(root_path).rstrip("/") or "/")
+        self.variant_set_name = variant_set_name
+
+    def get_root_prim(self):
+        """获取灯光根prim"""
+        if not self.stage:
+            return None
+        prim = self.stage.GetPrimAtPath(self.root_path)
+        return prim if prim and prim.IsValid() else None
+
+    def _get_variant_set(self):
+        prim = self.get_root_prim()
+        if not prim or not prim.HasVariantSets() or not prim.GetVariantSets().HasVariantSet(self.variant_set_name):
+            return None
+        return prim.GetVariantSets().GetVariantSet(self.variant_set_name)
+
+    def get_look_names(self) -> List[str]:
+        """列出已保存的方案名称"""
+        variant_set = self._get_variant_set()
+        return list(variant_set.GetVariantNames()) if variant_set else []
+
+    def get_current_look(self) -> Optional[str]:
+        """获取当前选择的方案名称"""
+        variant_set = self._get_variant_set()
+        return (variant_set.GetVariantSelection() or None) if variant_set else None
+
+    def _get_variant_spec_path(self, look_name):
+        """方案变体在编辑目标layer中的spec路径"""
+        edit_target = self.stage.GetEditTarget()
+        root_spec_path = edit_target.MapToSpecPath(self.root_path)
+        return root_spec_path, root_spec_path.AppendVariantSelection(self.variant_set_name, look_name)
+
+    def get_look_attributes(self, look_name) -> List[Tuple[Sdf.Path, str]]:
+        """列出编辑目标layer中方案变体包含的属性 [(灯光路径, USD属性名), ...]"""
+        if not self.stage:
+            return []
+        layer = self.stage.GetEditTarget().GetLayer()
+        root_spec_path, variant_path = self._get_variant_spec_path(look_name)
+        variant_spec = layer.GetPrimAtPath(variant_path)
+        if not variant_spec:
+            return []
+
+        attributes = []
+        stack = list(variant_spec.nameChildren)
+        while stack:
+            prim_spec = stack.pop()
+            relative_path = prim_spec.path.StripAllVariantSelections().MakeRelativePath(root_spec_path)
+            light_path = self.root_path.AppendPath(relative_path)
+            attributes.extend((light_path, attr_spec.name) for attr_spec in prim_spec.attributes)
+            stack.extend(prim_spec.nameChildren)
+        return attributes
+
+    def find_overrides(self, look_name) -> List[Sdf.Path]:
+        """列出方案中被更强的本地意见遮挡的属性路径（值来自根层级的layer stack而不是变体）"""
+        overrides = []
+        for light_path, attr_name in self.get_look_attributes(look_name):
+            attr = self.stage.GetAttributeAtPath(light_path.AppendProperty(attr_name))
+            if not attr:
+                continue
+            resolve_info = attr.GetResolveInfo()
+            if resolve_info.GetSource() in (Usd.ResolveInfoSourceDefault, Usd.ResolveInfoSourceTimeSamples) and \
+                    resolve_info.GetNode().arcType == Pcp.ArcTypeRoot:
+                overrides.append(attr.GetPath())
+        return overrides
+
+    def clear_overrides(self, look_name) -> int:
+        """清除编辑目标layer中遮挡方案的本地默认值，返回清除的属性数量
+
+        只在用户显式要求时调用。时间采样（烘焙的动画）和其他layer中的遮挡意见不会清除，
+        仍会由 find_overrides() 报告。
+        """
+        edit_target = self.stage.GetEditTarget()
+        layer = edit_target.GetLayer()
+        attr_specs = [layer.GetAttributeAtPath(edit_target.MapToSpecPath(attr_path))
+                      for attr_path in self.find_overrides(look_name)]
+        cleared = 0
+        with Sdf.ChangeBlock():
+            for attr_spec in attr_specs:
+                if attr_spec and attr_spec.HasDefaultValue():
+                    attr_spec.ClearDefaultValue()
+                    cleared += 1
+        return cleared
+
+    def switch(self, look_name):
+        """切换到指定方案（一次变体选择编辑），look_name为None时清除选择"""
+        prim = self.get_root_prim()
+        if not prim:
+            return False
+        if look_name is None:
+            variant_set = self._get_variant_set()
+            return variant_set.ClearVariantSelection() if variant_set else False
+        if look_name not in self.get_look_names():
+            return False
+        return prim.GetVariantSets().GetVariantSet(self.variant_set_name).SetVariantSelection(look_name)
+
+    def capture(self, look_name, entries, replace=True, select=True):
+        """把属性值写入名为look_name的变体
+
+        replace为True时整体替换已存在的变体，否则只覆盖entries中的属性（用于按房间/灯光组累积）。
+
+        entries: [(灯光路径, USD属性名, Sdf值类型, 值), ...]，灯光必须位于灯光根之下。
+        所有编辑通过Sdf API在一个变更块中完成，返回写入的属性数量。
+        """
+        if not self.get_root_prim():
+            raise ValueError(f"灯光根不存在: {self.root_path}")
+
+        edit_target = self.stage.GetEditTarget()
+        layer = edit_target.GetLayer()
+        root_spec_path = edit_target.MapToSpecPath(self.root_path)
+        set_name = self.variant_set_name
+
+        written = 0
+        with Sdf.ChangeBlock():
+            root_spec = Sdf.CreatePrimInLayer(layer, root_spec_path)
+            variant_set_spec = root_spec.variantSets.get(set_name)
+            if variant_set_spec is None:
+                variant_set_spec = Sdf.VariantSetSpec(root_spec, set_name)
+            if set_name not in root_spec.variantSetNameList.prependedItems:
+                root_spec.variantSetNameList.prependedItems.append(set_name)
+
+            existing = variant_set_spec.variants.get(look_name)
+            if existing is not None and replace:
+                variant_set_spec.RemoveVariant(existing)
+                existing = None
+            if existing is None:
+                Sdf.VariantSpec(variant_set_spec, look_name)
+            variant_path = root_spec_path.AppendVariantSelection(set_name, look_name)
+
+            for light_path, attr_name, type_name, value in entries:
+                light_path = Sdf.Path(str(light_path))
+                if light_path == self.root_path or not light_path.HasPrefix(self.root_path):
+                    continue
+                relative_path = light_path.MakeRelativePath(self.root_path)
+                prim_spec = Sdf.CreatePrimInLayer(layer, variant_path.AppendPath(relative_path))
+                attr_spec = prim_spec.attributes.get(attr_name)
+                if attr_spec is None:
+                    attr_spec = Sdf.AttributeSpec(prim_spec, attr_name, type_name)
+                attr_spec.default = value
+                written += 1
+
+            if select:
+                root_spec.variantSelections[set_name] = look_name
+        return written
+
+    def delete(self, look_name):
+        """删除编辑目标layer中的方案变体"""
+        edit_target = self.stage.GetEditTarget()
+        layer = edit_target.GetLayer()
+        root_spec = layer.GetPrimAtPath(edit_target.MapToSpecPath(self.root_path))
+        if not root_spec:
+            return False
+        variant_set_spec = root_spec.variantSets.get(self.variant_set_name)
+        variant_spec = variant_set_spec.variants.get(look_name) if variant_set_spec else None
+        if variant_spec is None:
+            return False
+
+        with Sdf.ChangeBlock():
+            variant_set_spec.RemoveVariant(variant_spec)
+            if root_spec.variantSelections.get(self.variant_set_name) == look_name:
+                del root_spec.variantSelections[self.variant_set_name]
+        return True
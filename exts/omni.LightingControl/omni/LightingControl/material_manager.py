@@ -1,20 +1,48 @@
 # material_manager.py
 from datetime import datetime
-import omni.kit.commands
 from pxr import UsdShade, Sdf, Usd, UsdGeom
 from typing import List, Optional, Set, Dict
-import omni.usd
+
+from .stage_events import subscribe_stage_events
+from .tracing import tracer, traced
 
 
 class MaterialManager:
     """材质管理器，负责处理USD场景中的材质操作"""
     
-    def __init__(self):
+    def __init__(self, stage=None):
+        self.stage = stage  # 为None时使用Kit当前上下文的舞台
         self.unused_materials = []  # 未使用的材质列表
         self.deleted_materials_history = []  # 删除历史记录列表 - 修复：改为列表存储所有历史
         self.selected_materials = set()  # 用户选中的材质
         self.last_deleted_materials = None  # 最近一次删除的材质
+        # 使用Kit上下文的舞台时，切换舞台后扫描结果和删除历史都属于旧舞台
+        self._stage_events = None
+        if stage is None:
+            self._stage_events = subscribe_stage_events("omni.LightingControl.MaterialManager",
+                                                        on_opened=self.reset, on_closed=self.reset)
+    
+    def destroy(self):
+        """取消舞台事件订阅"""
+        if self._stage_events:
+            self._stage_events.destroy()
+            self._stage_events = None
+    
+    def reset(self):
+        """清空扫描结果、选择和删除历史"""
+        self.unused_materials = []
+        self.deleted_materials_history = []
+        self.selected_materials = set()
+        self.last_deleted_materials = None
     
+    def get_stage(self):
+        """获取USD舞台：优先使用传入的舞台，否则使用Kit当前上下文的舞台"""
+        if self.stage:
+            return self.stage
+        import omni.usd  # 延迟导入，纯pxr环境下传入舞台即可使用扫描功能
+        return omni.usd.get_context().get_stage()
+    
+    @traced("MaterialManager.scan_unused_materials", "materials")
     def scan_unused_materials(self):
         """扫描未使用的材质 - 主方法"""
         return self._scan_unused_materials_enhanced()
@@ -24,7 +52,7 @@ class MaterialManager:
         try:
             used_materials = set()
             all_materials = []
-            stage = omni.usd.get_context().get_stage()
+            stage = self.get_stage()
             
             if not stage:
                 print("无法获取USD舞台")
@@ -46,7 +74,7 @@ class MaterialManager:
                             'can_delete': not is_ancestral
                         }
                         all_materials.append(material_info)
-                        print(f"找到材质: {prim.GetPath()} - Ancestral: {is_ancestral}")
+                        tracer.count("materials.found")
                 except Exception as e:
                     print(f"检查材质图元时出错: {str(e)}")
                     continue
@@ -55,6 +83,7 @@ class MaterialManager:
             
             # 增强的使用检测逻辑
             for prim in stage.Traverse():
+                tracer.count("materials.prims_scanned")
                 try:
                     # 跳过材质本身
                     if prim.IsA(UsdShade.Material):
@@ -69,7 +98,7 @@ class MaterialManager:
                         material_path = direct_binding.GetMaterialPath()
                         if material_path:
                             used_materials.add(str(material_path))
-                            print(f"材质被直接绑定使用: {material_path} -> {prim.GetPath()}")
+                            tracer.count("materials.direct_bindings")
                         
                         # 检查集合绑定
                         collection_bindings = binding_api.GetCollectionBindings()
@@ -77,7 +106,7 @@ class MaterialManager:
                             material_path = collection_binding.GetMaterialPath()
                             if material_path:
                                 used_materials.add(str(material_path))
-                                print(f"材质被集合绑定使用: {material_path} -> {prim.GetPath()}")
+                                tracer.count("materials.collection_bindings")
                     
                     # 检查所有可能的材质绑定属性
                     material_attrs = [
@@ -95,14 +124,14 @@ class MaterialManager:
                                     connections = material_attr.GetConnections()
                                     for connection in connections:
                                         used_materials.add(str(connection))
-                                        print(f"材质被属性连接使用: {connection} -> {prim.GetPath()}")
+                                        tracer.count("materials.attribute_connections")
                                 # 获取直接值
                                 else:
                                     try:
                                         target_path = material_attr.Get()
                                         if target_path:
                                             used_materials.add(str(target_path))
-                                            print(f"材质被属性值使用: {target_path} -> {prim.GetPath()}")
+                                            tracer.count("materials.attribute_values")
                                     except:
                                         pass
                     
@@ -114,7 +143,7 @@ class MaterialManager:
                                 target_prim = stage.GetPrimAtPath(target)
                                 if target_prim and target_prim.IsA(UsdShade.Material):
                                     used_materials.add(str(target))
-                                    print(f"材质被关系使用: {target} -> {prim.GetPath()}")
+                                    tracer.count("materials.relationship_targets")
                         except:
                             pass
                             
@@ -184,8 +213,11 @@ class MaterialManager:
             print(f"检查ancestral prim时出错: {str(e)}")
             return False  # 出错时允许删除，避免误判
     
+    @traced("MaterialManager.delete_selected_materials", "materials")
     def delete_selected_materials(self):
         """删除选中的材质"""
+        import omni.kit.commands
+        
         if not self.selected_materials:
             return 0, [], "没有选中的材质"
         
@@ -233,7 +265,7 @@ class MaterialManager:
                         try:
                             omni.kit.commands.execute('DeletePrims', paths=[material_path])
                             success_count += 1
-                            print(f"成功删除材质: {material_path}")
+                            tracer.count("materials.deleted_individually")
                         except Exception as e:
                             print(f"删除材质 {material_path} 失败: {str(e)}")
                             failed_paths.append(material_path)
@@ -267,8 +299,11 @@ class MaterialManager:
             print(f"删除选中材质时发生错误: {str(e)}")
             return 0, [], f"错误: {str(e)}"
     
+    @traced("MaterialManager.delete_all_unused_materials", "materials")
     def delete_all_unused_materials(self):
         """删除所有未使用的材质"""
+        import omni.kit.commands
+        
         if not self.unused_materials:
             return 0, [], "没有未使用的材质"
         
@@ -313,7 +348,7 @@ class MaterialManager:
                     try:
                         omni.kit.commands.execute('DeletePrims', paths=[material_path])
                         success_count += 1
-                        print(f"成功删除材质: {material_path}")
+                        tracer.count("materials.deleted_individually")
                     except Exception as e:
                         print(f"删除材质 {material_path} 失败: {str(e)}")
                         failed_paths.append(material_path)
@@ -335,6 +370,7 @@ class MaterialManager:
             print(f"删除所有未使用材质时发生错误: {str(e)}")
             return 0, [], f"错误: {str(e)}"
     
+    @traced("MaterialManager.undo_last_delete", "materials")
     def undo_last_delete(self):
         """撤销上一次删除操作"""
         if not self.deleted_materials_history:
@@ -348,7 +384,7 @@ class MaterialManager:
                 return False, "删除历史记录不完整"
             
             restored_count = 0
-            stage = omni.usd.get_context().get_stage()
+            stage = self.get_stage()
             
             # 恢复所有被删除的材质
             for mat_info in last_delete['material_infos']:
@@ -361,7 +397,7 @@ class MaterialManager:
                     if prim.IsValid():
                         self.unused_materials.append(mat_info)
                         restored_count += 1
-                        print(f"成功恢复材质: {prim_path}")
+                        tracer.count("materials.restored")
                         
                 except Exception as e:
                     print(f"恢复材质 {mat_info['path']} 失败: {str(e)}")
@@ -0,0 +1,115 @@
+import contextlib
+
+from pxr import Usd, Sdf
+
+
+PREVIEW_LAYER_TAG = "omni.LightingControl.preview.usda"
+
+# 预览层挂载位置：session层下（不修改资产文件）或根层最强子层（在Layer窗口中可见）
+MODE_SESSION = "session"
+MODE_SUBLAYER = "sublayer"
+
+
+class PreviewLayer:
+    """非破坏性的灯光预览层
+
+    在内存中创建一个匿名layer并挂到session层或根层的最前面（最强），灯光编辑只在
+    edit_context() 内写入该layer，不改变舞台的全局编辑目标。commit() 把预览层中的
+    属性意见一次性合并到当前编辑目标layer；discard() 直接卸下预览层，无需逐条撤销。
+    """
+
+    def __init__(self, stage, mode=MODE_SESSION):
+        if mode not in (MODE_SESSION, MODE_SUBLAYER):
+            raise ValueError(f"未知的预览层模式: {mode}")
+        self.stage = stage
+        self.mode = mode
+        self.layer = None
+        self._parent_layer = None
+
+    @property
+    def is_active(self):
+        """预览层是否已挂载"""
+        return self.layer is not None
+
+    def begin(self):
+        """创建并挂载预览层，已挂载时直接返回"""
+        if self.layer is not None:
+            return self.layer
+        if not self.stage:
+            raise ValueError("没有可用的USD舞台")
+
+        self.layer = Sdf.Layer.CreateAnonymous(PREVIEW_LAYER_TAG)
+        self._parent_layer = self.stage.GetSessionLayer() if self.mode == MODE_SESSION else self.stage.GetRootLayer()
+        self._parent_layer.subLayerPaths.insert(0, self.layer.identifier)
+        return self.layer
+
+    def edit_context(self):
+        """预览层挂载时返回以其为编辑目标的上下文，否则返回空上下文"""
+        if self.layer is None or not self.stage:
+            return contextlib.nullcontext()
+        return Usd.EditContext(self.stage, Usd.EditTarget(self.layer))
+
+    def get_edit_count(self):
+        """获取预览层中已编写的属性数量"""
+        return len(self._collect_attribute_paths()) if self.layer else 0
+
+    def _collect_attribute_paths(self):
+        paths = []
+        self.layer.Traverse(Sdf.Path.absoluteRootPath,
+                            lambda path: paths.append(path) if path.IsPropertyPath() else None)
+        return [path for path in paths if self.layer.GetAttributeAtPath(path)]
+
+    def commit(self, target_layer=None):
+        """把预览层中的属性意见合并到目标layer（默认舞台当前编辑目标）并卸下预览层
+
+        所有写入在一个Sdf.ChangeBlock中完成，返回合并的属性数量。
+        """
+        if self.layer is None:
+            return 0
+
+        edit_target = self.stage.GetEditTarget() if target_layer is None else Usd.EditTarget(target_layer)
+        dst_layer = edit_target.GetLayer()
+        if dst_layer == self.layer:
+            raise ValueError("编辑目标就是预览层，无法合并")
+
+        src_layer = self.layer
+        attribute_paths = self._collect_attribute_paths()
+        merged = 0
+        with Sdf.ChangeBlock():
+            for path in attribute_paths:
+                src_spec = src_layer.GetAttributeAtPath(path)
+                dst_path = edit_target.MapToSpecPath(path)
+                if dst_path.isEmpty:
+                    continue
+                try:
+                    dst_spec = dst_layer.GetAttributeAtPath(dst_path)
+                    if not dst_spec:
+                        prim_spec = Sdf.CreatePrimInLayer(dst_layer, dst_path.GetPrimPath())
+                        dst_spec = Sdf.AttributeSpec(prim_spec, dst_path.name, src_spec.typeName,
+                                                     src_spec.variability, src_spec.custom)
+                    if src_spec.HasDefaultValue():
+                        dst_spec.default = src_spec.default
+                    for time in src_layer.ListTimeSamplesForPath(path):
+                        dst_layer.SetTimeSample(dst_path, time, src_layer.QueryTimeSample(path, time))
+                    merged += 1
+                except Exception as e:
+                    print(f"合并预览属性失败 {path}: {str(e)}")
+
+            self._detach()
+        return merged
+
+    def discard(self):
+        """丢弃预览层中的全部编辑"""
+        if self.layer is None:
+            return False
+        self._detach()
+        return True
+
+    def _detach(self):
+        """从父layer的子层列表中移除预览层"""
+        identifier = self.layer.identifier
+        if self._parent_layer and identifier in self._parent_layer.subLayerPaths:
+            self._parent_layer.subLayerPaths.remove(identifier)
+        self.layer.Clear()
+        self.layer = None
+        self._parent_layer = None
@@ -4,14 +4,19 @@ from functools import partial
 from typing import List, Optional
 from datetime import datetime
 
+import numpy as np
 import omni.ui as ui
 import omni.kit.commands
+import omni.timeline
 import omni.usd
-from pxr import Sdf
+from pxr import Sdf, UsdGeom
 
 from .sunpath import SunpathData, SunlightManipulator
 from .material_manager import MaterialManager
 from .light_manager import LightManager
+from .write_scheduler import WriteScheduler
+from .timeline_bake import BAKEABLE_PROPERTIES, CURVE_TYPES
+from .tracing import traced
 from .ui_components import (
     main_window_style, ColorWidget, CustomCollsableFrame, 
     build_collapsable_header, _get_search_glyph,
@@ -20,6 +25,16 @@ from .ui_components import (
 )
 
 
+# 显示Mixed标记的控件 -> 对应的灯光属性
+MIXED_VALUE_PROPERTIES = {
+    "color": "color",
+    "intensity": "intensity",
+    "exposure": "exposure",
+    "specular": "specular",
+    "temperature": "color_temperature",
+}
+
+
 class PropertyWindowExample(ui.Window):
 
     def __init__(self, title: str, delegate=None, **kwargs):
@@ -71,6 +86,45 @@ class PropertyWindowExample(ui.Window):
         self.record_defaults_button = None
         self.reset_to_defaults_button = None
 
+        # 预览层相关控件引用
+        self.preview_button = None
+        self.commit_preview_button = None
+        self.discard_preview_button = None
+        self.restore_solo_button = None
+
+        # 时间轴烘焙相关
+        self.timeline_recording = False
+        self.ramp_curve_combobox = None
+        self.ramp_property_combobox = None
+        self.ramp_start_field = None
+        self.ramp_end_field = None
+        self.ramp_value_field = None
+        self.timeline_keys_label = None
+
+        # 编辑日志（崩溃恢复）相关
+        self.replay_journal_button = None
+        self._journal_checked_path = None
+
+        # 灯光方案（变体）相关
+        self.look_combobox = None
+        self.look_name_field = None
+        self.current_look_options = []
+        self._updating_look_combobox = False
+
+        # 空间选择相关
+        self.spatial_radius_field = None
+
+        # 灯光预算相关
+        self.budget_rows = []
+        self.budget_by_group = False
+        self.budget_list_widget = None
+        self.budget_csv_path_field = None
+        self.budget_status_label = None
+
+        # 多灯光选择时属性不一致的Mixed标记
+        self.mixed_value_labels = {}
+        self._updating_light_ui = False
+
         # 太阳路径相关
         self.sunpath_data = SunpathData(172, 12, 0, 112.94, 28.12)
         self.sunlight_manipulator = SunlightManipulator(self.sunpath_data)
@@ -104,6 +158,17 @@ class PropertyWindowExample(ui.Window):
         self.material_manager = MaterialManager()
         self.material_checkboxes = {}  # 存储材质复选框引用
 
+        # 滑块写入按帧合并
+        self.write_stats_label = None
+        self.write_scheduler = WriteScheduler(on_stats_updated=self._on_write_stats_updated)
+
+        # 相对编辑模式：滑块按比例缩放/整体偏移组内数值，保持灯光之间的差异
+        self.relative_mode = False
+        self._relative_baseline = None  # (灯光列表, {属性: 基准数组})
+
+        # 打开/关闭舞台后重置与旧舞台绑定的界面状态
+        self.light_manager.stage_changed_callbacks.append(self._on_stage_changed)
+
         super().__init__(title, **kwargs)
 
         self.frame.style = main_window_style
@@ -112,6 +177,10 @@ class PropertyWindowExample(ui.Window):
     def destroy(self):
         """销毁窗口及其所有子控件"""
         self.material_checkboxes.clear()
+        self.write_scheduler.destroy()
+        self.light_manager.destroy()
+        self.sunlight_manipulator.destroy()
+        self.material_manager.destroy()
         super().destroy()
 
     @property
@@ -125,6 +194,7 @@ class PropertyWindowExample(ui.Window):
         self.__label_width = value
         self.frame.rebuild()
 
+    @traced(category="ui")
     def _on_search_clicked(self):
         """搜索按钮点击事件"""
         try:
@@ -141,6 +211,7 @@ class PropertyWindowExample(ui.Window):
                 return
             
             self._update_room_combobox(room_names)
+            self._update_look_combobox()
             
             if room_names:
                 self._on_room_selected(room_names[0])
@@ -220,6 +291,7 @@ class PropertyWindowExample(ui.Window):
         if lighting_names:
             self.lighting_combobox.model.get_item_value_model().set_value(0)
 
+    @traced(category="ui")
     def _on_room_selected(self, room_name):
         """房间选择回调"""
         try:
@@ -246,9 +318,12 @@ class PropertyWindowExample(ui.Window):
         except Exception as e:
             self._show_error_message(f"选择房间时发生错误: {str(e)}")
 
+    @traced(category="ui")
     def _on_lighting_selected(self, lighting_name):
         """灯光组选择回调"""
         try:
+            # 先写完上一组尚未刷新的滑块值，避免落到新选择的灯光上
+            self.write_scheduler.flush()
             self.light_manager.current_lighting = lighting_name
             
             lights_path = self.path_field.model.get_value_as_string() if self.path_field else "/World/lights/"
@@ -266,10 +341,12 @@ class PropertyWindowExample(ui.Window):
             
             self.light_manager.selected_lights = lights
             
+            self._ensure_journal()
             self._on_record_defaults()
+            self._capture_relative_baseline()
             
             if lights:
-                self._update_ui_with_light_properties(lights[0])
+                self._update_ui_with_light_properties(lights)
             
             if self.selection_count_label:
                 self.selection_count_label.text = f"Selected: {len(lights)} lights"
@@ -279,19 +356,25 @@ class PropertyWindowExample(ui.Window):
         except Exception as e:
             self._show_error_message(f"选择灯光组时发生错误: {str(e)}")
 
-    def _update_ui_with_light_properties(self, light_prim):
-        """使用灯光属性更新UI"""
+    @traced(category="ui")
+    def _update_ui_with_light_properties(self, lights):
+        """使用灯光组的属性统计更新UI，组内数值不一致时显示平均值并标记为Mixed"""
         try:
-            if not light_prim:
+            if not lights:
                 self._reset_ui_to_defaults()
                 return
-                
-            color = self.light_manager.get_light_color(light_prim)
-            intensity = self.light_manager.get_light_intensity(light_prim)
-            exposure = self.light_manager.get_light_exposure(light_prim)
-            temperature = self.light_manager.get_light_color_temperature(light_prim)
-            temp_enabled = self.light_manager.is_color_temperature_enabled(light_prim)
-            specular = self.light_manager.get_light_specular(light_prim)
+            
+            statistics = self.light_manager.get_group_statistics(lights)
+            if not statistics:
+                self._reset_ui_to_defaults()
+                return
+            
+            color = statistics["color"]["mean"]
+            intensity = statistics["intensity"]["mean"]
+            exposure = statistics["exposure"]["mean"]
+            temperature = statistics["color_temperature"]["mean"]
+            temp_enabled = statistics["enable_color_temperature"]["mean"] >= 0.5
+            specular = statistics["specular"]["mean"]
             
             self.current_color = color
             self.current_intensity = intensity
@@ -302,37 +385,58 @@ class PropertyWindowExample(ui.Window):
             
             async def update_ui_async():
                 await asyncio.sleep(0.1)
-                if self.color_widget:
-                    self.color_widget.set_color(color)
-                
-                if self.intensity_slider:
-                    self.intensity_slider.model.set_value(intensity)
-                if self.intensity_field:
-                    self.intensity_field.model.set_value(intensity)
-                
-                if self.exposure_slider:
-                    self.exposure_slider.model.set_value(exposure)
-                if self.exposure_field:
-                    self.exposure_field.model.set_value(exposure)
-                
-                if self.temperature_slider:
-                    self.temperature_slider.model.set_value(temperature)
-                if self.temperature_field:
-                    self.temperature_field.model.set_value(temperature)
-                
-                if self.specular_slider:
-                    self.specular_slider.model.set_value(specular)
-                if self.specular_field:
-                    self.specular_field.model.set_value(specular)
-                
-                if self.temperature_checkbox_image:
-                    self.temperature_checkbox_image.name = "checked" if temp_enabled else "unchecked"
+                # 这里只刷新显示，不把平均值写回灯光
+                self._updating_light_ui = True
+                try:
+                    if self.color_widget:
+                        self.color_widget.set_color(color)
+                    
+                    if self.intensity_slider:
+                        self.intensity_slider.model.set_value(intensity)
+                    if self.intensity_field:
+                        self.intensity_field.model.set_value(intensity)
+                    
+                    if self.exposure_slider:
+                        self.exposure_slider.model.set_value(exposure)
+                    if self.exposure_field:
+                        self.exposure_field.model.set_value(exposure)
+                    
+                    if self.temperature_slider:
+                        self.temperature_slider.model.set_value(temperature)
+                    if self.temperature_field:
+                        self.temperature_field.model.set_value(temperature)
+                    
+                    if self.specular_slider:
+                        self.specular_slider.model.set_value(specular)
+                    if self.specular_field:
+                        self.specular_field.model.set_value(specular)
+                    
+                    if self.temperature_checkbox_image:
+                        self.temperature_checkbox_image.name = "checked" if temp_enabled else "unchecked"
+                    
+                    self._update_mixed_value_labels(statistics)
+                finally:
+                    self._updating_light_ui = False
             
             asyncio.ensure_future(update_ui_async())
             
         except Exception as e:
             self._show_error_message(f"更新UI属性时发生错误: {str(e)}")
 
+    def _update_mixed_value_labels(self, statistics=None):
+        """根据组统计显示或隐藏各属性的Mixed标记，提示框中显示组内范围"""
+        for param_type, label in self.mixed_value_labels.items():
+            stats = (statistics or {}).get(MIXED_VALUE_PROPERTIES[param_type])
+            mixed = bool(stats and stats["mixed"])
+            label.visible = mixed
+            if not mixed:
+                continue
+            if param_type == "color":
+                label.tooltip = "Mixed: " + ", ".join(
+                    f"{channel} {lo:.3f}-{hi:.3f}" for channel, lo, hi in zip("RGB", stats["min"], stats["max"]))
+            else:
+                label.tooltip = f"Mixed: {stats['min']:.3f} - {stats['max']:.3f}"
+
     def _reset_ui_to_defaults(self):
         """重置UI到默认值"""
         self.current_color = [1.0, 1.0, 1.0]
@@ -362,58 +466,70 @@ class PropertyWindowExample(ui.Window):
             self.specular_field.model.set_value(self.current_specular)
         if self.temperature_checkbox_image:
             self.temperature_checkbox_image.name = "checked"
+        self._update_mixed_value_labels()
 
+    @traced(category="ui")
     def _on_color_changed(self, color):
         """颜色改变回调"""
         try:
-            for light_prim in self.light_manager.selected_lights:
-                self.light_manager.set_light_color(light_prim, color)
+            self.light_manager.set_group_attributes(
+                self.light_manager.selected_lights, {"color": color})
         except Exception as e:
             self._show_error_message(f"设置颜色时发生错误: {str(e)}")
 
+    @traced(category="ui")
     def _on_intensity_changed(self, intensity):
         """强度改变回调"""
         try:
-            for light_prim in self.light_manager.selected_lights:
-                self.light_manager.set_light_intensity(light_prim, intensity)
+            if self._apply_relative_edit("intensity", intensity):
+                return
+            self.light_manager.set_group_attributes(
+                self.light_manager.selected_lights, {"intensity": intensity})
         except Exception as e:
             self._show_error_message(f"设置强度时发生错误: {str(e)}")
 
+    @traced(category="ui")
     def _on_exposure_changed(self, exposure):
         """曝光改变回调"""
         try:
-            for light_prim in self.light_manager.selected_lights:
-                self.light_manager.set_exposure(light_prim, exposure)
+            if self._apply_relative_edit("exposure", exposure):
+                return
+            self.light_manager.set_group_attributes(
+                self.light_manager.selected_lights, {"exposure": exposure})
         except Exception as e:
             self._show_error_message(f"设置曝光时发生错误: {str(e)}")
 
+    @traced(category="ui")
     def _on_specular_changed(self, specular):
         """高光改变回调"""
         try:
-            for light_prim in self.light_manager.selected_lights:
-                self.light_manager.set_specular(light_prim, specular)
+            if self._apply_relative_edit("specular", specular):
+                return
+            self.light_manager.set_group_attributes(
+                self.light_manager.selected_lights, {"specular": specular})
         except Exception as e:
             self._show_error_message(f"设置高光时发生错误: {str(e)}")
 
+    @traced(category="ui")
     def _on_temperature_changed(self, temperature):
         """色温改变回调"""
         try:
-            for light_prim in self.light_manager.selected_lights:
-                self.light_manager.set_color_temperature(light_prim, temperature)
+            if self._apply_relative_edit("color_temperature", temperature):
+                return
+            self.light_manager.set_group_attributes(
+                self.light_manager.selected_lights, {"color_temperature": temperature})
         except Exception as e:
             self._show_error_message(f"设置色温时发生错误: {str(e)}")
 
+    @traced(category="ui")
     def _on_temperature_toggled(self, enabled):
         """色温开关回调"""
         try:
             self.color_temperature_enabled = enabled
             
-            success_count = 0
             total_lights = len(self.light_manager.selected_lights)
-            
-            for light_prim in self.light_manager.selected_lights:
-                if self.light_manager.enable_color_temperature(light_prim, enabled):
-                    success_count += 1
+            success_count = self.light_manager.set_group_attributes(
+                self.light_manager.selected_lights, {"enable_color_temperature": enabled})
             
             if total_lights > 0:
                 if success_count == total_lights:
@@ -426,28 +542,30 @@ class PropertyWindowExample(ui.Window):
         except Exception as e:
             self._show_error_message(f"切换色温时发生错误: {str(e)}")
 
+    @traced(category="ui")
     def _on_turn_on_lights(self):
         """打开所有灯光"""
         try:
-            for light_prim in self.light_manager.selected_lights:
-                self.light_manager.set_light_enabled(light_prim, True)
+            self.light_manager.set_lights_enabled(self.light_manager.selected_lights, True)
             self._show_success_message(f"已打开 {len(self.light_manager.selected_lights)} 个灯光")
         except Exception as e:
             self._show_error_message(f"打开灯光时发生错误: {str(e)}")
 
+    @traced(category="ui")
     def _on_turn_off_lights(self):
         """关闭所有灯光"""
         try:
-            for light_prim in self.light_manager.selected_lights:
-                self.light_manager.set_light_enabled(light_prim, False)
+            self.light_manager.set_lights_enabled(self.light_manager.selected_lights, False)
             self._show_success_message(f"已关闭 {len(self.light_manager.selected_lights)} 个灯光")
         except Exception as e:
             self._show_error_message(f"关闭灯光时发生错误: {str(e)}")
 
+    @traced(category="ui")
     def _on_reset_all(self):
         """重置所有灯光"""
         try:
             self.light_manager.reset_all_lights()
+            self._capture_relative_baseline()
             self.current_color = [1.0, 1.0, 1.0]
             self.current_intensity = 15000
             self.current_exposure = 1.0
@@ -456,7 +574,7 @@ class PropertyWindowExample(ui.Window):
             self.color_temperature_enabled = True
             
             if self.light_manager.selected_lights:
-                self._update_ui_with_light_properties(self.light_manager.selected_lights[0])
+                self._update_ui_with_light_properties(self.light_manager.selected_lights)
             
             self._show_success_message(f"已重置 {len(self.light_manager.selected_lights)} 个灯光")
         except Exception as e:
@@ -494,6 +612,7 @@ class PropertyWindowExample(ui.Window):
         except Exception as e:
             self._show_error_message(f"重置Vision Sync页面时发生错误: {str(e)}")
 
+    @traced(category="ui")
     def _on_record_defaults(self):
         """记录当前值为默认值"""
         try:
@@ -511,6 +630,7 @@ class PropertyWindowExample(ui.Window):
         except Exception as e:
             self._show_error_message(f"记录默认值时发生错误: {str(e)}")
 
+    @traced(category="ui")
     def _on_reset_to_defaults(self):
         """重置到记录的默认值"""
         try:
@@ -519,8 +639,9 @@ class PropertyWindowExample(ui.Window):
                 return
             
             if self.light_manager.reset_to_recorded_defaults():
+                self._capture_relative_baseline()
                 if self.light_manager.selected_lights:
-                    self._update_ui_with_light_properties(self.light_manager.selected_lights[0])
+                    self._update_ui_with_light_properties(self.light_manager.selected_lights)
                 self._show_success_message("已重置到记录的默认值")
             else:
                 self._show_error_message("重置到默认值失败")
@@ -539,6 +660,607 @@ class PropertyWindowExample(ui.Window):
         if self.reset_to_defaults_button:
             self.reset_to_defaults_button.enabled = has_lights and has_defaults
 
+    def _on_start_preview(self):
+        """开始预览：灯光和太阳光的编辑写入内存中的预览层"""
+        try:
+            self.write_scheduler.flush()
+            preview_layer = self.light_manager.begin_preview()
+            if not preview_layer:
+                self._show_error_message("无法创建预览层")
+                return
+            self.sunlight_manipulator.preview_layer = preview_layer
+            self._show_success_message("预览已开始，编辑不会写入舞台文件，提交后才会保留")
+        except Exception as e:
+            self._show_error_message(f"开始预览时发生错误: {str(e)}")
+        self._update_preview_buttons_state()
+
+    @traced(category="ui")
+    def _on_commit_preview(self):
+        """把预览层中的编辑合并到当前编辑目标"""
+        try:
+            self.write_scheduler.flush()
+            merged = self.light_manager.commit_preview()
+            self.sunlight_manipulator.preview_layer = None
+            self._show_success_message(f"已提交 {merged} 个属性的预览编辑")
+        except Exception as e:
+            self._show_error_message(f"提交预览时发生错误: {str(e)}")
+        self._update_preview_buttons_state()
+
+    @traced(category="ui")
+    def _on_discard_preview(self):
+        """丢弃预览层中的全部编辑"""
+        try:
+            self.write_scheduler.discard()
+            self.light_manager.discard_preview()
+            self.sunlight_manipulator.preview_layer = None
+            self._capture_relative_baseline()
+            if self.light_manager.selected_lights:
+                self._update_ui_with_light_properties(self.light_manager.selected_lights)
+            self._show_success_message("已丢弃预览编辑")
+        except Exception as e:
+            self._show_error_message(f"丢弃预览时发生错误: {str(e)}")
+        self._update_preview_buttons_state()
+
+    def _get_lights_path(self):
+        """获取路径输入框中的灯光根路径"""
+        lights_path = self.path_field.model.get_value_as_string() if self.path_field else "/World/lights/"
+        return lights_path.rstrip("/") or "/"
+
+    def _update_look_combobox(self):
+        """更新灯光方案下拉框选项"""
+        if not self.look_combobox:
+            return
+        
+        look_names = self.light_manager.list_lighting_looks(self._get_lights_path())
+        current_look = self.light_manager.get_current_lighting_look(self._get_lights_path())
+        self.current_look_options = look_names
+        
+        self._updating_look_combobox = True
+        try:
+            model = self.look_combobox.model
+            children = model.get_item_children()
+            for i in range(len(children) - 1, -1, -1):
+                model.remove_item(children[i])
+            for name in look_names:
+                model.append_child_item(None, ui.SimpleStringModel(name))
+            if current_look in look_names:
+                model.get_item_value_model().set_value(look_names.index(current_look))
+        finally:
+            self._updating_look_combobox = False
+
+    def _on_look_combobox_changed(self, model, item):
+        """灯光方案下拉框回调：切换变体选择"""
+        if self._updating_look_combobox:
+            return
+        index = model.get_item_value_model().get_value_as_int()
+        if 0 <= index < len(self.current_look_options):
+            self._on_switch_look(self.current_look_options[index])
+
+    @traced(category="ui")
+    def _on_switch_look(self, look_name):
+        """切换灯光方案"""
+        try:
+            self.write_scheduler.flush()
+            if not self.light_manager.switch_lighting_look(look_name, self._get_lights_path()):
+                self._show_error_message(f"切换灯光方案 '{look_name}' 失败")
+                return
+            self._capture_relative_baseline()
+            if self.light_manager.selected_lights:
+                self._update_ui_with_light_properties(self.light_manager.selected_lights)
+            if not self._warn_look_overrides(look_name):
+                self._show_success_message(f"已切换到灯光方案 '{look_name}'")
+        except Exception as e:
+            self._show_error_message(f"切换灯光方案时发生错误: {str(e)}")
+
+    @traced(category="ui")
+    def _on_capture_look(self):
+        """把当前灯光组（未选择时为全部灯光）保存为灯光方案"""
+        try:
+            look_name = self.look_name_field.model.get_value_as_string().strip() if self.look_name_field else ""
+            if not look_name:
+                self._show_warning_message("请输入灯光方案名称")
+                return
+            
+            self.write_scheduler.flush()
+            light_prims = self.light_manager.selected_lights or None
+            written = self.light_manager.capture_lighting_look(look_name, light_prims, self._get_lights_path())
+            if not written:
+                self._show_error_message(f"保存灯光方案 '{look_name}' 失败")
+                return
+            self._update_look_combobox()
+            if not self._warn_look_overrides(look_name):
+                self._show_success_message(f"已保存灯光方案 '{look_name}'（{written} 个属性）")
+        except Exception as e:
+            self._show_error_message(f"保存灯光方案时发生错误: {str(e)}")
+
+    def _warn_look_overrides(self, look_name):
+        """方案中有属性被本地值遮挡时提示，返回是否已提示"""
+        overrides = self.light_manager.get_lighting_look_overrides(look_name, self._get_lights_path())
+        if not overrides:
+            return False
+        self._show_warning_message(
+            f"灯光方案 '{look_name}' 中有 {len(overrides)} 个属性被本地值遮挡，"
+            f"切换方案对它们无效，可点击 Clear Overrides 清除")
+        return True
+
+    @traced(category="ui")
+    def _on_clear_look_overrides(self):
+        """显式清除遮挡当前灯光方案的本地值"""
+        try:
+            look_name = self.light_manager.get_current_lighting_look(self._get_lights_path())
+            if not look_name:
+                self._show_warning_message("没有选择灯光方案")
+                return
+            self.write_scheduler.flush()
+            cleared = self.light_manager.clear_lighting_look_overrides(look_name, self._get_lights_path())
+            remaining = self.light_manager.get_lighting_look_overrides(look_name, self._get_lights_path())
+            if self.light_manager.selected_lights:
+                self._update_ui_with_light_properties(self.light_manager.selected_lights)
+            self._capture_relative_baseline()
+            if remaining:
+                self._show_warning_message(
+                    f"已清除 {cleared} 个本地值，仍有 {len(remaining)} 个属性被其他layer或时间采样遮挡")
+            else:
+                self._show_success_message(f"已清除 {cleared} 个遮挡灯光方案 '{look_name}' 的本地值")
+        except Exception as e:
+            self._show_error_message(f"清除灯光方案的本地覆盖时发生错误: {str(e)}")
+
+    def _on_delete_look(self):
+        """删除当前选择的灯光方案"""
+        try:
+            look_name = self.light_manager.get_current_lighting_look(self._get_lights_path())
+            if not look_name:
+                self._show_warning_message("没有选择灯光方案")
+                return
+            if self.light_manager.delete_lighting_look(look_name, self._get_lights_path()):
+                self._update_look_combobox()
+                self._show_success_message(f"已删除灯光方案 '{look_name}'")
+            else:
+                self._show_error_message(f"删除灯光方案 '{look_name}' 失败")
+        except Exception as e:
+            self._show_error_message(f"删除灯光方案时发生错误: {str(e)}")
+
+    def _build_lighting_looks(self):
+        """构建灯光方案控件"""
+        with ui.HStack():
+            ui.Label("Lighting Look", name="attribute_name", width=self.label_width)
+            with ui.ZStack():
+                ui.Image(name="combobox", fill_policy=ui.FillPolicy.STRETCH, height=35)
+                with ui.HStack():
+                    ui.Spacer(width=10)
+                    with ui.VStack():
+                        ui.Spacer(height=10)
+                        self.look_combobox = ui.ComboBox(0, name="dropdown_menu")
+                        self.look_combobox.model.add_item_changed_fn(self._on_look_combobox_changed)
+        
+        with ui.HStack(spacing=10, height=25):
+            self.look_name_field = ui.StringField(name="path")
+            self.look_name_field.model.set_value("day")
+            
+            capture_btn = ui.Button("Capture Look", name="turn_on_off", width=100)
+            capture_btn.set_clicked_fn(self._on_capture_look)
+            
+            delete_btn = ui.Button("Delete Look", name="reset_button", width=100)
+            delete_btn.set_clicked_fn(self._on_delete_look)
+            
+            clear_overrides_btn = ui.Button("Clear Overrides", name="reset_button", width=110)
+            clear_overrides_btn.set_clicked_fn(self._on_clear_look_overrides)
+
+    def _build_spatial_selection(self):
+        """构建按空间位置选择灯光的控件（以视口中选中的prim为参照）"""
+        with ui.HStack(spacing=10, height=25):
+            bounds_btn = ui.Button("Select in Bounds", name="turn_on_off", width=120)
+            bounds_btn.set_clicked_fn(self._on_select_lights_in_bounds)
+            
+            ui.Label("Radius (m)", name="attribute_name", width=0)
+            self.spatial_radius_field = ui.FloatField(width=60, style={"color": cl_text})
+            self.spatial_radius_field.model.set_value(3.0)
+            
+            near_btn = ui.Button("Select Near", name="turn_on_off", width=100)
+            near_btn.set_clicked_fn(self._on_select_lights_near)
+
+    def _get_viewport_selected_prim_path(self):
+        """获取视口中选中的第一个prim路径"""
+        paths = omni.usd.get_context().get_selection().get_selected_prim_paths()
+        return paths[0] if paths else None
+
+    def _apply_light_selection(self, lights, description):
+        """把空间查询结果作为当前选中的灯光并刷新界面（没有结果时保持原来的选择）"""
+        if not lights:
+            self._show_warning_message(f"{description}没有找到灯光")
+            return
+        
+        self.light_manager.selected_lights = lights
+        self._ensure_journal()
+        self._on_record_defaults()
+        self._capture_relative_baseline()
+        self._update_ui_with_light_properties(lights)
+        if self.selection_count_label:
+            self.selection_count_label.text = f"Selected: {len(lights)} lights"
+        self._update_defaults_buttons_state()
+        self._show_success_message(f"{description}选中了 {len(lights)} 个灯光")
+
+    @traced(category="ui")
+    def _on_select_lights_in_bounds(self):
+        """选择落在视口选中prim包围盒内的灯光"""
+        try:
+            prim_path = self._get_viewport_selected_prim_path()
+            if not prim_path:
+                self._show_warning_message("请先在视口中选择一个prim")
+                return
+            self.write_scheduler.flush()
+            lights = self.light_manager.query_lights_in_prim_bounds(prim_path, select=False)
+            self._apply_light_selection(lights, f"'{prim_path}' 的包围盒内")
+        except Exception as e:
+            self._show_error_message(f"按包围盒选择灯光时发生错误: {str(e)}")
+
+    @traced(category="ui")
+    def _on_select_lights_near(self):
+        """选择与视口选中prim距离不超过半径的灯光"""
+        try:
+            prim_path = self._get_viewport_selected_prim_path()
+            if not prim_path:
+                self._show_warning_message("请先在视口中选择一个prim")
+                return
+            stage = self.light_manager.get_stage()
+            radius_m = self.spatial_radius_field.model.get_value_as_float() if self.spatial_radius_field else 3.0
+            radius = radius_m / UsdGeom.GetStageMetersPerUnit(stage)
+            self.write_scheduler.flush()
+            lights = self.light_manager.query_lights_near_prim(prim_path, radius, select=False)
+            self._apply_light_selection(lights, f"'{prim_path}' 周围 {radius_m:g} 米内")
+        except Exception as e:
+            self._show_error_message(f"按距离选择灯光时发生错误: {str(e)}")
+
+    def _build_timeline_bake(self):
+        """构建时间轴录制与曲线烘焙控件"""
+        self._build_checkbox("Record to Timeline", self.timeline_recording, self._on_timeline_record_toggled)
+        
+        with ui.HStack(spacing=10, height=25):
+            bake_btn = ui.Button("Bake Recording", name="turn_on_off", width=120)
+            bake_btn.set_clicked_fn(self._on_bake_recording)
+            
+            clear_btn = ui.Button("Clear Keys", name="reset_button", width=100)
+            clear_btn.set_clicked_fn(self._on_clear_time_samples)
+            
+            self.timeline_keys_label = ui.Label("Recorded: 0 keys", style={"font_size": 10, "color": cl_text_gray})
+        
+        with ui.HStack(spacing=6, height=25):
+            self.ramp_property_combobox = ui.ComboBox(1, *BAKEABLE_PROPERTIES, name="dropdown_menu", width=110)
+            self.ramp_curve_combobox = ui.ComboBox(0, *CURVE_TYPES, name="dropdown_menu", width=100)
+            ui.Label("Frames", name="attribute_name", width=0)
+            self.ramp_start_field = ui.IntField(width=45, style={"color": cl_text})
+            self.ramp_start_field.model.set_value(0)
+            self.ramp_end_field = ui.IntField(width=45, style={"color": cl_text})
+            self.ramp_end_field.model.set_value(48)
+            ui.Label("To", name="attribute_name", width=0)
+            self.ramp_value_field = ui.FloatField(width=70, style={"color": cl_text})
+            self.ramp_value_field.model.set_value(0.0)
+            ramp_btn = ui.Button("Bake Ramp", name="turn_on_off", width=90)
+            ramp_btn.set_clicked_fn(self._on_bake_ramp)
+
+    def _get_timeline_time_code(self):
+        """获取时间轴当前位置对应的时间码"""
+        stage = self.light_manager.get_stage()
+        seconds = omni.timeline.get_timeline_interface().get_current_time()
+        return seconds * (stage.GetTimeCodesPerSecond() if stage else 24.0)
+
+    def _on_timeline_record_toggled(self, enabled):
+        """时间轴录制开关回调"""
+        self.write_scheduler.flush()
+        self.timeline_recording = enabled
+
+    def _record_timeline_value(self, prop, value):
+        """录制开启时把属性值记录到时间轴当前位置（相对模式下滑块值不是绝对值，不录制）"""
+        if not self.timeline_recording or self.relative_mode or not self.light_manager.selected_lights:
+            return
+        try:
+            self.light_manager.record_timeline_value(prop, value, self._get_timeline_time_code())
+            if self.timeline_keys_label:
+                self.timeline_keys_label.text = \
+                    f"Recorded: {self.light_manager.timeline_recorder.get_key_count()} keys"
+        except Exception as e:
+            self._show_error_message(f"录制时间轴数值时发生错误: {str(e)}")
+
+    @traced(category="ui")
+    def _on_bake_recording(self):
+        """把录制的属性变化烘焙为当前灯光组的时间采样"""
+        try:
+            self.write_scheduler.flush()
+            if not self.light_manager.timeline_recorder.get_key_count():
+                self._show_warning_message("没有录制的关键帧")
+                return
+            written = self.light_manager.bake_recording()
+            if self.timeline_keys_label:
+                self.timeline_keys_label.text = "Recorded: 0 keys"
+            self._show_success_message(f"已烘焙 {written} 个灯光属性的时间采样")
+        except Exception as e:
+            self._show_error_message(f"烘焙录制时发生错误: {str(e)}")
+
+    @traced(category="ui")
+    def _on_bake_ramp(self):
+        """按所选曲线把当前灯光组的属性从当前值渐变到目标值"""
+        try:
+            self.write_scheduler.flush()
+            prop = BAKEABLE_PROPERTIES[self.ramp_property_combobox.model.get_item_value_model().get_value_as_int()]
+            curve = CURVE_TYPES[self.ramp_curve_combobox.model.get_item_value_model().get_value_as_int()]
+            start = self.ramp_start_field.model.get_value_as_int()
+            end = self.ramp_end_field.model.get_value_as_int()
+            if end <= start:
+                self._show_warning_message("结束帧必须大于开始帧")
+                return
+            end_value = self.ramp_value_field.model.get_value_as_float()
+            if prop == "color":
+                end_value = [end_value] * 3
+            written = self.light_manager.bake_curve(prop, end_value, start, end, curve)
+            self._show_success_message(f"已为 {written} 个灯光烘焙 {prop} 的 {curve} 曲线（{start}-{end} 帧）")
+        except Exception as e:
+            self._show_error_message(f"烘焙曲线时发生错误: {str(e)}")
+
+    @traced(category="ui")
+    def _on_clear_time_samples(self):
+        """清除当前灯光组的全部时间采样"""
+        try:
+            self.write_scheduler.flush()
+            cleared = self.light_manager.clear_time_samples()
+            self.light_manager.timeline_recorder.clear()
+            if self.timeline_keys_label:
+                self.timeline_keys_label.text = "Recorded: 0 keys"
+            self._show_success_message(f"已清除 {cleared} 个时间采样")
+        except Exception as e:
+            self._show_error_message(f"清除时间采样时发生错误: {str(e)}")
+
+    def _ensure_journal(self):
+        """为当前舞台开启编辑日志；日志中有上次会话留下的编辑时提示可以回放"""
+        try:
+            if self.light_manager.journal:
+                return
+            stage = self.light_manager.get_stage()
+            root_path = stage.GetRootLayer().identifier if stage else None
+            if root_path == self._journal_checked_path:
+                return
+            self._journal_checked_path = root_path
+            
+            recoverable = self.light_manager.get_recoverable_edit_count()
+            if self.replay_journal_button:
+                self.replay_journal_button.enabled = recoverable > 0
+            if recoverable:
+                self._show_warning_message(f"发现上次会话未保存的 {recoverable} 个灯光编辑，可点击 Replay Journal 恢复")
+            self.light_manager.start_journal()
+        except Exception as e:
+            self._show_error_message(f"开启编辑日志时发生错误: {str(e)}")
+
+    @traced(category="ui")
+    def _on_replay_journal(self):
+        """把编辑日志回放到当前舞台"""
+        try:
+            self.write_scheduler.flush()
+            replayed = self.light_manager.replay_journal()
+            if self.replay_journal_button:
+                self.replay_journal_button.enabled = False
+            self._capture_relative_baseline()
+            self._update_ui_with_light_properties(self.light_manager.selected_lights)
+            self._show_success_message(f"已从编辑日志恢复 {replayed} 个灯光")
+        except Exception as e:
+            self._show_error_message(f"回放编辑日志时发生错误: {str(e)}")
+
+    @traced(category="ui")
+    def _on_compact_journal(self):
+        """压缩编辑日志"""
+        try:
+            self.write_scheduler.flush()
+            kept = self.light_manager.compact_journal()
+            self._show_success_message(f"编辑日志已压缩为 {kept} 个灯光属性")
+        except Exception as e:
+            self._show_error_message(f"压缩编辑日志时发生错误: {str(e)}")
+
+    def _update_preview_buttons_state(self):
+        """更新预览相关按钮的状态"""
+        previewing = self.light_manager.is_previewing()
+        if self.preview_button:
+            self.preview_button.enabled = not previewing
+        if self.commit_preview_button:
+            self.commit_preview_button.enabled = previewing
+        if self.discard_preview_button:
+            self.discard_preview_button.enabled = previewing
+
+    def _get_current_room_path(self):
+        """获取当前房间的路径，没有选择房间时返回None"""
+        if not self.light_manager.current_room:
+            return None
+        return f"{self._get_lights_path()}/{self.light_manager.current_room}"
+
+    def _get_current_group_path(self):
+        """获取当前灯光组的路径，没有选择灯光组时返回None"""
+        room_path = self._get_current_room_path()
+        if not room_path or not self.light_manager.current_lighting:
+            return None
+        return f"{room_path}/{self.light_manager.current_lighting}"
+
+    def _isolate(self, path, solo):
+        """独奏或静音一个房间/灯光组，并显示被移出渲染的灯光数量"""
+        if not path:
+            self._show_warning_message("请先选择房间和灯光组")
+            return
+        self.write_scheduler.flush()
+        if solo:
+            removed = self.light_manager.solo([path], self._get_lights_path())
+        else:
+            removed = self.light_manager.mute([path])
+        total = self.light_manager.get_isolated_light_count()
+        self._update_solo_buttons_state()
+        if self.selection_count_label:
+            self.selection_count_label.text = f"Selected: {len(self.light_manager.selected_lights)} lights"
+        self._show_success_message(f"已从渲染中移除 {removed} 个灯光（共 {total} 个）")
+
+    @traced(category="ui")
+    def _on_solo_room(self):
+        """独奏当前房间"""
+        try:
+            self._isolate(self._get_current_room_path(), True)
+        except Exception as e:
+            self._show_error_message(f"独奏房间时发生错误: {str(e)}")
+
+    @traced(category="ui")
+    def _on_solo_group(self):
+        """独奏当前灯光组"""
+        try:
+            self._isolate(self._get_current_group_path(), True)
+        except Exception as e:
+            self._show_error_message(f"独奏灯光组时发生错误: {str(e)}")
+
+    @traced(category="ui")
+    def _on_mute_group(self):
+        """静音当前灯光组"""
+        try:
+            self._isolate(self._get_current_group_path(), False)
+        except Exception as e:
+            self._show_error_message(f"静音灯光组时发生错误: {str(e)}")
+
+    @traced(category="ui")
+    def _on_restore_solo(self):
+        """恢复所有被独奏/静音停用的灯光"""
+        try:
+            restored = self.light_manager.restore_isolation()
+            self._update_solo_buttons_state()
+            # 停用期间失效的灯光prim需要重新获取
+            if self.light_manager.current_lighting:
+                self._on_lighting_selected(self.light_manager.current_lighting)
+            self._show_success_message(f"已恢复 {restored} 个灯光")
+        except Exception as e:
+            self._show_error_message(f"恢复独奏时发生错误: {str(e)}")
+
+    def _update_solo_buttons_state(self):
+        """更新独奏相关按钮的状态"""
+        if self.restore_solo_button:
+            self.restore_solo_button.enabled = self.light_manager.is_isolating()
+
+    def _on_stage_changed(self):
+        """舞台打开/关闭后清空房间、灯光组、材质和太阳光列表，丢弃旧舞台上的待写值"""
+        try:
+            self.write_scheduler.discard()
+            self._relative_baseline = None
+            self._journal_checked_path = None
+            self._update_room_combobox([])
+            self._update_lighting_combobox([])
+            self._reset_ui_to_defaults()
+            if self.selection_count_label:
+                self.selection_count_label.text = "Selected: 0 lights"
+            self._update_defaults_buttons_state()
+            self._update_preview_buttons_state()
+            self._update_solo_buttons_state()
+            self._update_look_combobox()
+            self._update_material_list()
+            self.budget_rows = []
+            self._update_budget_list()
+            if self.sun_light_combobox:
+                self._refresh_sun_light_combobox()
+        except Exception as e:
+            self._show_error_message(f"舞台切换后重置界面失败: {str(e)}")
+
+    # ==============================================================================
+    # 灯光预算相关方法
+    # ==============================================================================
+
+    def _build_budget_properties(self):
+        """构建'灯光预算'组的控件"""
+        with CustomCollsableFrame("Lighting Budget").collapsable_frame:
+            with ui.VStack(height=0, spacing=10):
+                ui.Spacer(height=10)
+                
+                with ui.HStack(spacing=10, height=35):
+                    rooms_btn = ui.Button("Analyze Rooms", name="turn_on_off")
+                    rooms_btn.set_clicked_fn(lambda: self._on_analyze_budget(False))
+                    
+                    groups_btn = ui.Button("Analyze Groups", name="turn_on_off")
+                    groups_btn.set_clicked_fn(lambda: self._on_analyze_budget(True))
+                    
+                    export_btn = ui.Button("Export CSV", name="reset_button")
+                    export_btn.set_clicked_fn(self._on_export_budget_csv)
+                
+                with ui.HStack(spacing=10, height=25):
+                    ui.Label("CSV Path", name="attribute_name", width=self.label_width)
+                    self.budget_csv_path_field = ui.StringField(name="path")
+                
+                with ui.Frame(height=200):
+                    with ui.ScrollingFrame():
+                        self.budget_list_widget = ui.VStack(spacing=2)
+                self._update_budget_list()
+                
+                with ui.HStack(height=25):
+                    self.budget_status_label = ui.Label("Click 'Analyze Rooms' to compute the lighting budget",
+                                                        word_wrap=True, alignment=ui.Alignment.LEFT_CENTER,
+                                                        style={"font_size": 11, "color": cl_text_gray})
+
+    def _build_budget_row(self, cells, style):
+        """构建预算表的一行：名称、灯光数、类型分布、总强度、峰值强度、面光源面积、投射阴影数"""
+        with ui.HStack(height=20):
+            ui.Spacer(width=5)
+            for text, width in zip(cells, (ui.Percent(22), ui.Percent(8), ui.Percent(28), ui.Percent(12),
+                                            ui.Percent(12), ui.Percent(10), ui.Percent(8))):
+                ui.Label(text, width=width, elided_text=True, tooltip=text, style=style)
+
+    def _update_budget_list(self):
+        """刷新灯光预算表"""
+        if not self.budget_list_widget:
+            return
+        
+        self.budget_list_widget.clear()
+        with self.budget_list_widget:
+            if not self.budget_rows:
+                with ui.HStack():
+                    ui.Spacer(width=10)
+                    ui.Label("No budget computed", style={"color": cl_text_gray, "font_size": 12})
+                return
+            
+            header = ("Group" if self.budget_by_group else "Room", "Lights", "Types",
+                      "Total I", "Peak I", "Area", "Shadows")
+            self._build_budget_row(header, {"color": cl_text_gray, "font_size": 11})
+            for row in self.budget_rows:
+                types = ", ".join(f"{type_name} {count}" for type_name, count in sorted(row["counts_by_type"].items()))
+                cells = (row["name"], str(row["light_count"]), types, f"{row['total_intensity']:.4g}",
+                         f"{row['peak_intensity']:.4g}", f"{row['area_total']:.3g}", str(row["shadow_casting"]))
+                self._build_budget_row(cells, {"color": cl_text, "font_size": 11})
+
+    @traced(category="ui")
+    def _on_analyze_budget(self, by_group):
+        """统计灯光根下每个房间（或灯光组）的灯光预算"""
+        try:
+            self.write_scheduler.flush()
+            self.budget_by_group = by_group
+            self.budget_rows = self.light_manager.analyze_lighting_budget(self._get_lights_path(), by_group)
+            self._update_budget_list()
+            if not self.budget_rows:
+                self._show_warning_message(f"路径 '{self._get_lights_path()}' 下没有找到灯光")
+                return
+            total = sum(row["light_count"] for row in self.budget_rows)
+            message = f"已统计 {len(self.budget_rows)} 个{'灯光组' if by_group else '房间'}，共 {total} 个灯光"
+            if self.budget_status_label:
+                self.budget_status_label.text = message
+            self._show_success_message(message)
+        except Exception as e:
+            self._show_error_message(f"统计灯光预算时发生错误: {str(e)}")
+
+    @traced(category="ui")
+    def _on_export_budget_csv(self):
+        """把灯光预算导出为CSV（未统计时先按房间统计）"""
+        try:
+            if not self.budget_rows:
+                self._on_analyze_budget(self.budget_by_group)
+                if not self.budget_rows:
+                    return
+            file_path = self.budget_csv_path_field.model.get_value_as_string().strip() \
+                if self.budget_csv_path_field else ""
+            file_path, count = self.light_manager.export_lighting_budget_csv(file_path or None,
+                                                                              rows=self.budget_rows)
+            if self.budget_csv_path_field:
+                self.budget_csv_path_field.model.set_value(file_path)
+            message = f"已导出 {count} 行灯光预算到 {file_path}"
+            if self.budget_status_label:
+                self.budget_status_label.text = message
+            self._show_success_message(message)
+        except Exception as e:
+            self._show_error_message(f"导出灯光预算时发生错误: {str(e)}")
+
     # ==============================================================================
     # 材质管理相关方法
     # ==============================================================================
@@ -730,6 +1452,7 @@ class PropertyWindowExample(ui.Window):
             total_count = self.material_manager.get_unused_count()
             self.material_selection_count_label.text = f"Selected: {selected_count} / {deletable_count} deletable of {total_count} total"
 
+    @traced(category="ui")
     def _on_material_scan_clicked(self):
         """材质扫描按钮点击事件"""
         try:
@@ -755,6 +1478,7 @@ class PropertyWindowExample(ui.Window):
         except Exception as e:
             self._update_material_status(f"Scan error: {str(e)}")
 
+    @traced(category="ui")
     def _on_delete_selected_materials(self):
         """删除选中材质按钮点击事件"""
         selected_count = self.material_manager.get_selection_count()
@@ -771,6 +1495,7 @@ class PropertyWindowExample(ui.Window):
         except Exception as e:
             self._update_material_status(f"Delete error: {str(e)}")
 
+    @traced(category="ui")
     def _on_delete_all_materials(self):
         """删除所有材质按钮点击事件"""
         unused_count = self.material_manager.get_unused_count()
@@ -927,9 +1652,11 @@ class PropertyWindowExample(ui.Window):
         
         asyncio.ensure_future(restore_button_style())
     
+    @traced(category="ui")
     def _on_sun_light_selected(self, light_path):
         """太阳光选择回调"""
         try:
+            self.write_scheduler.flush()
             if not light_path or light_path == "Select DistantLight":
                 self.sunlight_manipulator.path = None
                 return
@@ -943,6 +1670,7 @@ class PropertyWindowExample(ui.Window):
         except Exception as e:
             self._show_sun_error_message(f"选择太阳光时发生错误: {str(e)}")
     
+    @traced(category="ui")
     def _on_datetime_changed(self, model=None):
         """日期时间改变回调"""
         try:
@@ -1040,6 +1768,7 @@ class PropertyWindowExample(ui.Window):
         except Exception as e:
             self._show_sun_error_message(f"设置纬度时发生错误: {str(e)}")
     
+    @traced(category="ui")
     def _on_sun_intensity_changed(self, intensity):
         """太阳强度改变回调"""
         try:
@@ -1048,6 +1777,7 @@ class PropertyWindowExample(ui.Window):
         except Exception as e:
             self._show_sun_error_message(f"设置太阳强度时发生错误: {str(e)}")
     
+    @traced(category="ui")
     def _on_sun_temperature_changed(self, temperature):
         """太阳色温改变回调"""
         try:
@@ -1056,6 +1786,7 @@ class PropertyWindowExample(ui.Window):
         except Exception as e:
             self._show_sun_error_message(f"设置太阳色温时发生错误: {str(e)}")
     
+    @traced(category="ui")
     def _on_sun_exposure_changed(self, exposure):
         """太阳曝光改变回调"""
         try:
@@ -1064,6 +1795,7 @@ class PropertyWindowExample(ui.Window):
         except Exception as e:
             self._show_sun_error_message(f"设置太阳曝光时发生错误: {str(e)}")
     
+    @traced(category="ui")
     def _on_sun_angle_changed(self, angle):
         """太阳角度改变回调"""
         try:
@@ -1072,6 +1804,7 @@ class PropertyWindowExample(ui.Window):
         except Exception as e:
             self._show_sun_error_message(f"设置太阳角度时发生错误: {str(e)}")
     
+    @traced(category="ui")
     def _on_sun_color_changed(self, color):
         """太阳颜色改变回调"""
         try:
@@ -1176,6 +1909,47 @@ class PropertyWindowExample(ui.Window):
                     self.reset_to_defaults_button.set_clicked_fn(self._on_reset_to_defaults)
                     self.reset_to_defaults_button.enabled = False
                 
+                with ui.HStack(spacing=10, height=35):
+                    self.preview_button = ui.Button("Start Preview", name="turn_on_off")
+                    self.preview_button.set_clicked_fn(self._on_start_preview)
+                    
+                    self.commit_preview_button = ui.Button("Commit Preview", name="turn_on_off")
+                    self.commit_preview_button.set_clicked_fn(self._on_commit_preview)
+                    
+                    self.discard_preview_button = ui.Button("Discard Preview", name="reset_button")
+                    self.discard_preview_button.set_clicked_fn(self._on_discard_preview)
+                self._update_preview_buttons_state()
+                
+                with ui.HStack(spacing=10, height=35):
+                    solo_room_btn = ui.Button("Solo Room", name="turn_on_off")
+                    solo_room_btn.set_clicked_fn(self._on_solo_room)
+                    
+                    solo_group_btn = ui.Button("Solo Group", name="turn_on_off")
+                    solo_group_btn.set_clicked_fn(self._on_solo_group)
+                    
+                    mute_group_btn = ui.Button("Mute Group", name="turn_on_off")
+                    mute_group_btn.set_clicked_fn(self._on_mute_group)
+                    
+                    self.restore_solo_button = ui.Button("Restore", name="reset_button")
+                    self.restore_solo_button.set_clicked_fn(self._on_restore_solo)
+                self._update_solo_buttons_state()
+                
+                with ui.HStack(spacing=10, height=25):
+                    self.replay_journal_button = ui.Button("Replay Journal", name="turn_on_off")
+                    self.replay_journal_button.set_clicked_fn(self._on_replay_journal)
+                    self.replay_journal_button.enabled = False
+                    
+                    compact_journal_btn = ui.Button("Compact Journal", name="reset_button")
+                    compact_journal_btn.set_clicked_fn(self._on_compact_journal)
+                
+                self._build_checkbox("Relative Mode", self.relative_mode, self._on_relative_mode_toggled)
+                
+                self._build_lighting_looks()
+                
+                self._build_spatial_selection()
+                
+                self._build_timeline_bake()
+                
                 self._build_color_temperature()
 
                 # 使用统一的带输入框滑块构建方法
@@ -1198,6 +1972,9 @@ class PropertyWindowExample(ui.Window):
                         ui.Spacer(width=10)
                         self.selection_count_label = ui.Label("Selected: 0 lights", 
                                                             style={"font_size": 10, "color": cl_text_gray})
+                        ui.Spacer()
+                        self.write_stats_label = ui.Label("", alignment=ui.Alignment.RIGHT_CENTER,
+                                                          style={"font_size": 10, "color": cl_text_gray})
     
     def _build_sun_path_properties(self):
         """构建'太阳路径'组的控件"""
@@ -1389,6 +2166,73 @@ class PropertyWindowExample(ui.Window):
             with ui.HStack():
                 ui.Label("构建太阳光选择器失败", style={"color": cl_attribute_red})
     
+    def _get_write_group_key(self, param_type):
+        """获取滑块写入所针对的目标组"""
+        if param_type.startswith("sun_") or param_type in ("longitude", "latitude"):
+            return ("sun", self.sunlight_manipulator.path)
+        return ("lights", self.light_manager.current_room, self.light_manager.current_lighting)
+
+    def _schedule_slider_write(self, param_type, value, apply_fn):
+        """登记滑块写入，在下一次update tick中只写入最新值"""
+        if self._updating_light_ui:
+            return
+        if param_type in self.mixed_value_labels:
+            self.mixed_value_labels[param_type].visible = False
+        if param_type in MIXED_VALUE_PROPERTIES:
+            self._record_timeline_value(MIXED_VALUE_PROPERTIES[param_type], value)
+        self.write_scheduler.schedule(self._get_write_group_key(param_type), param_type, value, apply_fn)
+
+    def _on_relative_mode_toggled(self, enabled):
+        """相对编辑模式开关回调"""
+        self.write_scheduler.flush()
+        self.relative_mode = enabled
+        if enabled:
+            self._capture_relative_baseline()
+        else:
+            self._relative_baseline = None
+
+    def _capture_relative_baseline(self):
+        """记录当前灯光组的数值作为相对编辑的基准"""
+        self._relative_baseline = None
+        lights = self.light_manager.selected_lights
+        if not self.relative_mode or not lights:
+            return
+        try:
+            columns = self.light_manager.get_attribute_columns(
+                lights, ["intensity", "exposure", "specular", "color_temperature"])
+            self._relative_baseline = (list(lights), columns)
+        except Exception as e:
+            self._show_error_message(f"记录相对编辑基准时发生错误: {str(e)}")
+
+    def _apply_relative_edit(self, prop, value):
+        """相对模式下把滑块值换算为缩放（强度/高光）或偏移（曝光/色温），返回是否已处理
+
+        滑块显示的是组内的平均值，以基准值的平均值作为参考，未移动滑块时不会改变任何灯光。
+        """
+        if not self.relative_mode or self._relative_baseline is None:
+            return False
+        lights, columns = self._relative_baseline
+        base_values = columns[prop]
+        if lights != self.light_manager.selected_lights or not len(base_values):
+            return False
+
+        reference = float(np.mean(base_values, dtype=np.float64))
+        if prop in ("intensity", "specular"):
+            scale = value / reference if reference != 0.0 else 1.0
+            self.light_manager.scale_group_attribute(lights, prop, scale=scale, base_values=base_values)
+        else:
+            self.light_manager.scale_group_attribute(lights, prop, offset=value - reference, base_values=base_values)
+        return True
+
+    def _on_write_stats_updated(self, stats):
+        """显示滑块写入统计"""
+        if self.write_stats_label:
+            self.write_stats_label.text = (
+                f"Writes: {stats['writes_per_second']:.0f}/s  "
+                f"Flush: {stats['avg_flush_ms']:.2f} ms  "
+                f"Interval: {stats['flush_interval']} frame(s)"
+            )
+
     def _build_gradient_float_slider_with_input(self, label_name, param_type, default_value, min_val, max_val):
         """为灯光属性构建渐变浮点滑块（带数值输入框）"""
         def _on_value_changed(model, rect_changed, rect_default):
@@ -1428,6 +2272,10 @@ class PropertyWindowExample(ui.Window):
                             style={"color": cl_text}
                         )
                         input_field.model.set_value(default_value)
+                        if param_type in MIXED_VALUE_PROPERTIES:
+                            ui.Spacer(width=4)
+                            self.mixed_value_labels[param_type] = ui.Label(
+                                "Mixed", width=0, visible=False, style={"font_size": 10, "color": cl_text_gray})
 
                         # 同步滑块和输入框
                         slider.model.add_value_changed_fn(
@@ -1442,46 +2290,56 @@ class PropertyWindowExample(ui.Window):
                             self.exposure_slider = slider
                             self.exposure_field = input_field
                             slider.model.add_value_changed_fn(
-                                lambda model, s=slider: self._on_exposure_changed(s.model.as_float))
+                                lambda model, s=slider: self._schedule_slider_write(
+                                    "exposure", s.model.as_float, self._on_exposure_changed))
                         elif param_type == "intensity":
                             self.intensity_slider = slider
                             self.intensity_field = input_field
                             slider.model.add_value_changed_fn(
-                                lambda model, s=slider: self._on_intensity_changed(s.model.as_float))
+                                lambda model, s=slider: self._schedule_slider_write(
+                                    "intensity", s.model.as_float, self._on_intensity_changed))
                         elif param_type == "specular":
                             self.specular_slider = slider
                             self.specular_field = input_field
                             slider.model.add_value_changed_fn(
-                                lambda model, s=slider: self._on_specular_changed(s.model.as_float))
+                                lambda model, s=slider: self._schedule_slider_write(
+                                    "specular", s.model.as_float, self._on_specular_changed))
                         elif param_type == "temperature":
                             self.temperature_slider = slider
                             self.temperature_field = input_field
                             slider.model.add_value_changed_fn(
-                                lambda model, s=slider: self._on_temperature_changed(s.model.as_float))
+                                lambda model, s=slider: self._schedule_slider_write(
+                                    "temperature", s.model.as_float, self._on_temperature_changed))
                         elif param_type == "longitude":
                             self.longitude_slider = slider
                             slider.model.add_value_changed_fn(
-                                lambda model, s=slider: self._on_longitude_changed(s.model.as_float))
+                                lambda model, s=slider: self._schedule_slider_write(
+                                    "longitude", s.model.as_float, self._on_longitude_changed))
                         elif param_type == "latitude":
                             self.latitude_slider = slider
                             slider.model.add_value_changed_fn(
-                                lambda model, s=slider: self._on_latitude_changed(s.model.as_float))
+                                lambda model, s=slider: self._schedule_slider_write(
+                                    "latitude", s.model.as_float, self._on_latitude_changed))
                         elif param_type == "sun_intensity":
                             self.sun_intensity_slider = slider
                             slider.model.add_value_changed_fn(
-                                lambda model, s=slider: self._on_sun_intensity_changed(s.model.as_float))
+                                lambda model, s=slider: self._schedule_slider_write(
+                                    "sun_intensity", s.model.as_float, self._on_sun_intensity_changed))
                         elif param_type == "sun_temperature":
                             self.sun_temperature_slider = slider
                             slider.model.add_value_changed_fn(
-                                lambda model, s=slider: self._on_sun_temperature_changed(s.model.as_float))
+                                lambda model, s=slider: self._schedule_slider_write(
+                                    "sun_temperature", s.model.as_float, self._on_sun_temperature_changed))
                         elif param_type == "sun_exposure":
                             self.sun_exposure_slider = slider
                             slider.model.add_value_changed_fn(
-                                lambda model, s=slider: self._on_sun_exposure_changed(s.model.as_float))
+                                lambda model, s=slider: self._schedule_slider_write(
+                                    "sun_exposure", s.model.as_float, self._on_sun_exposure_changed))
                         elif param_type == "sun_angle":
                             self.sun_angle_slider = slider
                             slider.model.add_value_changed_fn(
-                                lambda model, s=slider: self._on_sun_angle_changed(s.model.as_float))
+                                lambda model, s=slider: self._schedule_slider_write(
+                                    "sun_angle", s.model.as_float, self._on_sun_angle_changed))
                         
                         ui.Spacer(width=1.5)
             
@@ -1539,7 +2397,12 @@ class PropertyWindowExample(ui.Window):
                 with ui.HStack():
                     self._build_line_dot(40, 9)
                     ui.Label(widget_name, name="attribute_name", width=0)
-                    self.color_widget = ColorWidget(1.0, 1.0, 1.0, on_color_changed=self._on_color_changed)
+                    self.color_widget = ColorWidget(
+                        1.0, 1.0, 1.0,
+                        on_color_changed=lambda color: self._schedule_slider_write(
+                            "color", list(color), self._on_color_changed))
+                    self.mixed_value_labels["color"] = ui.Label(
+                        "Mixed", width=0, visible=False, style={"font_size": 10, "color": cl_text_gray})
                     ui.Spacer(width=10)
                 with ui.HStack():
                     ui.Spacer(width=10)
@@ -1551,6 +2414,7 @@ class PropertyWindowExample(ui.Window):
             with ui.VStack(height=0, spacing=10):
                 self._build_head()
                 self._build_light_properties()
+                self._build_budget_properties()
                 self._build_sun_path_properties()
                 self._build_material_properties()
                 ui.Spacer(height=30)
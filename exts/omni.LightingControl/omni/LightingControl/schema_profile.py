@@ -0,0 +1,104 @@
+from pxr import Usd
+from typing import Dict, Optional, Set
+
+
+INPUTS_PREFIX = "inputs:"
+LEGACY_PREFIX = ""
+
+# 用于判断命名风格的UsdLux属性（不含前缀）
+_DETECT_BASE_NAMES = ("intensity", "exposure", "color", "colorTemperature", "enableColorTemperature", "specular")
+
+
+def get_schema_prefix():
+    """根据已注册的UsdLux schema判断当前USD版本使用的属性前缀"""
+    try:
+        prim_def = Usd.SchemaRegistry().FindConcretePrimDefinition("SphereLight")
+        if prim_def:
+            names = prim_def.GetPropertyNames()
+            if INPUTS_PREFIX + "intensity" in names:
+                return INPUTS_PREFIX
+            if "intensity" in names:
+                return LEGACY_PREFIX
+    except Exception as e:
+        print(f"读取UsdLux schema定义失败: {str(e)}")
+    return INPUTS_PREFIX
+
+
+class LightSchemaProfile:
+    """舞台级UsdLux属性命名配置
+
+    旧版UsdLux使用 intensity/color，新版使用 inputs:intensity/inputs:color。
+    检测只做一次：逐个灯光查看其prim stack中最强的、带灯光属性意见的spec，
+    记录每个layer使用的命名风格。若整个舞台风格一致则所有灯光直接使用统一前缀；
+    混合舞台则按灯光记录各自的前缀，保证写入时不会产生重复属性。
+    """
+
+    def __init__(self, stage, light_prims=None):
+        self.stage = stage
+        self.schema_prefix = get_schema_prefix()
+        self.uniform_prefix: Optional[str] = None
+        self.layer_conventions: Dict[str, Set[str]] = {}  # layer标识 -> 出现过的前缀
+        self._prim_prefixes: Dict[object, str] = {}
+        self._detected = False
+        if light_prims is not None:
+            self.detect(light_prims)
+
+    def _detect_prim_prefix(self, prim):
+        """从prim stack中找出最强的灯光属性意见所用的前缀，没有意见时返回None"""
+        for spec in prim.GetPrimStack():
+            attributes = spec.attributes
+            for base_name in _DETECT_BASE_NAMES:
+                if INPUTS_PREFIX + base_name in attributes:
+                    return INPUTS_PREFIX, spec.layer
+                if base_name in attributes:
+                    return LEGACY_PREFIX, spec.layer
+        return None, None
+
+    def detect(self, light_prims):
+        """对舞台中的灯光执行一次命名风格检测"""
+        self.layer_conventions.clear()
+        self._prim_prefixes.clear()
+
+        prim_prefixes = {}
+        for prim in light_prims:
+            prefix, layer = self._detect_prim_prefix(prim)
+            if prefix is None:
+                continue
+            prim_prefixes[prim.GetPath()] = prefix
+            self.layer_conventions.setdefault(layer.identifier, set()).add(prefix)
+
+        used_prefixes = set(prim_prefixes.values())
+        if len(used_prefixes) <= 1:
+            # 风格一致：没有作者意见的灯光也沿用同一风格
+            self.uniform_prefix = used_prefixes.pop() if used_prefixes else self.schema_prefix
+        else:
+            self.uniform_prefix = None
+            self._prim_prefixes = prim_prefixes
+        self._detected = True
+
+    @property
+    def is_mixed(self):
+        """舞台中是否同时存在两种命名风格"""
+        return self._detected and self.uniform_prefix is None
+
+    def get_mixed_layers(self):
+        """获取同一layer中同时出现两种命名风格的layer标识"""
+        return sorted(identifier for identifier, prefixes in self.layer_conventions.items() if len(prefixes) > 1)
+
+    def get_prefix(self, prim):
+        """获取灯光应使用的属性前缀"""
+        if self.uniform_prefix is not None:
+            return self.uniform_prefix
+
+        path = prim.GetPath()
+        prefix = self._prim_prefixes.get(path)
+        if prefix is None:
+            prefix, _ = self._detect_prim_prefix(prim)
+            if prefix is None:
+                prefix = self.schema_prefix
+            self._prim_prefixes[path] = prefix
+        return prefix
+
+    def forget(self, path):
+        """丢弃某个灯光的前缀记录（prim resync后重新检测）"""
+        self._prim_prefixes.pop(path, None)
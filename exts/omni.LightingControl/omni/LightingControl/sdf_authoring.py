@@ -0,0 +1,158 @@
+from pxr import Usd, Sdf, Tf
+from typing import Dict, List, Optional, Tuple
+
+from .attribute_cache import LightAttributeCache, LIGHT_ATTRIBUTES
+from .instancing import get_prototype_prim, is_instanced_light
+
+
+class SdfLightWriter:
+    """直接写入编辑目标layer中Sdf spec的灯光属性写入后端
+
+    Usd.Attribute.Set 每次调用都要经过合成后的舞台查找；对数万灯光的灯光组，
+    这里直接修改编辑目标layer中的 Sdf.AttributeSpec，所有写入在一个 Sdf.ChangeBlock 中完成。
+    只有能确认写入位置与Usd API完全一致时才走Sdf路径，其余写入交还给调用方用Usd API处理：
+    编辑目标的映射不是恒等映射、或者需要新建属性spec但灯光（或其祖先）带有
+    引用/载荷/继承/特化，此时无法从本地layer确认属性的值类型。
+
+    实例代理无法通过Usd API编写，对它的写入重定向到原型的来源spec，一次编辑作用于全部实例：
+    来源spec在舞台的layer stack中时写入编辑目标layer的同一路径；原型只来自外部资产时，
+    实例之下的本地意见不参与合成，只能修改资产文件，这里不隐式编辑外部layer，跳过并报告。
+    """
+
+    def __init__(self, stage, attribute_cache: LightAttributeCache):
+        self.stage = stage
+        self.attribute_cache = attribute_cache
+        self._arc_cache: Dict[Sdf.Path, bool] = {}  # prim路径 -> 自身是否带有组合弧
+        self._prototype_sources: Dict[Sdf.Path, Optional[Sdf.Path]] = {}  # 原型prim路径 -> 本地来源spec路径
+        self._listener = None
+        if stage:
+            self._listener = Tf.Notice.Register(Usd.Notice.ObjectsChanged, self._on_objects_changed, stage)
+
+    def destroy(self):
+        """注销通知监听并清空缓存"""
+        if self._listener:
+            self._listener.Revoke()
+            self._listener = None
+        self._arc_cache.clear()
+        self._prototype_sources.clear()
+        self.stage = None
+
+    def _on_objects_changed(self, notice, stage):
+        """Tf.Notice回调：prim resync可能改变组合弧和原型"""
+        if stage != self.stage:
+            return
+        if any(p.IsAbsoluteRootOrPrimPath() for p in notice.GetResyncedPaths()):
+            self._arc_cache.clear()
+            self._prototype_sources.clear()
+
+    def _has_arcs(self, path):
+        cached = self._arc_cache.get(path)
+        if cached is None:
+            prim = self.stage.GetPrimAtPath(path)
+            cached = bool(prim) and (prim.HasAuthoredReferences() or prim.HasAuthoredPayloads()
+                                     or prim.HasAuthoredInherits() or prim.HasAuthoredSpecializes())
+            self._arc_cache[path] = cached
+        return cached
+
+    def _has_ancestral_arcs(self, path):
+        """灯光自身或任一祖先是否带有组合弧"""
+        while not path.isEmpty and path != Sdf.Path.absoluteRootPath:
+            if self._has_arcs(path):
+                return True
+            path = path.GetParentPath()
+        return False
+
+    def get_target_layer(self):
+        """获取可直接写入的编辑目标layer，编辑目标不是恒等映射时返回None"""
+        edit_target = self.stage.GetEditTarget() if self.stage else None
+        if edit_target is None or not edit_target.GetMapFunction().isIdentity:
+            return None
+        return edit_target.GetLayer()
+
+    def get_prototype_source(self, light_prim):
+        """获取实例中灯光的原型在舞台layer stack中最强的来源spec路径，原型只来自外部资产时返回None"""
+        prototype_prim = get_prototype_prim(light_prim)
+        prototype_path = prototype_prim.GetPath()
+        if prototype_path in self._prototype_sources:
+            return self._prototype_sources[prototype_path]
+
+        local_layers = set(self.stage.GetLayerStack())
+        source = next((prim_spec.path for prim_spec in prototype_prim.GetPrimStack()
+                       if prim_spec.layer in local_layers), None)
+        self._prototype_sources[prototype_path] = source
+        return source
+
+    def resolve_instanced_spec(self, layer, light_prim, prop):
+        """解析实例中灯光属性在layer中的写入位置，返回 (属性路径, 已有的属性spec或None)；不能写入时返回None"""
+        spec_path = self.get_prototype_source(light_prim)
+        if spec_path is None:
+            return None
+        attr_path = spec_path.AppendProperty(self.attribute_cache.get_attribute_name(light_prim, prop))
+        return attr_path, layer.GetAttributeAtPath(attr_path)
+
+    def resolve_spec(self, layer, light_prim, prop):
+        """解析灯光属性在layer中的写入位置，返回 (属性路径, 已有的属性spec或None)；不能直接写入时返回None"""
+        if is_instanced_light(light_prim):
+            return None
+        attr_path = light_prim.GetPath().AppendProperty(self.attribute_cache.get_attribute_name(light_prim, prop))
+        attr_spec = layer.GetAttributeAtPath(attr_path)
+        if not attr_spec and self._has_ancestral_arcs(light_prim.GetPath()):
+            return None
+        return attr_path, attr_spec
+
+    @staticmethod
+    def ensure_spec(layer, attr_path, attr_spec, type_name):
+        """确保属性spec存在（需在变更块内调用）"""
+        if attr_spec:
+            return attr_spec
+        prim_path = attr_path.GetPrimPath()
+        prim_spec = layer.GetPrimAtPath(prim_path) or Sdf.CreatePrimInLayer(layer, prim_path)
+        return Sdf.AttributeSpec(prim_spec, attr_path.name, type_name)
+
+    def author(self, items) -> Tuple[List, List]:
+        """写入 [(light_prim, 逻辑属性名, USD值), ...]
+
+        返回 (通过Sdf写入成功的条目列表, 需要回退到Usd API的条目列表)。
+        所有spec的解析在变更块之外完成，变更块内只做Sdf编辑。
+        实例中的灯光不会出现在回退列表中：无法重定向到本地的原型来源时跳过并报告。
+        同一原型的多个实例代理解析到同一个属性spec，只写入一次（以最后一个值为准），全部计为已写入。
+        """
+        layer = self.get_target_layer()
+
+        direct: Dict[Sdf.Path, List] = {}  # 属性路径 -> [属性spec, 值类型, 值, 条目列表]
+        fallback = []
+        skipped = []
+        for item in items:
+            light_prim, prop, value = item
+            instanced = is_instanced_light(light_prim)
+            if layer is None:
+                resolved = None
+            elif instanced:
+                resolved = self.resolve_instanced_spec(layer, light_prim, prop)
+            else:
+                resolved = self.resolve_spec(layer, light_prim, prop)
+            if resolved is None:
+                (skipped if instanced else fallback).append(item)
+                continue
+            attr_path, attr_spec = resolved
+            entry = direct.get(attr_path)
+            if entry is None:
+                direct[attr_path] = [attr_spec, LIGHT_ATTRIBUTES[prop][1], value, [item]]
+            else:
+                entry[2] = value
+                entry[3].append(item)
+
+        if skipped:
+            print(f"实例中的灯光无法重定向到编辑目标中的原型来源（原型只来自外部资产或编辑目标不是恒等映射），已跳过 {len(skipped)} 项: "
+                  f"{skipped[0][0].GetPath()}")
+
+        written = []
+        with Sdf.ChangeBlock():
+            for attr_path, (attr_spec, type_name, value, spec_items) in direct.items():
+                try:
+                    attr_spec = self.ensure_spec(layer, attr_path, attr_spec, type_name)
+                    attr_spec.default = value
+                    written.extend(spec_items)
+                except Exception as e:
+                    print(f"写入属性spec失败 {attr_path}: {str(e)}")
+        return written, fallback
@@ -0,0 +1,142 @@
+from pxr import Sdf
+from typing import Dict, Iterable, List
+
+from .light_index import LightIndex, to_sdf_path
+
+
+ISOLATION_LAYER_TAG = "omni.LightingControl.isolation.usda"
+
+
+class LightIsolation:
+    """灯光独奏/静音：停用（SetActive(False)）房间或灯光组子树，让合成和Hydra直接跳过这些灯光
+
+    active=false 意见写在session层下的一个匿名layer中，不修改资产文件；
+    restore() 卸下该layer即可一步恢复。停用前通过LightIndex统计被移出渲染的灯光数量。
+    """
+
+    def __init__(self, stage, index: LightIndex):
+        self.stage = stage
+        self.index = index
+        self.layer = None
+        self._muted: Dict[Sdf.Path, int] = {}  # 被停用的路径 -> 其中的灯光数量
+
+    @property
+    def is_active(self):
+        """是否有被停用的子树"""
+        return bool(self._muted)
+
+    def get_muted_paths(self) -> List[Sdf.Path]:
+        """获取被停用的子树路径"""
+        return sorted(self._muted.keys())
+
+    def get_removed_light_count(self):
+        """获取被移出渲染的灯光总数"""
+        return sum(self._muted.values())
+
+    def _ensure_layer(self):
+        """创建并挂载到session层下的独奏layer"""
+        if self.layer is None:
+            if not self.stage:
+                raise ValueError("没有可用的USD舞台")
+            self.layer = Sdf.Layer.CreateAnonymous(ISOLATION_LAYER_TAG)
+            self.stage.GetSessionLayer().subLayerPaths.insert(0, self.layer.identifier)
+        return self.layer
+
+    def _deactivate(self, paths):
+        """在一个变更块中停用给定路径，返回本次移出渲染的灯光数量"""
+        # 已被停用的子树下的路径无需再写
+        paths = sorted(set(paths))
+        new_paths = []
+        for path in paths:
+            if any(path.HasPrefix(muted) for muted in self._muted) or \
+                    (new_paths and path.HasPrefix(new_paths[-1])):
+                continue
+            new_paths.append(path)
+        if not new_paths:
+            return 0
+
+        # 停用之后索引会移除这些子树，因此先统计灯光数量
+        counts = {path: len(self.index.get_all_light_paths(path)) for path in new_paths}
+        layer = self._ensure_layer()
+        with Sdf.ChangeBlock():
+            for path in new_paths:
+                try:
+                    spec = layer.GetPrimAtPath(path) or Sdf.CreatePrimInLayer(layer, path)
+                    spec.active = False
+                    # 新停用的祖先覆盖之前停用的后代，后代的灯光数量并入祖先
+                    total = counts[path]
+                    for muted in [p for p in self._muted if p.HasPrefix(path)]:
+                        self._clear_active(muted)
+                        total += self._muted.pop(muted)
+                    self._muted[path] = total
+                except Exception as e:
+                    print(f"停用prim失败 {path}: {str(e)}")
+        return sum(counts.values())
+
+    def _clear_active(self, path):
+        spec = self.layer.GetPrimAtPath(path) if self.layer else None
+        if spec:
+            spec.ClearActive()
+
+    def mute(self, paths: Iterable) -> int:
+        """停用给定的房间/灯光组（或单个灯光），返回本次移出渲染的灯光数量"""
+        return self._deactivate([to_sdf_path(path) for path in paths if not to_sdf_path(path).isEmpty])
+
+    def solo(self, paths: Iterable, lights_root) -> int:
+        """只保留给定的房间/灯光组：停用灯光根下所有不在这些路径上的兄弟子树，返回本次移出渲染的灯光数量
+
+        之前的独奏/静音停用了目标本身、目标的祖先或后代时先将其恢复，连续独奏不同房间时只保留最后的目标。
+        """
+        lights_root = to_sdf_path(lights_root)
+        targets = {to_sdf_path(path) for path in paths}
+        targets = {path for path in targets if not path.isEmpty and path.HasPrefix(lights_root)}
+        if lights_root.isEmpty or not targets:
+            return 0
+
+        revived = [muted for muted in self._muted
+                   if any(target.HasPrefix(muted) or muted.HasPrefix(target) for target in targets)]
+        if revived:
+            # 恢复后索引收到resync通知，重新包含这些子树，下面才能取到它们的子路径
+            with Sdf.ChangeBlock():
+                for muted in revived:
+                    self._clear_active(muted)
+                    self._muted.pop(muted)
+
+        # 目标及其到灯光根之间的祖先都保持激活
+        keep = set()
+        for path in targets:
+            keep.update(prefix for prefix in path.GetPrefixes() if prefix.HasPrefix(lights_root))
+
+        to_mute = []
+        for parent in sorted(keep):
+            if parent in targets:
+                continue
+            for child in self.index.get_child_paths(parent):
+                if child not in keep:
+                    to_mute.append(child)
+        return self._deactivate(to_mute)
+
+    def unmute(self, paths: Iterable) -> int:
+        """重新激活给定的已停用子树，返回恢复的灯光数量"""
+        restored = 0
+        with Sdf.ChangeBlock():
+            for path in paths:
+                path = to_sdf_path(path)
+                if path in self._muted:
+                    self._clear_active(path)
+                    restored += self._muted.pop(path)
+        if not self._muted:
+            self.restore()
+        return restored
+
+    def restore(self) -> int:
+        """卸下独奏layer，一步恢复所有被停用的子树，返回恢复的灯光数量"""
+        restored = self.get_removed_light_count()
+        if self.layer is not None:
+            session_layer = self.stage.GetSessionLayer() if self.stage else None
+            if session_layer and self.layer.identifier in session_layer.subLayerPaths:
+                session_layer.subLayerPaths.remove(self.layer.identifier)
+            self.layer.Clear()
+            self.layer = None
+        self._muted.clear()
+        return restored
@@ -0,0 +1,344 @@
+import numpy as np
+from pxr import Usd, Sdf, Tf, UsdGeom
+from typing import Dict, List, Optional
+
+from .light_index import LightIndex, to_sdf_path
+from .tracing import tracer
+
+
+class PointOctree:
+    """点的八叉树：节点按立方体单元划分，每个节点的点在order数组中连续存放，子节点编号也连续
+
+    查询按层推进，每层用NumPy一次判断全部候选节点：整个单元落在查询范围内的节点直接取一段切片，
+    与范围相交的叶子节点的点最后一起向量化判断。点移动后仍在原叶子单元内时只更新坐标；
+    移出单元的点放入溢出集合，查询时单独判断，溢出的点过多时整体重建。
+    """
+
+    LEAF_SIZE = 32
+    MAX_DEPTH = 16
+
+    def __init__(self, positions, leaf_size=LEAF_SIZE, max_depth=MAX_DEPTH):
+        self.leaf_size = leaf_size
+        self.max_depth = max_depth
+        self.rebuild(positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def rebuild(self, positions=None):
+        """按当前（或给定的）坐标重建八叉树"""
+        if positions is not None:
+            self.positions = np.array(positions, dtype=np.float64).reshape(-1, 3)
+        count = len(self.positions)
+        self.order = np.arange(count, dtype=np.int64)
+        self._overflow = np.zeros(count, dtype=bool)
+        self._overflow_rows = np.empty(0, dtype=np.int64)
+        self._row_leaf = np.zeros(count, dtype=np.int64)
+
+        cell_min, cell_max, starts, ends, first_child, child_count = [], [], [], [], [], []
+
+        def _add_node(node_min, node_max, start, end):
+            cell_min.append(node_min)
+            cell_max.append(node_max)
+            starts.append(start)
+            ends.append(end)
+            first_child.append(0)
+            child_count.append(0)
+            return len(starts) - 1
+
+        stack = []
+        if count:
+            lo = self.positions.min(axis=0)
+            hi = self.positions.max(axis=0)
+            center = (lo + hi) * 0.5
+            half = max(float((hi - lo).max()) * 0.5, 1e-6)
+            stack.append((_add_node(center - half, center + half, 0, count), 0))
+
+        while stack:
+            node, depth = stack.pop()
+            start, end = starts[node], ends[node]
+            if end - start <= self.leaf_size or depth >= self.max_depth:
+                self._row_leaf[self.order[start:end]] = node
+                continue
+
+            # 按八分体编码稳定排序，子节点的点在order中连续
+            rows = self.order[start:end]
+            node_min, node_max = cell_min[node], cell_max[node]
+            mid = (node_min + node_max) * 0.5
+            above = (self.positions[rows] >= mid).astype(np.int64)
+            codes = above[:, 0] | (above[:, 1] << 1) | (above[:, 2] << 2)
+            self.order[start:end] = rows[np.argsort(codes, kind="stable")]
+            counts = np.bincount(codes, minlength=8)
+
+            first_child[node] = len(starts)
+            offset = start
+            for octant in range(8):
+                octant_count = int(counts[octant])
+                if not octant_count:
+                    continue
+                bits = np.array([(octant >> axis) & 1 for axis in range(3)], dtype=bool)
+                child = _add_node(np.where(bits, mid, node_min), np.where(bits, node_max, mid),
+                                  offset, offset + octant_count)
+                child_count[node] += 1
+                stack.append((child, depth + 1))
+                offset += octant_count
+
+        self._cell_min = np.asarray(cell_min, dtype=np.float64).reshape(-1, 3)
+        self._cell_max = np.asarray(cell_max, dtype=np.float64).reshape(-1, 3)
+        self._starts = np.asarray(starts, dtype=np.int64)
+        self._ends = np.asarray(ends, dtype=np.int64)
+        self._first_child = np.asarray(first_child, dtype=np.int64)
+        self._child_count = np.asarray(child_count, dtype=np.int64)
+
+    def update(self, rows, positions):
+        """更新一组点的坐标，返回是否触发了重建"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return False
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        self.positions[rows] = positions
+        if not len(self._starts):
+            self.rebuild()
+            return True
+
+        leaves = self._row_leaf[rows]
+        inside = np.all((positions >= self._cell_min[leaves]) & (positions <= self._cell_max[leaves]), axis=1)
+        self._overflow[rows[~inside]] = True
+        self._overflow_rows = np.flatnonzero(self._overflow)
+        if len(self._overflow_rows) > max(self.leaf_size, len(self.positions) // 16):
+            self.rebuild()
+            return True
+        return False
+
+    @staticmethod
+    def _concat_ranges(starts, counts):
+        """把多个 [start, start + count) 区间拼接为一个下标数组"""
+        total = int(counts.sum())
+        if not total:
+            return np.empty(0, dtype=np.int64)
+        return np.arange(total, dtype=np.int64) + np.repeat(starts - np.cumsum(counts) + counts, counts)
+
+    def _traverse(self, classify):
+        """按层遍历，返回 (完全落在范围内的节点的点, 与范围相交的叶子节点的点)
+
+        classify(cell_min, cell_max) 返回 (相交, 完全包含) 两个布尔数组。
+        """
+        full_nodes, leaf_nodes = [], []
+        frontier = np.zeros(1 if len(self._starts) else 0, dtype=np.int64)
+        while len(frontier):
+            hit, inside = classify(self._cell_min[frontier], self._cell_max[frontier])
+            full_nodes.append(frontier[hit & inside])
+            partial = frontier[hit & ~inside]
+            counts = self._child_count[partial]
+            leaf_nodes.append(partial[counts == 0])
+            inner = counts > 0
+            frontier = self._concat_ranges(self._first_child[partial[inner]], counts[inner])
+
+        def _rows(nodes):
+            nodes = np.concatenate(nodes) if nodes else np.empty(0, dtype=np.int64)
+            return self.order[self._concat_ranges(self._starts[nodes], self._ends[nodes] - self._starts[nodes])]
+
+        return _rows(full_nodes), _rows(leaf_nodes)
+
+    def _collect(self, full_rows, leaf_rows, contains):
+        """合并遍历结果和溢出点（溢出点只按坐标判断），按行号排序"""
+        rows = np.concatenate([full_rows, leaf_rows[contains(self.positions[leaf_rows])]])
+        extra = self._overflow_rows
+        if len(extra):
+            rows = np.concatenate([rows[~self._overflow[rows]], extra[contains(self.positions[extra])]])
+        return np.sort(rows)
+
+    def query_box(self, box_min, box_max) -> np.ndarray:
+        """查询落在轴对齐包围盒内（含边界）的点，返回行号"""
+        box_min = np.asarray(box_min, dtype=np.float64)
+        box_max = np.asarray(box_max, dtype=np.float64)
+
+        def _classify(cell_min, cell_max):
+            hit = ~((cell_min > box_max).any(axis=1) | (cell_max < box_min).any(axis=1))
+            return hit, (cell_min >= box_min).all(axis=1) & (cell_max <= box_max).all(axis=1)
+
+        def _contains(points):
+            return np.all((points >= box_min) & (points <= box_max), axis=1)
+
+        return self._collect(*self._traverse(_classify), _contains)
+
+    def query_sphere(self, center, radius) -> np.ndarray:
+        """查询与center距离不超过radius的点，返回行号"""
+        center = np.asarray(center, dtype=np.float64)
+        radius_sq = float(radius) ** 2
+
+        def _classify(cell_min, cell_max):
+            nearest = np.clip(center, cell_min, cell_max) - center
+            farthest = np.maximum(np.abs(center - cell_min), np.abs(center - cell_max))
+            return (np.einsum("ij,ij->i", nearest, nearest) <= radius_sq,
+                    np.einsum("ij,ij->i", farthest, farthest) <= radius_sq)
+
+        def _contains(points):
+            offsets = points - center
+            return np.einsum("ij,ij->i", offsets, offsets) <= radius_sq
+
+        return self._collect(*self._traverse(_classify), _contains)
+
+    def _locate(self, point):
+        """从根向下找到包含point（先夹到根单元内）的最深节点"""
+        node = 0
+        point = np.clip(point, self._cell_min[0], self._cell_max[0])
+        while self._child_count[node]:
+            children = np.arange(self._first_child[node], self._first_child[node] + self._child_count[node])
+            inside = np.all((point >= self._cell_min[children]) & (point <= self._cell_max[children]), axis=1)
+            if not inside.any():
+                break
+            node = int(children[np.argmax(inside)])
+        return node
+
+    def query_nearest(self, point, count=1, max_distance=None):
+        """查询距离point最近的count个点，返回按距离排序的 (行号, 距离)
+
+        先用point所在单元中的点估计第count近的距离作为半径，再做一次球体查询；
+        单元中的点不够时半径逐次加倍。
+        """
+        point = np.asarray(point, dtype=np.float64)
+        if count <= 0 or not len(self.positions):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        count = min(count, len(self.positions))
+
+        node = self._locate(point)
+        candidates = self.order[self._starts[node]:self._ends[node]]
+        candidates = np.concatenate([candidates[~self._overflow[candidates]], self._overflow_rows])
+        if len(candidates) >= count:
+            offsets = self.positions[candidates] - point
+            radius = float(np.sqrt(np.partition(np.einsum("ij,ij->i", offsets, offsets), count - 1)[count - 1]))
+        else:
+            farthest = np.maximum(np.abs(point - self._cell_min[node]), np.abs(point - self._cell_max[node]))
+            radius = float(np.linalg.norm(farthest))
+
+        # 半径覆盖根单元和全部溢出点之后必然包含所有点
+        farthest = np.maximum(np.abs(point - self._cell_min[0]), np.abs(point - self._cell_max[0]))
+        limit = float(np.linalg.norm(farthest))
+        if len(self._overflow_rows):
+            limit = max(limit, float(np.linalg.norm(self.positions[self._overflow_rows] - point, axis=1).max()))
+        if max_distance is not None:
+            limit = min(limit, float(max_distance))
+        radius = min(max(radius, 1e-9), limit)
+
+        while True:
+            rows = self.query_sphere(point, radius)
+            if len(rows) >= count or radius >= limit:
+                break
+            radius = min(radius * 2.0, limit)
+
+        distances = np.linalg.norm(self.positions[rows] - point, axis=1)
+        if len(rows) > count:
+            top = np.argpartition(distances, count - 1)[:count]
+            rows, distances = rows[top], distances[top]
+        order = np.argsort(distances, kind="stable")
+        return rows[order], distances[order]
+
+
+class LightSpatialIndex:
+    """灯光世界坐标的空间索引，支持包围盒、球体和k近邻查询，查询时不遍历舞台
+
+    灯光列表来自LightIndex，层次结构变化（generation变化）时用 UsdGeom.XformCache 批量读取坐标并重建；
+    灯光或其祖先的变换属性变化只记录对应的prim，下次查询前重新读取这些prim下灯光的坐标并增量更新八叉树。
+    """
+
+    def __init__(self, index: LightIndex, time=Usd.TimeCode.Default()):
+        self.index = index
+        self.stage = index.stage
+        self.time = time
+
+        self._generation = None
+        self._paths: List[Sdf.Path] = []
+        self._rows: Dict[Sdf.Path, int] = {}
+        self._octree: Optional[PointOctree] = None
+        self._dirty_prims = set()
+
+        self._listener = None
+        if self.stage:
+            self._listener = Tf.Notice.Register(Usd.Notice.ObjectsChanged, self._on_objects_changed, self.stage)
+
+    def destroy(self):
+        """注销通知监听并清空索引"""
+        if self._listener:
+            self._listener.Revoke()
+            self._listener = None
+        self._generation = None
+        self._paths = []
+        self._rows.clear()
+        self._octree = None
+        self._dirty_prims.clear()
+
+    def set_time(self, time):
+        """设置读取变换所用的时间码，变化后下次查询时重新读取全部坐标"""
+        if time != self.time:
+            self.time = time
+            self._generation = None
+
+    def _read_positions(self, paths):
+        """用同一个XformCache批量读取灯光的世界坐标"""
+        cache = UsdGeom.XformCache(self.time)
+        positions = np.empty((len(paths), 3), dtype=np.float64)
+        for row, path in enumerate(paths):
+            positions[row] = cache.GetLocalToWorldTransform(self.index.get_prim(path)).ExtractTranslation()
+        return positions
+
+    def _ensure_tree(self):
+        """层次结构变化后重建，变换变化后增量更新"""
+        if self._generation != self.index.generation or self._octree is None:
+            self._generation = self.index.generation
+            self._dirty_prims.clear()
+            self._paths = self.index.get_all_light_paths(Sdf.Path.absoluteRootPath)
+            self._rows = {path: row for row, path in enumerate(self._paths)}
+            with tracer.scope("LightSpatialIndex.build", count=len(self._paths)):
+                self._octree = PointOctree(self._read_positions(self._paths))
+            return
+
+        if self._dirty_prims:
+            rows = set()
+            for prim_path in self._dirty_prims:
+                rows.update(self._rows[path] for path in self.index.get_all_light_paths(prim_path)
+                            if path in self._rows)
+                # 原型中的变换变化映射到全部实例代理
+                rows.update(self._rows[path] for path in self.index.get_instance_proxy_paths(prim_path)
+                            if path in self._rows)
+            self._dirty_prims.clear()
+            if rows:
+                rows = sorted(rows)
+                with tracer.scope("LightSpatialIndex.update", count=len(rows)):
+                    self._octree.update(rows, self._read_positions([self._paths[row] for row in rows]))
+
+    def _on_objects_changed(self, notice, stage):
+        """Tf.Notice回调：记录变换属性发生变化的prim（resync由LightIndex的generation处理）"""
+        if stage != self.stage or self._generation is None:
+            return
+        for path in list(notice.GetChangedInfoOnlyPaths()) + list(notice.GetResyncedPaths()):
+            if path.IsPropertyPath() and UsdGeom.Xformable.IsTransformationAffectedByAttrNamed(path.name):
+                self._dirty_prims.add(path.GetPrimPath())
+
+    def _to_paths(self, rows):
+        return [self._paths[row] for row in rows.tolist()]
+
+    def get_position(self, path):
+        """获取灯光的世界坐标，不在索引中时返回None"""
+        self._ensure_tree()
+        row = self._rows.get(to_sdf_path(path))
+        return None if row is None else tuple(self._octree.positions[row].tolist())
+
+    def query_box(self, box_min, box_max) -> List[Sdf.Path]:
+        """查询世界坐标落在包围盒内的灯光路径（保持舞台顺序）"""
+        self._ensure_tree()
+        with tracer.scope("LightSpatialIndex.query_box"):
+            return self._to_paths(self._octree.query_box(box_min, box_max))
+
+    def query_sphere(self, center, radius) -> List[Sdf.Path]:
+        """查询与center距离不超过radius的灯光路径（保持舞台顺序）"""
+        self._ensure_tree()
+        with tracer.scope("LightSpatialIndex.query_sphere"):
+            return self._to_paths(self._octree.query_sphere(center, radius))
+
+    def query_nearest(self, point, count=1, max_distance=None) -> List[Sdf.Path]:
+        """查询距离point最近的count个灯光路径（按距离由近到远）"""
+        self._ensure_tree()
+        with tracer.scope("LightSpatialIndex.query_nearest"):
+            rows, _ = self._octree.query_nearest(point, count, max_distance)
+            return self._to_paths(rows)
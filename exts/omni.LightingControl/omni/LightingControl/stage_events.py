@@ -0,0 +1,56 @@
+import importlib.util
+from typing import Callable, Optional
+
+
+def get_stage_key(stage):
+    """舞台标识（根层标识），同一文件重新打开后键不变，匿名舞台各不相同"""
+    if not stage:
+        return None
+    return stage.GetRootLayer().identifier
+
+
+class StageEventListener:
+    """订阅omni.usd上下文的舞台生命周期事件（OPENED、CLOSING、CLOSED、ASSETS_LOADED、SAVED）
+
+    CLOSING时旧舞台仍然有效，适合撤销写在旧舞台上的临时编辑；CLOSED之后只应释放缓存。
+    """
+
+    def __init__(self, name, on_opened: Optional[Callable] = None, on_closing: Optional[Callable] = None,
+                 on_closed: Optional[Callable] = None, on_assets_loaded: Optional[Callable] = None,
+                 on_saved: Optional[Callable] = None):
+        import omni.usd
+
+        self._handlers = {}
+        for event_type, handler in ((omni.usd.StageEventType.OPENED, on_opened),
+                                    (omni.usd.StageEventType.CLOSING, on_closing),
+                                    (omni.usd.StageEventType.CLOSED, on_closed),
+                                    (omni.usd.StageEventType.ASSETS_LOADED, on_assets_loaded),
+                                    (omni.usd.StageEventType.SAVED, on_saved)):
+            if handler:
+                self._handlers[int(event_type)] = handler
+        self._sub = omni.usd.get_context().get_stage_event_stream().create_subscription_to_pop(
+            self._on_stage_event, name=name)
+
+    def destroy(self):
+        """取消订阅"""
+        self._sub = None
+        self._handlers.clear()
+
+    def _on_stage_event(self, event):
+        handler = self._handlers.get(event.type)
+        if handler:
+            try:
+                handler()
+            except Exception as e:
+                print(f"处理舞台事件失败: {str(e)}")
+
+
+def subscribe_stage_events(name, **handlers) -> Optional[StageEventListener]:
+    """订阅舞台事件；没有Kit（纯pxr环境）时返回None"""
+    if importlib.util.find_spec("omni.usd") is None:
+        return None
+    try:
+        return StageEventListener(name, **handlers)
+    except Exception as e:
+        print(f"订阅舞台事件失败: {str(e)}")
+        return None
@@ -1,10 +1,15 @@
 import math
+import contextlib
 from datetime import datetime
 import omni.kit.commands  # 确保这行存在
 from pxr import Gf, Sdf
 from typing import List, Optional
 import omni.usd  # 添加这行导入
 
+from .attribute_cache import LightAttributeCache
+from .stage_events import subscribe_stage_events
+from .tracing import traced
+
 # 安装pyephem-sunpath包
 omni.kit.pipapi.install("pyephem-sunpath", None, False, False, None, True, True, None)
 from pyephem_sunpath.sunpath import sunpos, sunrise, sunset
@@ -121,14 +126,72 @@ class SunpathData:
 class SunlightManipulator:
     """阳光操纵器"""
     
-    def __init__(self, pathmodel: SunpathData):
+    def __init__(self, pathmodel: SunpathData, stage=None):
+        self.stage = stage  # 为None时使用Kit当前上下文的舞台
         self.path = None
         self.pathmodel = pathmodel
         self.selected_light_path = None
+        self._attribute_cache = None
+        self.preview_layer = None  # 与LightManager共享的PreviewLayer，预览模式下写入其中
+        self._stage_events = None
+        if stage is None:
+            self._stage_events = subscribe_stage_events("omni.LightingControl.SunlightManipulator",
+                                                        on_opened=self.reset, on_closed=self.reset)
+    
+    def destroy(self):
+        """取消舞台事件订阅并释放属性句柄缓存"""
+        if self._stage_events:
+            self._stage_events.destroy()
+            self._stage_events = None
+        self._release_attribute_cache()
+    
+    def _release_attribute_cache(self):
+        if self._attribute_cache:
+            self._attribute_cache.destroy()
+            self._attribute_cache = None
+    
+    def reset(self):
+        """舞台切换后清空选中的太阳光和属性句柄缓存"""
+        self._release_attribute_cache()
+        self.path = None
+        self.selected_light_path = None
+        self.preview_layer = None
+    
+    def get_stage(self):
+        """获取USD舞台：优先使用传入的舞台，否则使用Kit当前上下文的舞台"""
+        if self.stage:
+            return self.stage
+        return omni.usd.get_context().get_stage()
+    
+    def _edit_context(self):
+        """太阳光写入所用的编辑上下文：预览层挂载时指向预览层"""
+        if self.preview_layer and self.preview_layer.is_active:
+            return self.preview_layer.edit_context()
+        return contextlib.nullcontext()
+    
+    def _get_sun_attribute(self, prop, create=True):
+        """通过缓存的句柄获取太阳光属性，create为True时在属性不存在时创建"""
+        if not self.path:
+            return None
+        
+        stage = self.get_stage()
+        if not stage:
+            return None
+        
+        if self._attribute_cache is None or self._attribute_cache.stage != stage:
+            if self._attribute_cache:
+                self._attribute_cache.destroy()
+            self._attribute_cache = LightAttributeCache(stage)
+        
+        prim = stage.GetPrimAtPath(self.path)
+        if not prim:
+            return None
+        return self._attribute_cache.get(prim, prop, create=create)
     
+    @traced(category="sun")
     def get_all_distant_lights(self):
         """获取场景中所有的DistantLight"""
-        stage = omni.usd.get_context().get_stage()  # 这里使用了 omni.usd
+        stage = self.get_stage()
         distant_lights = []
         
         if not stage:
@@ -159,6 +222,7 @@ class SunlightManipulator:
         if light_path and light_path != "Select DistantLight":
             self.path = light_path
     
+    @traced(category="sun")
     def change_sun(self):
         """改变远光灯属性（旋转）"""
         if not self.path:
@@ -167,29 +231,30 @@ class SunlightManipulator:
         xr, yr = self.pathmodel.dome_rotate_angle()
         
         try:
-            omni.kit.commands.execute(
-                "TransformPrimSRT",
-                path=Sdf.Path(self.path),
-                new_rotation_euler=Gf.Vec3d(xr, yr, 0),
-            )
-            
-            # 获取太阳高度角
-            alt, azm = self.pathmodel.dome_rotate_angle()
-            sun_altitude = -alt  # 转换为实际高度角
-            
-            # 修改可见性判断逻辑：在日出日落时（高度角接近0）也显示太阳
-            # 只有当太阳在地平线以下较深时才隐藏（例如-5度以下）
-            if sun_altitude < -5.0:
-                omni.kit.commands.execute(
-                    "ChangeProperty", prop_path=Sdf.Path(f"{self.path}.visibility"), value="invisible", prev=None
-                )
-            else:
+            with self._edit_context():
                 omni.kit.commands.execute(
-                    "ChangeProperty", prop_path=Sdf.Path(f"{self.path}.visibility"), value="inherited", prev=None
+                    "TransformPrimSRT",
+                    path=Sdf.Path(self.path),
+                    new_rotation_euler=Gf.Vec3d(xr, yr, 0),
                 )
+            
+                # 获取太阳高度角
+                alt, azm = self.pathmodel.dome_rotate_angle()
+                sun_altitude = -alt  # 转换为实际高度角
+            
+                # 修改可见性判断逻辑：在日出日落时（高度角接近0）也显示太阳
+                # 只有当太阳在地平线以下较深时才隐藏（例如-5度以下）
+                if sun_altitude < -5.0:
+                    omni.kit.commands.execute(
+                        "ChangeProperty", prop_path=Sdf.Path(f"{self.path}.visibility"), value="invisible", prev=None
+                    )
+                else:
+                    omni.kit.commands.execute(
+                        "ChangeProperty", prop_path=Sdf.Path(f"{self.path}.visibility"), value="inherited", prev=None
+                    )
                 
-                # 根据太阳高度调整太阳光的强度和颜色
-                self._adjust_sun_for_time_of_day(sun_altitude)
+                    # 根据太阳高度调整太阳光的强度和颜色
+                    self._adjust_sun_for_time_of_day(sun_altitude)
                 
         except Exception as e:
             print(f"改变太阳位置时出错: {e}")
@@ -200,12 +265,6 @@ class SunlightManipulator:
             return
             
         try:
-            stage = omni.usd.get_context().get_stage()
-            prim = stage.GetPrimAtPath(self.path)
-            
-            if not prim:
-                return
-                
             # 根据太阳高度调整强度
             if altitude <= 0:
                 # 日出日落时：较低强度，暖色调
@@ -222,27 +281,19 @@ class SunlightManipulator:
                 intensity = 30000
                 color = [1.0, 1.0, 1.0]  # 白色
                 exposure = 0.0
-                
-            # 设置属性
-            intensity_attr = prim.GetAttribute("intensity")
-            if not intensity_attr:
-                intensity_attr = prim.CreateAttribute("intensity", Sdf.ValueTypeNames.Float)
-            intensity_attr.Set(float(intensity))
             
-            color_attrs = ["color", "inputs:color"]
-            for attr_name in color_attrs:
-                color_attr = prim.GetAttribute(attr_name)
-                if color_attr:
-                    try:
-                        color_attr.Set(Gf.Vec3f(color[0], color[1], color[2]))
-                        break
-                    except Exception:
-                        continue
+            intensity_attr = self._get_sun_attribute("intensity")
+            color_attr = self._get_sun_attribute("color")
+            exposure_attr = self._get_sun_attribute("exposure")
             
-            exposure_attr = prim.GetAttribute("exposure")
-            if not exposure_attr:
-                exposure_attr = prim.CreateAttribute("exposure", Sdf.ValueTypeNames.Float)
-            exposure_attr.Set(float(exposure))
+            # 设置属性
+            with Sdf.ChangeBlock():
+                if intensity_attr:
+                    intensity_attr.Set(float(intensity))
+                if color_attr:
+                    color_attr.Set(Gf.Vec3f(color[0], color[1], color[2]))
+                if exposure_attr:
+                    exposure_attr.Set(float(exposure))
                 
         except Exception as e:
             print(f"调整太阳光属性时出错: {e}")
@@ -259,140 +310,101 @@ class SunlightManipulator:
             return
         
         try:
-            omni.kit.commands.execute(
-                "ChangeProperty", prop_path=Sdf.Path(f"{self.path}.visibility"), value="invisible", prev=None
-            )
+            with self._edit_context():
+                omni.kit.commands.execute(
+                    "ChangeProperty", prop_path=Sdf.Path(f"{self.path}.visibility"), value="invisible", prev=None
+                )
         except Exception as e:
             print(f"隐藏太阳时出错: {e}")
     
+    @traced(category="sun")
     def set_sun_intensity(self, intensity):
         """设置太阳光强度"""
-        if self.path:
-            try:
-                stage = omni.usd.get_context().get_stage()
-                prim = stage.GetPrimAtPath(self.path)
-                if prim:
-                    attr = prim.GetAttribute("intensity")
-                    if not attr:
-                        attr = prim.CreateAttribute("intensity", Sdf.ValueTypeNames.Float)
+        try:
+            with self._edit_context():
+                attr = self._get_sun_attribute("intensity")
+                if attr:
                     attr.Set(float(intensity))
-            except Exception as e:
-                print(f"设置太阳光强度时出错: {e}")
+        except Exception as e:
+            print(f"设置太阳光强度时出错: {e}")
     
+    @traced(category="sun")
     def set_sun_color_temperature(self, temperature):
         """设置太阳光色温"""
-        if self.path:
-            try:
-                stage = omni.usd.get_context().get_stage()
-                prim = stage.GetPrimAtPath(self.path)
-                if prim:
-                    enable_attr = prim.GetAttribute("enableColorTemperature")
-                    if not enable_attr:
-                        enable_attr = prim.CreateAttribute("enableColorTemperature", Sdf.ValueTypeNames.Bool)
-                    enable_attr.Set(True)
-                    
-                    temp_attr = prim.GetAttribute("colorTemperature")
-                    if not temp_attr:
-                        temp_attr = prim.CreateAttribute("colorTemperature", Sdf.ValueTypeNames.Float)
-                    temp_attr.Set(float(temperature))
-            except Exception as e:
-                print(f"设置太阳光色温时出错: {e}")
+        try:
+            with self._edit_context():
+                enable_attr = self._get_sun_attribute("enable_color_temperature")
+                temp_attr = self._get_sun_attribute("color_temperature")
+                with Sdf.ChangeBlock():
+                    if enable_attr:
+                        enable_attr.Set(True)
+                    if temp_attr:
+                        temp_attr.Set(float(temperature))
+        except Exception as e:
+            print(f"设置太阳光色温时出错: {e}")
     
+    @traced(category="sun")
     def set_sun_exposure(self, exposure):
         """设置太阳光曝光"""
-        if self.path:
-            try:
-                stage = omni.usd.get_context().get_stage()
-                prim = stage.GetPrimAtPath(self.path)
-                if prim:
-                    attr = prim.GetAttribute("exposure")
-                    if not attr:
-                        attr = prim.CreateAttribute("exposure", Sdf.ValueTypeNames.Float)
+        try:
+            with self._edit_context():
+                attr = self._get_sun_attribute("exposure")
+                if attr:
                     attr.Set(float(exposure))
-            except Exception as e:
-                print(f"设置太阳光曝光时出错: {e}")
+        except Exception as e:
+            print(f"设置太阳光曝光时出错: {e}")
     
+    @traced(category="sun")
     def set_sun_angle(self, angle):
         """设置太阳光角度"""
-        if self.path:
-            try:
-                stage = omni.usd.get_context().get_stage()
-                prim = stage.GetPrimAtPath(self.path)
-                if prim:
-                    attr = prim.GetAttribute("angle")
-                    if not attr:
-                        attr = prim.CreateAttribute("angle", Sdf.ValueTypeNames.Float)
+        try:
+            with self._edit_context():
+                attr = self._get_sun_attribute("angle")
+                if attr:
                     attr.Set(float(angle))
-            except Exception as e:
-                print(f"设置太阳光角度时出错: {e}")
+        except Exception as e:
+            print(f"设置太阳光角度时出错: {e}")
     
+    @traced(category="sun")
     def set_sun_color(self, color):
         """设置太阳光颜色"""
-        if self.path:
-            try:
-                stage = omni.usd.get_context().get_stage()
-                prim = stage.GetPrimAtPath(self.path)
-                if prim:
-                    color_attrs = ["color", "inputs:color"]
-                    for attr_name in color_attrs:
-                        color_attr = prim.GetAttribute(attr_name)
-                        if color_attr:
-                            try:
-                                color_attr.Set(Gf.Vec3f(color[0], color[1], color[2]))
-                                return True
-                            except Exception as e:
-                                print(f"设置颜色失败 {attr_name}: {str(e)}")
-                    
-                    try:
-                        color_attr = prim.CreateAttribute("inputs:color", Sdf.ValueTypeNames.Color3f)
-                        color_attr.Set(Gf.Vec3f(color[0], color[1], color[2]))
-                        return True
-                    except Exception as e:
-                        print(f"创建颜色属性失败: {str(e)}")
-            except Exception as e:
-                print(f"设置太阳光颜色时出错: {e}")
+        try:
+            with self._edit_context():
+                attr = self._get_sun_attribute("color")
+                if attr:
+                    attr.Set(Gf.Vec3f(color[0], color[1], color[2]))
+                    return True
+        except Exception as e:
+            print(f"设置太阳光颜色时出错: {e}")
         return False
     
+    @traced(category="sun")
     def get_sun_properties(self):
         """获取太阳光属性"""
         if not self.path:
             return {}
-            
-        stage = omni.usd.get_context().get_stage()
+        
+        stage = self.get_stage()
         prim = stage.GetPrimAtPath(self.path)
         
         if not prim:
             return {}
         
+        def _get_value(prop, default_value):
+            attr = self._get_sun_attribute(prop, create=False)
+            if attr and attr.HasAuthoredValue():
+                return attr.Get()
+            return default_value
+        
         properties = {}
         try:
-            intensity_attr = prim.GetAttribute("intensity")
-            if intensity_attr and intensity_attr.HasAuthoredValue():
-                properties["intensity"] = intensity_attr.Get()
-            else:
-                properties["intensity"] = 3000.0
-            
-            temp_attr = prim.GetAttribute("colorTemperature")
-            if temp_attr and temp_attr.HasAuthoredValue():
-                properties["colorTemperature"] = temp_attr.Get()
-            else:
-                properties["colorTemperature"] = 6500.0
-            
-            exposure_attr = prim.GetAttribute("exposure")
-            if exposure_attr and exposure_attr.HasAuthoredValue():
-                properties["exposure"] = exposure_attr.Get()
-            else:
-                properties["exposure"] = 0.0
-            
-            angle_attr = prim.GetAttribute("angle")
-            if angle_attr and angle_attr.HasAuthoredValue():
-                properties["angle"] = angle_attr.Get()
-            else:
-                properties["angle"] = 1.0
+            properties["intensity"] = _get_value("intensity", 3000.0)
+            properties["colorTemperature"] = _get_value("color_temperature", 6500.0)
+            properties["exposure"] = _get_value("exposure", 0.0)
+            properties["angle"] = _get_value("angle", 1.0)
             
-            color_attr = prim.GetAttribute("color")
-            if color_attr and color_attr.HasAuthoredValue():
-                color_value = color_attr.Get()
+            color_value = _get_value("color", None)
+            if color_value is not None:
                 properties["color"] = [color_value[0], color_value[1], color_value[2]]
             else:
                 properties["color"] = [1.0, 1.0, 1.0]
@@ -400,4 +412,4 @@ class SunlightManipulator:
         except Exception as e:
             print(f"获取太阳光属性时出错: {e}")
         
-        return properties
\ No newline at end of file
+        return properties
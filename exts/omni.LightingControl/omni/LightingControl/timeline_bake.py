@@ -0,0 +1,272 @@
+import numpy as np
+from pxr import Usd, Sdf, Vt
+from typing import Dict, List, Tuple
+
+from .attribute_cache import LIGHT_ATTRIBUTES
+from .instancing import is_instanced_light
+from .sdf_authoring import SdfLightWriter
+
+
+# 可以烘焙为时间采样的属性
+BAKEABLE_PROPERTIES = ("color", "intensity", "exposure", "specular", "color_temperature")
+
+# 缓动曲线：输入归一化时间 u ∈ [0, 1]，输出插值权重
+_EASING = {
+    "linear": lambda u: u,
+    "ease_in": lambda u: u * u,
+    "ease_out": lambda u: 1.0 - (1.0 - u) ** 2,
+    "ease_in_out": lambda u: u * u * (3.0 - 2.0 * u),
+}
+CURVE_TYPES = tuple(_EASING.keys())
+
+
+def sample_curve(curve, start_time, end_time, start_values, end_values, step=1.0):
+    """按曲线在 [start_time, end_time] 上以step为间隔采样，返回 (times, values)
+
+    start_values/end_values 可以是单个值、每个灯光一个值 (N,) 或颜色 (N, 3)，按NumPy规则广播；
+    values 的第一维为时间。
+    """
+    if curve not in _EASING:
+        raise ValueError(f"未知的曲线类型: {curve}")
+    if step <= 0.0:
+        raise ValueError("采样间隔必须大于0")
+
+    times = np.arange(start_time, end_time, step, dtype=np.float64)
+    times = np.append(times, float(end_time))
+    span = float(end_time - start_time)
+    u = (times - start_time) / span if span > 0.0 else np.ones_like(times)
+    weights = _EASING[curve](np.clip(u, 0.0, 1.0))
+
+    start_values, end_values = np.broadcast_arrays(np.asarray(start_values, dtype=np.float64),
+                                                   np.asarray(end_values, dtype=np.float64))
+    weights = weights.reshape((-1,) + (1,) * start_values.ndim)
+    return times, start_values[None] + (end_values - start_values)[None] * weights
+
+
+class TimelineRecorder:
+    """记录灯光组属性随时间轴的变化，同一时间码只保留最后一次的值"""
+
+    def __init__(self):
+        self._keys: Dict[str, Dict[float, object]] = {}
+
+    def record(self, prop, time, value):
+        """在time时间码记录属性值"""
+        if prop not in BAKEABLE_PROPERTIES:
+            return
+        self._keys.setdefault(prop, {})[float(time)] = value
+
+    def get_properties(self) -> List[str]:
+        """获取有记录的属性"""
+        return [prop for prop, keys in self._keys.items() if keys]
+
+    def get_keys(self, prop) -> Tuple[np.ndarray, np.ndarray]:
+        """获取属性按时间排序的 (times, values)"""
+        keys = self._keys.get(prop, {})
+        times = sorted(keys.keys())
+        return np.asarray(times, dtype=np.float64), np.asarray([keys[t] for t in times], dtype=np.float64)
+
+    def get_key_count(self):
+        """获取记录的关键帧总数"""
+        return sum(len(keys) for keys in self._keys.values())
+
+    def clear(self):
+        """清空记录"""
+        self._keys.clear()
+
+
+class TimelineBaker:
+    """把灯光组的属性曲线批量烘焙为USD时间采样
+
+    值先整体转换（颜色用 Vt.Vec3fArray.FromNumpy），每个属性的全部写入在一个 Sdf.ChangeBlock 中
+    直接写入编辑目标layer的属性spec；不能直接写Sdf的灯光（见SdfLightWriter）回退到Usd API。
+    注意：属性一旦有时间采样，默认值（滑块写入的值）在时间轴上就不再生效。
+    """
+
+    def __init__(self, sdf_writer: SdfLightWriter):
+        self.sdf_writer = sdf_writer
+
+    @property
+    def stage(self):
+        return self.sdf_writer.stage
+
+    def _split(self, light_prims, prop):
+        """把灯光分为可直接写Sdf的 [(列号列表, 属性路径, 属性spec)] 和需要回退的 [(列号, 灯光)]
+
+        实例代理重定向到原型的来源spec，同一原型的多个实例代理合并为一项（列号列表包含全部实例）；
+        无法重定向的实例代理不能用Usd API编写，跳过并报告。
+        """
+        layer = self.sdf_writer.get_target_layer()
+        direct: Dict[Sdf.Path, List] = {}
+        fallback = []
+        skipped = []
+        for column, light_prim in enumerate(light_prims):
+            instanced = is_instanced_light(light_prim)
+            if layer is None:
+                resolved = None
+            elif instanced:
+                resolved = self.sdf_writer.resolve_instanced_spec(layer, light_prim, prop)
+            else:
+                resolved = self.sdf_writer.resolve_spec(layer, light_prim, prop)
+            if resolved is None:
+                if instanced:
+                    skipped.append(light_prim.GetPath())
+                else:
+                    fallback.append((column, light_prim))
+                continue
+            attr_path, attr_spec = resolved
+            entry = direct.get(attr_path)
+            if entry is None:
+                direct[attr_path] = ([column], attr_path, attr_spec)
+            else:
+                entry[0].append(column)
+        if skipped:
+            print(f"实例中的灯光无法重定向到编辑目标中的原型来源，已跳过 {len(skipped)} 项: {skipped[0]}")
+        return layer, list(direct.values()), fallback
+
+    @staticmethod
+    def _to_columns(prop, values, light_count):
+        """把曲线值整理为每个灯光一列的USD值序列"""
+        values = np.asarray(values, dtype=np.float64)
+        if prop == "color":
+            if values.ndim == 2:
+                values = np.broadcast_to(values[:, None, :], (values.shape[0], light_count, 3))
+            return [Vt.Vec3fArray.FromNumpy(np.ascontiguousarray(values[:, column, :], dtype=np.float32))
+                    for column in range(light_count)]
+        if values.ndim == 1:
+            values = np.broadcast_to(values[:, None], (values.shape[0], light_count))
+        return [values[:, column].tolist() for column in range(light_count)]
+
+    def bake(self, light_prims, prop, times, values, clear_existing=True) -> int:
+        """把 (times, values) 烘焙到每个灯光的属性上，返回写入的灯光数量
+
+        values 的形状为 (T,)、(T, N)，颜色为 (T, 3) 或 (T, N, 3)。
+        clear_existing 为True时先清除编辑目标中已有的时间采样。
+        """
+        if prop not in BAKEABLE_PROPERTIES:
+            raise ValueError(f"不支持烘焙的属性: {prop}")
+        if not light_prims or len(times) == 0:
+            return 0
+
+        times = np.asarray(times, dtype=np.float64).tolist()
+        columns = self._to_columns(prop, values, len(light_prims))
+        type_name = LIGHT_ATTRIBUTES[prop][1]
+        layer, direct, fallback = self._split(light_prims, prop)
+
+        written = 0
+        with Sdf.ChangeBlock():
+            for spec_columns, attr_path, attr_spec in direct:
+                try:
+                    attr_spec = SdfLightWriter.ensure_spec(layer, attr_path, attr_spec, type_name)
+                    if clear_existing:
+                        attr_spec.ClearInfo("timeSamples")
+                    # 共享同一原型spec的实例只能有一组采样，以最后一个实例的列为准
+                    for time, value in zip(times, columns[spec_columns[-1]]):
+                        layer.SetTimeSample(attr_path, time, value)
+                    written += len(spec_columns)
+                except Exception as e:
+                    print(f"烘焙时间采样失败 {attr_path}: {str(e)}")
+
+        # 回退路径需要读取合成后的时间采样，放在变更块之外
+        for column, light_prim in fallback:
+            try:
+                attr = self.sdf_writer.attribute_cache.get(light_prim, prop, create=True)
+                if clear_existing:
+                    for time in attr.GetTimeSamples():
+                        attr.ClearAtTime(time)
+                for time, value in zip(times, columns[column]):
+                    attr.Set(value, Usd.TimeCode(time))
+                written += 1
+            except Exception as e:
+                print(f"烘焙时间采样失败 {light_prim.GetPath()}: {str(e)}")
+        return written
+
+    @staticmethod
+    def _in_range(time, start_time, end_time):
+        return (start_time is None or time >= start_time) and (end_time is None or time <= end_time)
+
+    def clear(self, light_prims, prop, start_time=None, end_time=None) -> int:
+        """清除编辑目标中 [start_time, end_time] 内的时间采样（不指定范围时全部清除），返回清除的采样数量"""
+        layer, direct, fallback = self._split(light_prims, prop)
+        cleared = 0
+        with Sdf.ChangeBlock():
+            for _, attr_path, attr_spec in direct:
+                if not attr_spec:
+                    continue
+                sample_times = layer.ListTimeSamplesForPath(attr_path)
+                if start_time is None and end_time is None:
+                    cleared += len(sample_times)
+                    attr_spec.ClearInfo("timeSamples")
+                    continue
+                for time in sample_times:
+                    if self._in_range(time, start_time, end_time):
+                        layer.EraseTimeSample(attr_path, time)
+                        cleared += 1
+
+        for _, light_prim in fallback:
+            attr = self.sdf_writer.attribute_cache.get(light_prim, prop)
+            if not attr:
+                continue
+            for time in attr.GetTimeSamples():
+                if self._in_range(time, start_time, end_time):
+                    attr.ClearAtTime(time)
+                    cleared += 1
+        return cleared
+
+    def resample(self, light_prims, prop, step, start_time=None, end_time=None) -> int:
+        """按step为间隔对已有时间采样重新采样（线性插值），返回处理的灯光数量
+
+        用于把稀疏的关键帧加密为均匀采样，或把过密的采样稀疏化；范围默认为每个灯光自身的采样范围。
+        """
+        if step <= 0.0:
+            raise ValueError("采样间隔必须大于0")
+        layer, direct, fallback = self._split(light_prims, prop)
+
+        resampled = []  # (属性路径, 新采样时间, 新值)
+        resampled_lights = 0
+        for spec_columns, attr_path, attr_spec in direct:
+            if not attr_spec:
+                continue
+            old_times = layer.ListTimeSamplesForPath(attr_path)
+            if not old_times:
+                continue
+            old_values = [layer.QueryTimeSample(attr_path, time) for time in old_times]
+            resampled.append((attr_path, *self._interpolate(prop, old_times, old_values, step, start_time, end_time)))
+            resampled_lights += len(spec_columns)
+        fallback_resampled = []
+        for _, light_prim in fallback:
+            attr = self.sdf_writer.attribute_cache.get(light_prim, prop)
+            old_times = attr.GetTimeSamples() if attr else []
+            if not old_times:
+                continue
+            old_values = [attr.Get(Usd.TimeCode(time)) for time in old_times]
+            fallback_resampled.append((attr, *self._interpolate(prop, old_times, old_values, step, start_time, end_time)))
+
+        # 只替换重新采样范围内的旧采样，范围外的保持不变
+        with Sdf.ChangeBlock():
+            for attr_path, new_times, new_values in resampled:
+                for time in layer.ListTimeSamplesForPath(attr_path):
+                    if new_times[0] <= time <= new_times[-1]:
+                        layer.EraseTimeSample(attr_path, time)
+                for time, value in zip(new_times, new_values):
+                    layer.SetTimeSample(attr_path, time, value)
+        for attr, new_times, new_values in fallback_resampled:
+            for time in attr.GetTimeSamples():
+                if new_times[0] <= time <= new_times[-1]:
+                    attr.ClearAtTime(time)
+            for time, value in zip(new_times, new_values):
+                attr.Set(value, Usd.TimeCode(time))
+        return resampled_lights + len(fallback_resampled)
+
+    @staticmethod
+    def _interpolate(prop, old_times, old_values, step, start_time, end_time):
+        old_times = np.asarray(old_times, dtype=np.float64)
+        old_values = np.asarray(old_values, dtype=np.float64)
+        start = old_times[0] if start_time is None else start_time
+        end = old_times[-1] if end_time is None else end_time
+        new_times = np.append(np.arange(start, end, step, dtype=np.float64), float(end))
+        if prop == "color":
+            channels = [np.interp(new_times, old_times, old_values[:, channel]) for channel in range(3)]
+            new_values = Vt.Vec3fArray.FromNumpy(np.ascontiguousarray(np.stack(channels, axis=1), dtype=np.float32))
+        else:
+            new_values = np.interp(new_times, old_times, old_values).tolist()
+        return new_times.tolist(), new_values
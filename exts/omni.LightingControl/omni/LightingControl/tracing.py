@@ -0,0 +1,180 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+
+class _NullScope:
+    """关闭追踪时使用的空作用域"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class _Scope:
+    """记录一次完整事件（Chrome trace 的 "X" 事件）"""
+
+    __slots__ = ("_tracer", "_name", "_category", "_args", "_start")
+
+    def __init__(self, tracer, name, category, args):
+        self._tracer = tracer
+        self._name = name
+        self._category = category
+        self._args = args
+        self._start = 0
+
+    def __enter__(self):
+        self._tracer._depth.value = getattr(self._tracer._depth, "value", 0) + 1
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        tracer = self._tracer
+        depth = tracer._depth.value - 1
+        tracer._depth.value = depth
+        args = self._args
+        if exc_type is not None:
+            args = dict(args or {}, error=exc_type.__name__)
+        tracer._record_complete(self._name, self._category, self._start, end, args)
+        if depth == 0:
+            tracer._emit_counters(end)
+        return False
+
+
+class Tracer:
+    """轻量级热点追踪：作用域计时 + 计数器，记录在环形缓冲区中，可导出 Chrome trace_event JSON
+
+    关闭时 scope() 返回共享的空作用域，count() 和 traced 装饰器只做一次布尔判断。
+    导出的文件可以在 chrome://tracing 或 Perfetto 中打开。
+    """
+
+    def __init__(self, capacity=200000):
+        self.enabled = False
+        self._events = deque(maxlen=capacity)
+        self._counters: Dict[str, float] = {}
+        self._counters_dirty = False
+        self._depth = threading.local()
+        self._epoch_ns = time.perf_counter_ns()
+        self._pid = os.getpid()
+
+    # ------------------------------------------------------------------
+    # 控制
+    # ------------------------------------------------------------------
+
+    def enable(self, enabled=True):
+        """开启或关闭追踪"""
+        self.enabled = enabled
+
+    def clear(self):
+        """清空已记录的事件和计数器"""
+        self._events.clear()
+        self._counters.clear()
+        self._counters_dirty = False
+        self._epoch_ns = time.perf_counter_ns()
+
+    def get_event_count(self):
+        """获取缓冲区中的事件数量"""
+        return len(self._events)
+
+    # ------------------------------------------------------------------
+    # 记录
+    # ------------------------------------------------------------------
+
+    def scope(self, name, category="lighting", **args):
+        """计时作用域：with tracer.scope("light.write", count=n): ..."""
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _Scope(self, name, category, args or None)
+
+    def count(self, name, value=1):
+        """累加计数器，在最外层作用域结束时写入一次计数事件"""
+        if not self.enabled:
+            return
+        self._counters[name] = self._counters.get(name, 0) + value
+        self._counters_dirty = True
+
+    def traced(self, name: Optional[str] = None, category="lighting"):
+        """函数装饰器：追踪开启时为每次调用记录一个作用域"""
+        def decorator(fn):
+            event_name = name or fn.__qualname__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Scope(self, event_name, category, None):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _to_us(self, ns):
+        return (ns - self._epoch_ns) / 1000.0
+
+    def _record_complete(self, name, category, start_ns, end_ns, args):
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": self._to_us(start_ns),
+            "dur": (end_ns - start_ns) / 1000.0,
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        self._events.append(event)
+
+    def _emit_counters(self, now_ns):
+        if not self._counters_dirty:
+            return
+        self._counters_dirty = False
+        self._events.append({
+            "name": "counters",
+            "ph": "C",
+            "ts": self._to_us(now_ns),
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+            "args": dict(self._counters),
+        })
+
+    # ------------------------------------------------------------------
+    # 导出
+    # ------------------------------------------------------------------
+
+    def get_summary(self):
+        """按事件名汇总 {name: {"count", "total_ms", "max_ms"}}"""
+        summary = {}
+        for event in list(self._events):
+            if event["ph"] != "X":
+                continue
+            entry = summary.setdefault(event["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            duration_ms = event["dur"] / 1000.0
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+        return summary
+
+    def export_chrome_trace(self, file_path):
+        """把缓冲区导出为 Chrome trace_event JSON，返回写入的事件数量"""
+        self._emit_counters(time.perf_counter_ns())
+        events = list(self._events)
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+
+# 扩展内共享的追踪器
+tracer = Tracer()
+traced = tracer.traced
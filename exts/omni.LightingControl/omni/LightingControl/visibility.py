@@ -0,0 +1,133 @@
+from pxr import Usd, UsdGeom, Sdf
+from typing import Dict, List, Set
+
+
+class GroupVisibilityService:
+    """按组计算和切换灯光可见性
+
+    ComputeVisibility() 每次都会沿祖先链向上查找；这里对一组灯光做一次自顶向下的求值，
+    同一次调用中祖先的结果只计算一次。切换时直接写 visibility 属性（inherited / invisible），
+    全部写入放在一个 Sdf.ChangeBlock 中，语义与 MakeVisible/MakeInvisible 一致。
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self._own: Dict[Sdf.Path, str] = {}  # 单次调用内的 路径 -> 自身visibility值
+
+    def _get_own_visibility(self, path, time):
+        """读取prim自身的visibility值（没有该属性时视为inherited），单次调用内只读一次"""
+        value = self._own.get(path)
+        if value is None:
+            value = self._own[path] = self._read_own_visibility(path, time)
+        return value
+
+    def _read_own_visibility(self, path, time):
+        prim = self.stage.GetPrimAtPath(path)
+        if not prim:
+            return UsdGeom.Tokens.inherited
+        attr = prim.GetAttribute(UsdGeom.Tokens.visibility)
+        if not attr:
+            return UsdGeom.Tokens.inherited
+        return attr.Get(time) or UsdGeom.Tokens.inherited
+
+    def _evaluate(self, paths, time, memo: Dict[Sdf.Path, bool]):
+        """求出每个路径的有效不可见状态，memo记录 路径 -> 是否不可见"""
+        root = Sdf.Path.absoluteRootPath
+        memo.setdefault(root, False)
+        for path in paths:
+            # 向上找到第一个已求值的祖先，再自顶向下补齐
+            chain = []
+            current = path
+            while current not in memo:
+                chain.append(current)
+                current = current.GetParentPath()
+            invisible = memo[current]
+            for node in reversed(chain):
+                invisible = invisible or self._get_own_visibility(node, time) == UsdGeom.Tokens.invisible
+                memo[node] = invisible
+        return memo
+
+    def compute_visibility(self, prims, time=Usd.TimeCode.Default()) -> List[bool]:
+        """计算一组prim的有效可见性，返回与prims对应的布尔列表"""
+        paths = [prim.GetPath() for prim in prims]
+        self._own.clear()
+        try:
+            memo = self._evaluate(paths, time, {})
+        finally:
+            self._own.clear()
+        return [not memo[path] for path in paths]
+
+    def _collect_make_visible(self, paths, time):
+        """计算让paths可见所需的 (路径, visibility值) 写入，与MakeVisible的祖先处理一致
+
+        不可见的祖先改为inherited；这些祖先下原本被隐藏、且不在目标路径上的子节点改为invisible，
+        以保持它们原来的不可见状态。
+        """
+        writes: Dict[Sdf.Path, str] = {}
+        targets = set(paths)
+
+        on_target_paths: Set[Sdf.Path] = set()
+        invisible_ancestors: Set[Sdf.Path] = set()
+        for path in paths:
+            for ancestor in path.GetParentPath().GetPrefixes():
+                on_target_paths.add(ancestor)
+                if self._get_own_visibility(ancestor, time) == UsdGeom.Tokens.invisible:
+                    invisible_ancestors.add(ancestor)
+
+        for ancestor in invisible_ancestors:
+            writes[ancestor] = UsdGeom.Tokens.inherited
+
+        # 从每个被改为inherited的祖先向下，把不在目标路径上的兄弟节点显式隐藏
+        for node in sorted(on_target_paths):
+            if not any(node.HasPrefix(ancestor) for ancestor in invisible_ancestors):
+                continue
+            prim = self.stage.GetPrimAtPath(node)
+            if not prim:
+                continue
+            for child in prim.GetChildren():
+                child_path = child.GetPath()
+                if child_path in targets or child_path in on_target_paths:
+                    continue
+                if child.IsA(UsdGeom.Imageable) and \
+                        self._get_own_visibility(child_path, time) != UsdGeom.Tokens.invisible:
+                    writes[child_path] = UsdGeom.Tokens.invisible
+
+        for path in paths:
+            if self._get_own_visibility(path, time) != UsdGeom.Tokens.inherited:
+                writes[path] = UsdGeom.Tokens.inherited
+        return writes
+
+    def set_visibility(self, prims, visible, time=Usd.TimeCode.Default()):
+        """批量显示或隐藏一组prim，所有写入在一个变更块中完成，返回实际写入的属性数量"""
+        paths = [prim.GetPath() for prim in prims if prim]
+        if not paths:
+            return 0
+
+        self._own.clear()
+        try:
+            if visible:
+                writes = self._collect_make_visible(paths, time)
+            else:
+                writes = {path: UsdGeom.Tokens.invisible for path in paths
+                          if self._get_own_visibility(path, time) != UsdGeom.Tokens.invisible}
+        finally:
+            self._own.clear()
+        if not writes:
+            return 0
+
+        # 属性在变更块之外解析，变更块内只做写入
+        attrs = []
+        for path, value in writes.items():
+            imageable = UsdGeom.Imageable(self.stage.GetPrimAtPath(path))
+            if imageable:
+                attrs.append((imageable.CreateVisibilityAttr(), value))
+
+        written = 0
+        with Sdf.ChangeBlock():
+            for attr, value in attrs:
+                try:
+                    attr.Set(value, time)
+                    written += 1
+                except Exception as e:
+                    print(f"设置可见性失败 {attr.GetPath()}: {str(e)}")
+        return written
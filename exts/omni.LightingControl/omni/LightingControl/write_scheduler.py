@@ -0,0 +1,157 @@
+import math
+import time
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import omni.kit.app
+
+from .tracing import traced
+
+
+class WriteScheduler:
+    """帧合并写入调度器
+
+    滑块拖动时每帧可能触发数十次回调，调度器对每个 (组, 属性) 只保留最新的待写值，
+    在 omni.kit.app 的 update tick 中统一刷新。开启自适应后会根据实测帧时间和刷新耗时
+    调整刷新间隔（每N帧刷新一次），避免写入本身拖慢视口。
+    """
+
+    def __init__(self, frame_budget_ratio=0.25, max_flush_interval=4, adaptive=True,
+                 on_stats_updated: Optional[Callable[[Dict], None]] = None):
+        self.adaptive = adaptive
+        self.frame_budget_ratio = frame_budget_ratio  # 刷新耗时允许占用的帧时间比例
+        self.max_flush_interval = max_flush_interval
+        self._on_stats_updated = on_stats_updated
+
+        # (组, 属性) -> (值, 写入函数)
+        self._pending: Dict[Tuple[Hashable, str], Tuple[object, Callable]] = {}
+
+        self._flush_interval = 1
+        self._frames_since_flush = 0
+        self._frame_ms = 0.0
+        self._flush_ms = 0.0
+
+        # 统计信息
+        self._stats_window_start = time.perf_counter()
+        self._window_writes = 0
+        self._window_flushes = 0
+        self._window_flush_ms = 0.0
+        self._window_coalesced = 0
+        self._stats = {
+            "writes_per_second": 0.0,
+            "flushes_per_second": 0.0,
+            "avg_flush_ms": 0.0,
+            "last_flush_ms": 0.0,
+            "coalesced_per_second": 0.0,
+            "frame_ms": 0.0,
+            "flush_interval": 1,
+        }
+
+        self._update_sub = omni.kit.app.get_app().get_update_event_stream().create_subscription_to_pop(
+            self._on_update, name="omni.LightingControl.WriteScheduler"
+        )
+
+    def destroy(self):
+        """刷新剩余的待写值并取消订阅"""
+        self.flush()
+        self._update_sub = None
+        self._on_stats_updated = None
+
+    def schedule(self, group_key, prop, value, apply_fn):
+        """登记一次写入，同一 (组, 属性) 在下次刷新前只保留最新值"""
+        key = (group_key, prop)
+        if key in self._pending:
+            self._window_coalesced += 1
+        self._pending[key] = (value, apply_fn)
+
+    def has_pending(self):
+        """是否有待写入的值"""
+        return bool(self._pending)
+
+    def discard(self, group_key=None):
+        """丢弃待写值，group_key为None时丢弃全部"""
+        if group_key is None:
+            self._pending.clear()
+            return
+        for key in [k for k in self._pending if k[0] == group_key]:
+            del self._pending[key]
+
+    @traced(category="ui")
+    def flush(self):
+        """立即写入所有待写值，返回写入数量"""
+        if not self._pending:
+            return 0
+
+        pending = self._pending
+        self._pending = {}
+
+        start = time.perf_counter()
+        for (group_key, prop), (value, apply_fn) in pending.items():
+            try:
+                apply_fn(value)
+            except Exception as e:
+                print(f"写入调度失败 {group_key}/{prop}: {str(e)}")
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+        self._flush_ms = elapsed_ms if self._flush_ms == 0.0 else self._flush_ms * 0.8 + elapsed_ms * 0.2
+        self._stats["last_flush_ms"] = elapsed_ms
+        self._window_writes += len(pending)
+        self._window_flushes += 1
+        self._window_flush_ms += elapsed_ms
+        return len(pending)
+
+    def get_stats(self):
+        """获取最近一个统计窗口（约1秒）的写入统计"""
+        return dict(self._stats)
+
+    def _update_flush_interval(self):
+        """根据帧时间和刷新耗时调整刷新间隔"""
+        if not self.adaptive or self._frame_ms <= 0.0:
+            self._flush_interval = 1
+            return
+        budget_ms = self._frame_ms * self.frame_budget_ratio
+        interval = math.ceil(self._flush_ms / budget_ms) if budget_ms > 0.0 else 1
+        self._flush_interval = max(1, min(self.max_flush_interval, interval))
+
+    def _on_update(self, event):
+        """每帧回调：记录帧时间并按间隔刷新"""
+        try:
+            dt = event.payload["dt"]
+        except (KeyError, TypeError):
+            dt = 0.0
+        if dt > 0.0:
+            frame_ms = dt * 1000.0
+            self._frame_ms = frame_ms if self._frame_ms == 0.0 else self._frame_ms * 0.9 + frame_ms * 0.1
+
+        self._frames_since_flush += 1
+        if self._pending and self._frames_since_flush >= self._flush_interval:
+            self._frames_since_flush = 0
+            self.flush()
+            self._update_flush_interval()
+
+        now = time.perf_counter()
+        elapsed = now - self._stats_window_start
+        if elapsed >= 1.0:
+            self._roll_stats_window(now, elapsed)
+
+    def _roll_stats_window(self, now, elapsed):
+        """结束当前统计窗口"""
+        had_activity = self._window_writes > 0 or self._stats["writes_per_second"] > 0.0
+        self._stats.update({
+            "writes_per_second": self._window_writes / elapsed,
+            "flushes_per_second": self._window_flushes / elapsed,
+            "avg_flush_ms": self._window_flush_ms / self._window_flushes if self._window_flushes else 0.0,
+            "coalesced_per_second": self._window_coalesced / elapsed,
+            "frame_ms": self._frame_ms,
+            "flush_interval": self._flush_interval,
+        })
+        self._stats_window_start = now
+        self._window_writes = 0
+        self._window_flushes = 0
+        self._window_flush_ms = 0.0
+        self._window_coalesced = 0
+
+        if had_activity and self._on_stats_updated:
+            try:
+                self._on_stats_updated(self.get_stats())
+            except Exception as e:
+                print(f"写入统计回调失败: {str(e)}")